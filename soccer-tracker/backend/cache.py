@@ -0,0 +1,188 @@
+# backend/cache.py
+"""
+In-process caches shared by the API and the ML helpers.
+
+crud.py invalidates these whenever the underlying rows change, so readers never need to
+compare timestamps themselves.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+from . import config
+
+
+class TeamBaselineCache:
+    """
+    Per-team cached values (e.g. injury baseline of every squad member), invalidated per team.
+    A generation counter per team stops a computation that raced with an invalidation from
+    storing a stale value.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._generations = {}
+
+    def get_or_compute(self, team, compute):
+        with self._lock:
+            if team in self._values:
+                return self._values[team]
+            generation = self._generations.get(team, 0)
+        value = compute()
+        with self._lock:
+            if self._generations.get(team, 0) == generation:
+                self._values[team] = value
+        return value
+
+    def invalidate(self, team):
+        with self._lock:
+            self._values.pop(team, None)
+            self._generations[team] = self._generations.get(team, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            for team in list(self._values):
+                self._generations[team] = self._generations.get(team, 0) + 1
+            self._values.clear()
+
+
+class DirtySet:
+    """
+    Players whose prediction inputs changed since the consumer (snapshot scheduler, percentile index)
+    last drained the set; mark_all() asks for a full refresh instead (e.g. after rebuilding every aggregate).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = set()
+        self._all = False
+
+    def add(self, *player_ids):
+        with self._lock:
+            self._ids.update(player_ids)
+
+    def mark_all(self):
+        with self._lock:
+            self._all = True
+
+    def drain(self):
+        """(everything dirty, set of player ids) accumulated since the last drain."""
+        with self._lock:
+            everything, ids = self._all, self._ids
+            self._all, self._ids = False, set()
+        return everything, ids
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids)
+
+
+def approx_size(obj):
+    """Rough deep size in bytes of plain containers (dict/list/tuple) of scalars and strings."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(approx_size(v) for v in obj)
+    return size
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count and by approximate memory (bytes).
+    Entries can carry a tag (e.g. a player id) so every entry for that tag can be dropped at once.
+    Keeps hit / miss / eviction / invalidation counters for monitoring.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, tag, size)
+        self._tags = {}  # tag -> set of keys
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, tag=None):
+        size = approx_size(key) + approx_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes or self.max_entries <= 0:
+                return
+            self._entries[key] = (value, tag, size)
+            self._bytes += size
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            for key in self._tags.pop(tag, ()):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, tag, size = self._entries.pop(key)
+        self._bytes -= size
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def info(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "approx_bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# team name -> {"average": float, "probabilities": {player_id: float}}
+team_injury_baselines = TeamBaselineCache()
+
+# (kind, player_id, stats version, horizon_days) -> prediction; tagged by player_id
+player_predictions = LRUCache(config.PREDICTION_CACHE_MAX_ENTRIES, config.PREDICTION_CACHE_MAX_BYTES)
+
+# ETag -> (rendered body, headers) of the conditional-GET routes; tagged by player_id
+responses = LRUCache(config.RESPONSE_CACHE_MAX_ENTRIES, config.RESPONSE_CACHE_MAX_BYTES)
+
+# players whose prediction snapshot is out of date (snapshots.py drains it)
+dirty_players = DirtySet()
+
+# players whose values in the percentile index are out of date (percentiles.py drains it)
+dirty_percentiles = DirtySet()
@@ -0,0 +1,93 @@
+# backend/config.py
+"""
+Runtime settings for the Soccer Tracker backend, read from environment variables
+(prefixed SOCCER_) with defaults suitable for local development.
+"""
+
+import os
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+# In-process LRU cache for per-player predictions (ml/predict.py)
+PREDICTION_CACHE_MAX_ENTRIES = _int("SOCCER_PREDICTION_CACHE_MAX_ENTRIES", 20_000)
+PREDICTION_CACHE_MAX_BYTES = _int("SOCCER_PREDICTION_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+
+# GET /players and /players/{id}/stats: select column tuples and render them with fastjson.py
+# (byte-identical output); 0 goes through ORM objects and response_model validation instead
+FAST_LIST_RESPONSES = _int("SOCCER_FAST_LIST_RESPONSES", 1) == 1
+
+# Rendered bodies of the ETag-validated read routes (etags.py), keyed by ETag
+RESPONSE_CACHE_MAX_ENTRIES = _int("SOCCER_RESPONSE_CACHE_MAX_ENTRIES", 20_000)
+RESPONSE_CACHE_MAX_BYTES = _int("SOCCER_RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+
+# Incremental rolling-window states kept in memory (ml/rolling.py), one per player
+ROLLING_STATE_MAX_PLAYERS = _int("SOCCER_ROLLING_STATE_MAX_PLAYERS", 50_000)
+
+# Process pool behind POST /predict/batch (ml/batch.py); 0 workers scores in-process
+PREDICT_POOL_WORKERS = _int("SOCCER_PREDICT_POOL_WORKERS", os.cpu_count() or 1)
+PREDICT_POOL_START_METHOD = os.environ.get("SOCCER_PREDICT_POOL_START_METHOD", "spawn")
+PREDICT_BATCH_CHUNK_PLAYERS = _int("SOCCER_PREDICT_BATCH_CHUNK_PLAYERS", 500)
+
+# Database: any SQLAlchemy URL; the async engine derives its driver (aiosqlite / asyncpg / aiomysql)
+# unless SOCCER_ASYNC_DATABASE_URL is given explicitly
+DATABASE_URL = os.environ.get("SOCCER_DATABASE_URL", "sqlite:///./sql_app.db")
+ASYNC_DATABASE_URL = os.environ.get("SOCCER_ASYNC_DATABASE_URL")
+
+# Startup: the schema is created by `python -m backend.manage migrate`; a worker refuses to start on a
+# database with missing tables or indexes unless AUTO_MIGRATE=1, the default for SQLite files (local
+# single-process setups). PREWARM_ML imports the ML modules (NumPy / pandas) in a background thread
+# once the worker is up, instead of on the first prediction request.
+AUTO_MIGRATE = _int("SOCCER_AUTO_MIGRATE", 1 if DATABASE_URL.startswith("sqlite") else 0) == 1
+PREWARM_ML = _int("SOCCER_PREWARM_ML", 1) == 1
+
+# Connection pool per engine (sync and async each get one); size it to the expected concurrency
+DB_POOL_SIZE = _int("SOCCER_DB_POOL_SIZE", 20)
+DB_MAX_OVERFLOW = _int("SOCCER_DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT = _int("SOCCER_DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = _int("SOCCER_DB_POOL_RECYCLE", 1800)
+
+# Write-behind queue for POST /players/{id}/stats (writebehind.py): group-commit up to N rows
+# or whatever arrived within M ms; 0 rows disables it (every insert commits on its own)
+STAT_WRITE_BATCH_ROWS = _int("SOCCER_STAT_WRITE_BATCH_ROWS", 0)
+STAT_WRITE_BATCH_MS = _int("SOCCER_STAT_WRITE_BATCH_MS", 50)
+
+# SQLite storage mode: "wal" (WAL journal + the pragmas below, readers never block the writer)
+# or "default" (leave SQLite's rollback journal and defaults untouched). In WAL mode synchronous=NORMAL
+# may lose the last commits on power loss (never corrupts); the write-behind queue answers requests once
+# their group has committed, so it defaults to FULL, which syncs every (group) commit.
+SQLITE_STORAGE_MODE = os.environ.get("SOCCER_SQLITE_STORAGE_MODE", "wal")
+SQLITE_SYNCHRONOUS = os.environ.get("SOCCER_SQLITE_SYNCHRONOUS", "FULL" if STAT_WRITE_BATCH_ROWS > 0 else "NORMAL")
+SQLITE_CACHE_SIZE_KB = _int("SOCCER_SQLITE_CACHE_SIZE_KB", 64 * 1024)
+SQLITE_MMAP_SIZE = _int("SOCCER_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+SQLITE_BUSY_TIMEOUT_MS = _int("SOCCER_SQLITE_BUSY_TIMEOUT_MS", 5000)
+
+# Trained model artifacts (ml/train.py, ml/registry.py); each worker rescans the directory
+# for newer versions at most every MODEL_RELOAD_SECONDS
+MODEL_DIR = os.environ.get("SOCCER_MODEL_DIR", "./ml_models")
+MODEL_RELOAD_SECONDS = _int("SOCCER_MODEL_RELOAD_SECONDS", 30)
+
+# Market value trends (ml/market.py) use the valuations from this many days before a player's
+# latest one; 0 uses the whole history
+MARKET_WINDOW_DAYS = _int("SOCCER_MARKET_WINDOW_DAYS", 365)
+
+# Request / stage instrumentation (metrics.py) exposed on GET /metrics; with REQUEST_PROFILING,
+# clients may send `X-Profile: 1` to get a per-stage Server-Timing header on the response
+METRICS_ENABLED = _int("SOCCER_METRICS_ENABLED", 1) == 1
+REQUEST_PROFILING = _int("SOCCER_REQUEST_PROFILING", 1) == 1
+
+# Prediction snapshots (snapshots.py): a background thread rescores players whose inputs changed
+# every SNAPSHOT_DIRTY_SECONDS and the whole league daily at SNAPSHOT_FULL_REFRESH_HOUR (UTC, -1 = never).
+# Routes serve a snapshot up to SNAPSHOT_MAX_STALENESS_SECONDS old unless the request says otherwise.
+# Each uvicorn worker runs its own scheduler; set SNAPSHOT_SCHEDULER=0 on all but one if that matters.
+SNAPSHOT_SCHEDULER = _int("SOCCER_SNAPSHOT_SCHEDULER", 1) == 1
+SNAPSHOT_DIRTY_SECONDS = _int("SOCCER_SNAPSHOT_DIRTY_SECONDS", 5)
+SNAPSHOT_FULL_REFRESH_HOUR = _int("SOCCER_SNAPSHOT_FULL_REFRESH_HOUR", 3)
+SNAPSHOT_MAX_STALENESS_SECONDS = _int("SOCCER_SNAPSHOT_MAX_STALENESS_SECONDS", 26 * 3600)
+SNAPSHOT_HORIZON_DAYS = _int("SOCCER_SNAPSHOT_HORIZON_DAYS", 180)
+
+# League percentile index (percentiles.py): patched in place for the players this worker changed, rebuilt
+# from the aggregates and snapshots when older than this (picks up other workers' changes)
+PERCENTILE_MAX_AGE_SECONDS = _int("SOCCER_PERCENTILE_MAX_AGE_SECONDS", 60)
@@ -1,12 +1,72 @@
+from datetime import timedelta
+from sqlalchemy import bindparam, func, insert, inspect, or_, and_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, cache
+from .metrics import traced
+from .ml.rolling import rolling_states
+
+def _team_of(db: Session, player_id: int):
+    return db.query(models.Player.team).filter(models.Player.id == player_id).scalar()
+
+def _invalidate_teams(*teams):
+    """Drop cached per-team values (injury baselines) for every team whose data changed"""
+    for team in set(teams):
+        cache.team_injury_baselines.invalidate(team)
+
+def _invalidate_players(*player_ids, rolling=True):
+    """Drop cached per-player predictions (their stats version changed anyway; this frees the memory)"""
+    cache.dirty_players.add(*player_ids)
+    cache.dirty_percentiles.add(*player_ids)
+    for player_id in set(player_ids):
+        cache.player_predictions.invalidate_tag(player_id)
+        cache.responses.invalidate_tag(player_id)
+        if rolling:
+            rolling_states.discard(player_id)
 
 # =========================
 # Player CRUD
 # =========================
-def get_players(db: Session):
-    return db.query(models.Player).all()
+def _players_stmt(after_id: int = None, limit: int = None, columns=None):
+    stmt = select(*columns) if columns else select(models.Player)
+    stmt = stmt.order_by(models.Player.id)
+    if after_id is not None:
+        stmt = stmt.where(models.Player.id > after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+@traced("crud.get_players")
+def get_players(db: Session, after_id: int = None, limit: int = None):
+    """Players ordered by id; keyset pagination with after_id (exclusive) and limit"""
+    return db.scalars(_players_stmt(after_id, limit)).all()
+
+@traced("crud.get_players_up_to_age")
+def get_players_up_to_age(db: Session, max_age: int):
+    """Players with a known age <= max_age (filter runs in SQL)"""
+    return (
+        db.query(models.Player)
+        .filter(models.Player.age.isnot(None), models.Player.age <= max_age)
+        .order_by(models.Player.id)
+        .all()
+    )
 
+@traced("crud.get_players_by_team")
+def get_players_by_team(db: Session, team: str):
+    return db.query(models.Player).filter(models.Player.team == team).all()
+
+def get_player_ids_by_name(db: Session, names):
+    """{name: [player ids]} for the given names in one query"""
+    result = {}
+    for player_id, name in db.query(models.Player.id, models.Player.name).filter(models.Player.name.in_(list(names))):
+        result.setdefault(name, []).append(player_id)
+    return result
+
+def get_existing_player_ids(db: Session, player_ids):
+    """Subset of player_ids that exist, in one query"""
+    return {r[0] for r in db.query(models.Player.id).filter(models.Player.id.in_(list(player_ids)))}
+
+@traced("crud.get_player")
 def get_player(db: Session, player_id: int):
     return db.query(models.Player).filter(models.Player.id == player_id).first()
 
@@ -19,33 +79,115 @@ def create_player(db: Session, player: schemas.PlayerCreate):
         team=player.team,
     )
     db.add(db_player)
+    db.flush()
+    _bump_change_versions(db, [db_player.id], [db_player.team])
     db.commit()
     db.refresh(db_player)
+    _invalidate_teams(db_player.team)
     return db_player
 
 def update_player(db: Session, db_player: models.Player, updated_player: schemas.PlayerCreate):
     """Update an existing player"""
+    old_team = db_player.team
     db_player.name = updated_player.name
     db_player.age = updated_player.age
     db_player.position = updated_player.position
     db_player.nationality = updated_player.nationality
     db_player.team = updated_player.team
 
+    if old_team != db_player.team:
+        _move_player_aggregate(db, db_player.id, old_team, db_player.team)
+    _bump_change_versions(db, [db_player.id], [old_team, db_player.team])
     db.commit()
     db.refresh(db_player)
+    _invalidate_teams(old_team, db_player.team)
+    cache.dirty_percentiles.add(db_player.id)  # position partitions
     return db_player
 
 def delete_player(db: Session, player: models.Player):
+    team = player.team
+    _move_player_aggregate(db, player.id, team, None)
+    _reset_player_aggregate(db, player.id)
+    db.query(models.MarketValue).filter(models.MarketValue.player_id == player.id).delete(synchronize_session=False)
+    db.query(models.Injury).filter(models.Injury.player_id == player.id).delete(synchronize_session=False)
+    db.query(models.PredictionSnapshot).filter(models.PredictionSnapshot.player_id == player.id).delete(
+        synchronize_session=False
+    )
+    _bump_change_versions(db, [player.id], [team])
     db.delete(player)
     db.commit()
+    _invalidate_teams(team)
+    _invalidate_players(player.id)
     return {"message": f"Player with id {player.id} deleted successfully"}
 
 # =========================
 # Stat CRUD
 # =========================
-def get_stats_for_player(db: Session, player_id: int):
-    return db.query(models.Stat).filter(models.Stat.player_id == player_id).all()
+def _stats_for_player_stmt(
+    player_id: int, date_from=None, date_to=None, after=None, limit: int = None, columns=None
+):
+    stmt = select(*columns) if columns else select(models.Stat)
+    stmt = stmt.where(models.Stat.player_id == player_id)
+    if date_from is not None:
+        stmt = stmt.where(models.Stat.match_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(models.Stat.match_date <= date_to)
+    if after is not None:
+        after_date, after_id = after
+        stmt = stmt.where(
+            or_(
+                models.Stat.match_date > after_date,
+                and_(models.Stat.match_date == after_date, models.Stat.id > after_id),
+            )
+        )
+    stmt = stmt.order_by(models.Stat.match_date, models.Stat.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+@traced("crud.get_stats_for_player")
+def get_stats_for_player(db: Session, player_id: int, date_from=None, date_to=None, after=None, limit: int = None):
+    """
+    A player's stats ordered by (match_date, id), served by the (player_id, match_date) index.
+    date_from / date_to are inclusive; after=(match_date, id) is the keyset cursor of the previous page.
+    """
+    return db.scalars(_stats_for_player_stmt(player_id, date_from, date_to, after, limit)).all()
+
+STAT_ROW_COLUMNS = ("player_id", "match_date", "minutes_played", "goals", "assists", "touches", "tackles_won")
 
+@traced("crud.get_recent_stat_rows")
+def get_recent_stat_rows(db: Session, player_id: int, days: int, min_matches: int):
+    """
+    Only the rows rolling features need: every match within `days` of the player's latest match,
+    plus at least the last `min_matches` matches. Column tuples in STAT_ROW_COLUMNS order,
+    ordered by (match_date, id).
+    """
+    query = db.query(*[getattr(models.Stat, c) for c in STAT_ROW_COLUMNS]).filter(models.Stat.player_id == player_id)
+    latest = db.query(func.max(models.Stat.match_date)).filter(models.Stat.player_id == player_id).scalar()
+    if latest is not None:
+        last_ids = (
+            db.query(models.Stat.id)
+            .filter(models.Stat.player_id == player_id)
+            .order_by(models.Stat.match_date.desc(), models.Stat.id.desc())
+            .limit(min_matches)
+        )
+        query = query.filter(
+            or_(models.Stat.match_date >= latest - timedelta(days=days), models.Stat.id.in_(last_ids))
+        )
+    return query.order_by(models.Stat.match_date, models.Stat.id).all()
+
+@traced("crud.get_stat_rows")
+def get_stat_rows(db: Session, *player_filters):
+    """
+    Stats for every player matching `player_filters` (criteria on models.Player) in one query.
+    Returns plain column tuples in STAT_ROW_COLUMNS order, grouped by player and sorted by (match_date, id).
+    """
+    query = db.query(*[getattr(models.Stat, c) for c in STAT_ROW_COLUMNS])
+    if player_filters:
+        query = query.join(models.Player, models.Player.id == models.Stat.player_id).filter(*player_filters)
+    return query.order_by(models.Stat.player_id, models.Stat.match_date, models.Stat.id).all()
+
+@traced("crud.get_stat")
 def get_stat(db: Session, stat_id: int):
     """Get a stat by ID"""
     return db.query(models.Stat).filter(models.Stat.id == stat_id).first()
@@ -61,20 +203,118 @@ def create_stat_for_player(db: Session, player_id: int, stat: schemas.StatCreate
         tackles_won=stat.tackles_won,
     )
     db.add(db_stat)
+    team = _team_of(db, player_id)
+    _bump_aggregates(db, player_id, team, _stat_metrics(db_stat), 1)
+    _bump_change_versions(db, [player_id], [team])
+    version = get_stats_version(db, player_id)
     db.commit()
     db.refresh(db_stat)
+    _invalidate_teams(team)
+    _invalidate_players(player_id, rolling=False)
+    # live ingestion: advance the player's rolling windows in O(1) instead of rebuilding them
+    rolling_states.append(player_id, version, db_stat.match_date, db_stat.minutes_played, db_stat.goals)
     return db_stat
 
+_STAT_INSERT_COLUMNS = ("player_id", "match_date", "goals", "assists", "minutes_played", "touches", "tackles_won")
+
+def _insert_stat_rows(db: Session, records: list):
+    """One DBAPI executemany for all rows (no ORM unit-of-work, no per-row bind processing on SQLite)"""
+    conn = db.connection()
+    if conn.dialect.name == "sqlite":
+        cols = _STAT_INSERT_COLUMNS
+        sql = f"INSERT INTO stats ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        conn.exec_driver_sql(
+            sql,
+            [
+                (r["player_id"], r["match_date"].isoformat(), r["goals"], r["assists"],
+                 r["minutes_played"], r["touches"], r["tackles_won"])
+                for r in records
+            ],
+        )
+    else:
+        db.execute(insert(models.Stat.__table__), records)
+
+def _apply_stat_inserts(db: Session, records: list):
+    """Add inserted rows to the player/team aggregates (once per player); returns (player ids, teams)"""
+    deltas = {}  # player_id -> [count, goals, assists, touches, tackles_won]
+    for r in records:
+        acc = deltas.get(r["player_id"])
+        if acc is None:
+            acc = deltas[r["player_id"]] = [0, 0, 0, 0, 0]
+        acc[0] += 1
+        acc[1] += r.get("goals") or 0
+        acc[2] += r.get("assists") or 0
+        acc[3] += r.get("touches") or 0
+        acc[4] += r.get("tackles_won") or 0
+    teams = dict(db.query(models.Player.id, models.Player.team).filter(models.Player.id.in_(list(deltas))).all())
+    for player_id, (count, *sums) in deltas.items():
+        _bump_aggregates(db, player_id, teams.get(player_id), dict(zip(AGGREGATE_METRICS, sums)), count)
+    return list(deltas), list(teams.values())
+
+@traced("crud.bulk_create_stats")
+def bulk_create_stats(db: Session, records: list):
+    """
+    Insert many stats (dicts with player_id + StatBase fields) with one executemany, update the
+    aggregates once per player and commit everything as a single transaction. Returns the row count.
+    """
+    if not records:
+        return 0
+    _insert_stat_rows(db, records)
+    player_ids, teams = _apply_stat_inserts(db, records)
+    _bump_change_versions(db, player_ids, teams)
+    db.commit()
+    _invalidate_teams(*teams)
+    _invalidate_players(*player_ids)
+    return len(records)
+
+@traced("crud.create_stats_group")
+def create_stats_group(db: Session, items: list):
+    """
+    Group commit for the write-behind queue: insert (player_id, StatCreate) items in one transaction.
+    Returns the created rows as dicts (with ids), in input order.
+    """
+    if not items:
+        return []
+    fields = _STAT_INSERT_COLUMNS[1:]
+    db_stats = [models.Stat(player_id=player_id, **{f: getattr(stat, f) for f in fields}) for player_id, stat in items]
+    db.add_all(db_stats)
+    db.flush()  # assigns ids (one INSERT .. RETURNING batch where supported)
+    records = [{"id": s.id, "player_id": s.player_id, **{f: getattr(s, f) for f in fields}} for s in db_stats]
+    player_ids, teams = _apply_stat_inserts(db, records)
+    _bump_change_versions(db, player_ids, teams)
+    versions = dict(
+        db.query(models.PlayerStatAggregate.player_id, models.PlayerStatAggregate.version)
+        .filter(models.PlayerStatAggregate.player_id.in_(player_ids))
+        .all()
+    )
+    db.commit()
+    _invalidate_teams(*teams)
+    _invalidate_players(*player_ids, rolling=False)
+    # as create_stat_for_player: advance each player's rolling windows by their rows of the group
+    matches = {}
+    for r in records:
+        matches.setdefault(r["player_id"], []).append((r["match_date"], r["minutes_played"], r["goals"]))
+    for player_id, player_matches in matches.items():
+        rolling_states.extend(player_id, versions[player_id], player_matches)
+    return records
+
 def delete_stat(db: Session, stat_id: int):
     """Delete a stat by ID"""
     db_stat = get_stat(db, stat_id)
     if db_stat:
+        player_id = db_stat.player_id
+        team = _team_of(db, player_id)
+        _bump_aggregates(db, player_id, team, {m: -v for m, v in _stat_metrics(db_stat).items()}, -1)
+        _bump_change_versions(db, [player_id], [team])
         db.delete(db_stat)
         db.commit()
+        _invalidate_teams(team)
+        _invalidate_players(player_id)
     return db_stat
 
 def update_stat(db: Session, db_stat: models.Stat, updated_stat: schemas.StatCreate):
     """Update an existing stat"""
+    old_metrics = _stat_metrics(db_stat)
     db_stat.match_date = updated_stat.match_date
     db_stat.goals = updated_stat.goals
     db_stat.assists = updated_stat.assists
@@ -82,6 +322,501 @@ def update_stat(db: Session, db_stat: models.Stat, updated_stat: schemas.StatCre
     db_stat.touches = updated_stat.touches
     db_stat.tackles_won = updated_stat.tackles_won
 
+    team = _team_of(db, db_stat.player_id)
+    new_metrics = _stat_metrics(db_stat)
+    _bump_aggregates(db, db_stat.player_id, team, {m: new_metrics[m] - old_metrics[m] for m in AGGREGATE_METRICS}, 0)
+    _bump_change_versions(db, [db_stat.player_id], [team])
     db.commit()
     db.refresh(db_stat)
+    _invalidate_teams(team)
+    _invalidate_players(db_stat.player_id)
     return db_stat
+
+# =========================
+# Market values
+# =========================
+MARKET_ROW_COLUMNS = ("player_id", "date", "market_value")
+
+@traced("crud.get_market_values")
+def get_market_values(db: Session, player_id: int, date_from=None, date_to=None):
+    """A player's valuations in date order"""
+    query = db.query(models.MarketValue).filter(models.MarketValue.player_id == player_id)
+    if date_from is not None:
+        query = query.filter(models.MarketValue.date >= date_from)
+    if date_to is not None:
+        query = query.filter(models.MarketValue.date <= date_to)
+    return query.order_by(models.MarketValue.date).all()
+
+@traced("crud.get_market_value_rows")
+def get_market_value_rows(db: Session, *player_filters):
+    """
+    Valuations of every player matching `player_filters` (criteria on models.Player) in one query.
+    Returns plain column tuples in MARKET_ROW_COLUMNS order, grouped by player and sorted by date.
+    """
+    query = db.query(*[getattr(models.MarketValue, c) for c in MARKET_ROW_COLUMNS])
+    if player_filters:
+        query = query.join(models.Player, models.Player.id == models.MarketValue.player_id).filter(*player_filters)
+    return query.order_by(models.MarketValue.player_id, models.MarketValue.date).all()
+
+def _upsert_market_rows(db: Session, records: list):
+    """Insert valuations, replacing the value of an existing (player_id, date)"""
+    table = models.MarketValue.__table__
+    dialect = db.connection().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.player_id, table.c.date],
+            set_={"market_value": stmt.excluded.market_value, "source": stmt.excluded.source},
+        )
+        db.execute(stmt, records)
+        return
+    for r in records:
+        db.query(models.MarketValue).filter(
+            models.MarketValue.player_id == r["player_id"], models.MarketValue.date == r["date"]
+        ).delete(synchronize_session=False)
+    db.execute(insert(table), records)
+
+@traced("crud.bulk_upsert_market_values")
+def bulk_upsert_market_values(db: Session, records: list):
+    """
+    Insert or replace many valuations (dicts with player_id, date, market_value and optional source)
+    in one transaction. The affected players' prediction version is bumped so no cached forecast
+    outlives the data it came from. Returns the row count.
+    """
+    if not records:
+        return 0
+    records = [{"source": None, **r} for r in records]
+    _upsert_market_rows(db, records)
+    player_ids = {r["player_id"] for r in records}
+    _bump_player_versions(db, player_ids)
+    _bump_change_versions(db, player_ids)
+    db.commit()
+    _invalidate_players(*player_ids)
+    return len(records)
+
+# =========================
+# Injuries
+# =========================
+@traced("crud.get_injuries")
+def get_injuries(db: Session, player_id: int):
+    """A player's injuries by start date"""
+    return (
+        db.query(models.Injury)
+        .filter(models.Injury.player_id == player_id)
+        .order_by(models.Injury.start_date, models.Injury.id)
+        .all()
+    )
+
+def get_injury(db: Session, injury_id: int):
+    return db.query(models.Injury).filter(models.Injury.id == injury_id).first()
+
+@traced("crud.get_injury_rows")
+def get_injury_rows(db: Session, *player_filters):
+    """
+    (player_id, start_date) of every injury of the players matching `player_filters` (criteria on
+    models.Player) in one query, grouped by player and sorted by start_date.
+    """
+    query = db.query(models.Injury.player_id, models.Injury.start_date)
+    if player_filters:
+        query = query.join(models.Player, models.Player.id == models.Injury.player_id).filter(*player_filters)
+    return query.order_by(models.Injury.player_id, models.Injury.start_date).all()
+
+@traced("crud.count_recent_injuries")
+def count_recent_injuries(db: Session, player_id: int, days: int = 365):
+    """Injuries starting at most `days` before the player's last match (0 without matches)"""
+    last_match = db.query(func.max(models.Stat.match_date)).filter(models.Stat.player_id == player_id).scalar()
+    if last_match is None:
+        return 0
+    return (
+        db.query(func.count(models.Injury.id))
+        .filter(models.Injury.player_id == player_id, models.Injury.start_date >= last_match - timedelta(days=days))
+        .scalar()
+    )
+
+def _injuries_changed(db: Session, player_ids):
+    """Same transaction as the change: new prediction version; after commit, drop cached team/player values"""
+    player_ids = set(player_ids)
+    _bump_player_versions(db, player_ids)
+    teams = [t for (t,) in db.query(models.Player.team).filter(models.Player.id.in_(list(player_ids)))]
+    _bump_change_versions(db, player_ids, teams)
+    db.commit()
+    _invalidate_teams(*teams)
+    _invalidate_players(*player_ids)
+
+INJURY_KEY_COLUMNS = ("player_id", "start_date", "injury_type")
+
+def _injury_key(record):
+    return tuple(record[c] for c in INJURY_KEY_COLUMNS)
+
+def find_injury(db: Session, player_id: int, start_date, injury_type):
+    """The injury with this (player_id, start_date, injury_type), injury_type None included, or None"""
+    return (
+        db.query(models.Injury)
+        .filter(
+            models.Injury.player_id == player_id,
+            models.Injury.start_date == start_date,
+            models.Injury.injury_type.is_(None) if injury_type is None else models.Injury.injury_type == injury_type,
+        )
+        .first()
+    )
+
+def _upsert_injury_rows(db: Session, records: list):
+    """
+    Insert injuries, replacing the end_date of an existing (player_id, start_date, injury_type). Typed
+    rows use ON CONFLICT on the unique index like the market values; rows without a type (distinct
+    under a unique index) and other dialects look the existing rows up instead.
+    """
+    table = models.Injury.__table__
+    records = list({_injury_key(r): r for r in records}.values())  # the last row of a key wins
+    dialect = db.connection().dialect.name
+    rest = records
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        typed = [r for r in records if r["injury_type"] is not None]
+        rest = [r for r in records if r["injury_type"] is None]
+        if typed:
+            stmt = dialect_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.player_id, table.c.start_date, table.c.injury_type],
+                set_={"end_date": stmt.excluded.end_date},
+            )
+            db.execute(stmt, typed)
+    if not rest:
+        return
+    existing = {
+        tuple(key): injury_id
+        for injury_id, *key in db.query(models.Injury.id, *(table.c[c] for c in INJURY_KEY_COLUMNS))
+        .filter(models.Injury.player_id.in_({r["player_id"] for r in rest}))
+    }
+    updates = [{"injury_id": existing[_injury_key(r)], "new_end_date": r["end_date"]}
+               for r in rest if _injury_key(r) in existing]
+    inserts = [r for r in rest if _injury_key(r) not in existing]
+    if updates:
+        db.execute(
+            update(table).where(table.c.id == bindparam("injury_id")).values(end_date=bindparam("new_end_date")),
+            updates,
+        )
+    if inserts:
+        db.execute(insert(table), inserts)
+
+def create_injury(db: Session, player_id: int, injury: schemas.InjuryCreate):
+    """Add an injury; one with the same (start_date, injury_type) gets this end_date instead"""
+    _upsert_injury_rows(db, [{"player_id": player_id, **injury.dict()}])
+    _injuries_changed(db, [player_id])
+    return find_injury(db, player_id, injury.start_date, injury.injury_type)
+
+def update_injury(db: Session, db_injury: models.Injury, updated_injury: schemas.InjuryCreate):
+    """Caller checks that no other injury of the player has the new (start_date, injury_type)"""
+    db_injury.start_date = updated_injury.start_date
+    db_injury.end_date = updated_injury.end_date
+    db_injury.injury_type = updated_injury.injury_type
+    _injuries_changed(db, [db_injury.player_id])
+    db.refresh(db_injury)
+    return db_injury
+
+def delete_injury(db: Session, db_injury: models.Injury):
+    player_id = db_injury.player_id
+    db.delete(db_injury)
+    _injuries_changed(db, [player_id])
+    return db_injury
+
+@traced("crud.bulk_upsert_injuries")
+def bulk_upsert_injuries(db: Session, records: list):
+    """
+    Insert or update many injuries (dicts with player_id, start_date and optional end_date / injury_type)
+    in one transaction, keyed by (player_id, start_date, injury_type): re-importing a list adds nothing.
+    Returns the row count.
+    """
+    if not records:
+        return 0
+    records = [{"end_date": None, "injury_type": None, **r} for r in records]
+    _upsert_injury_rows(db, records)
+    _injuries_changed(db, {r["player_id"] for r in records})
+    return len(records)
+
+def _drop_duplicate_injuries(db: Session):
+    """Keep the first of injuries sharing (player_id, start_date, injury_type), so the unique index can be built"""
+    keep = select(func.min(models.Injury.id)).group_by(*(getattr(models.Injury, c) for c in INJURY_KEY_COLUMNS))
+    duplicates = db.query(models.Injury.player_id).filter(models.Injury.id.not_in(keep)).distinct().all()
+    if duplicates:
+        db.query(models.Injury).filter(models.Injury.id.not_in(keep)).delete(synchronize_session=False)
+        _injuries_changed(db, [player_id for (player_id,) in duplicates])
+
+# =========================
+# Change counters (ETags)
+# =========================
+def _bump_counters(db: Session, model, key_col, keys):
+    keys = {k for k in keys if k is not None}
+    if not keys:
+        return
+    db.query(model).filter(key_col.in_(list(keys))).update(
+        {model.version: model.version + 1}, synchronize_session=False
+    )
+    existing = {k for (k,) in db.query(key_col).filter(key_col.in_(list(keys)))}
+    if keys - existing:
+        db.execute(insert(model), [{key_col.key: k, "version": 1} for k in keys - existing])
+
+def _bump_change_versions(db: Session, player_ids=(), teams=()):
+    """Same transaction as the change: move the players' and teams' ETag counters"""
+    _bump_counters(db, models.PlayerVersion, models.PlayerVersion.player_id, player_ids)
+    _bump_counters(db, models.TeamVersion, models.TeamVersion.team, teams)
+
+def _change_versions_stmt(player_id: int):
+    return (
+        select(
+            func.coalesce(models.PlayerVersion.version, 0),
+            func.coalesce(models.TeamVersion.version, 0),
+        )
+        .select_from(models.Player)
+        .outerjoin(models.PlayerVersion, models.PlayerVersion.player_id == models.Player.id)
+        .outerjoin(models.TeamVersion, models.TeamVersion.team == models.Player.team)
+        .where(models.Player.id == player_id)
+    )
+
+@traced("crud.get_change_versions")
+def get_change_versions(db: Session, player_id: int):
+    """(player counter, counter of the player's team), or None if the player does not exist"""
+    row = db.execute(_change_versions_stmt(player_id)).first()
+    return tuple(row) if row is not None else None
+
+# =========================
+# Stat aggregates (radar)
+# =========================
+AGGREGATE_METRICS = ("goals", "assists", "touches", "tackles_won")
+
+def _stat_metrics(db_stat: models.Stat):
+    return {m: getattr(db_stat, m) or 0 for m in AGGREGATE_METRICS}
+
+def _add_to_aggregate(db: Session, model, key_col, key, metrics: dict, count: int):
+    """
+    Increment one aggregate row in SQL (no read-modify-write), creating it on first use. One upsert
+    where the dialect has one, so two writers creating the same row at once both land; elsewhere an
+    UPDATE, then an INSERT when no row matched.
+    """
+    table = model.__table__
+    sums = {f"{m}_sum": metrics[m] for m in AGGREGATE_METRICS}
+    increments = {
+        "stat_count": table.c.stat_count + count,
+        "version": table.c.version + 1,
+        **{name: table.c[name] + value for name, value in sums.items()},
+    }
+    row = {key_col.key: key, "stat_count": count, "version": 1, **sums}
+    dialect = db.connection().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        db.execute(dialect_insert(table).values(row).on_conflict_do_update(
+            index_elements=[table.c[key_col.key]], set_=increments,
+        ))
+        return
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        db.execute(mysql_insert(table).values(row).on_duplicate_key_update(increments))
+        return
+    if not db.execute(update(table).where(table.c[key_col.key] == key).values(increments)).rowcount:
+        db.execute(insert(table).values(row))
+
+def _bump_player_versions(db: Session, player_ids):
+    """New prediction version for players whose non-stat inputs (market values, injuries) changed"""
+    for player_id in player_ids:
+        _add_to_aggregate(
+            db, models.PlayerStatAggregate, models.PlayerStatAggregate.player_id, player_id,
+            dict.fromkeys(AGGREGATE_METRICS, 0), 0,
+        )
+
+def _bump_aggregates(db: Session, player_id: int, team, metrics: dict, count: int):
+    """Apply a stat delta to the player's and the team's running aggregates (same transaction as the stat)"""
+    _add_to_aggregate(db, models.PlayerStatAggregate, models.PlayerStatAggregate.player_id, player_id, metrics, count)
+    if team is not None:
+        _add_to_aggregate(db, models.TeamStatAggregate, models.TeamStatAggregate.team, team, metrics, count)
+
+def _move_player_aggregate(db: Session, player_id: int, old_team, new_team):
+    """Move a player's totals from one team aggregate to another (new_team=None just removes them)"""
+    agg = get_player_aggregate(db, player_id)
+    if agg is None or not agg.stat_count:
+        return
+    metrics = {m: getattr(agg, f"{m}_sum") for m in AGGREGATE_METRICS}
+    if old_team is not None:
+        negated = {m: -v for m, v in metrics.items()}
+        _add_to_aggregate(db, models.TeamStatAggregate, models.TeamStatAggregate.team, old_team, negated, -agg.stat_count)
+    if new_team is not None:
+        _add_to_aggregate(db, models.TeamStatAggregate, models.TeamStatAggregate.team, new_team, metrics, agg.stat_count)
+
+def _reset_player_aggregate(db: Session, player_id: int):
+    """Zero a deleted player's totals and bump the version; the row stays so the version never restarts"""
+    model = models.PlayerStatAggregate
+    values = {model.stat_count: 0, model.version: model.version + 1}
+    values.update({getattr(model, f"{m}_sum"): 0 for m in AGGREGATE_METRICS})
+    if not db.query(model).filter(model.player_id == player_id).update(values, synchronize_session=False):
+        db.add(model(player_id=player_id, stat_count=0, version=1, **{f"{m}_sum": 0 for m in AGGREGATE_METRICS}))
+        db.flush()
+
+def get_player_aggregate(db: Session, player_id: int):
+    return db.get(models.PlayerStatAggregate, player_id, populate_existing=True)
+
+def get_stats_version(db: Session, player_id: int):
+    """Version of the player's prediction inputs (bumped by every stat, market value or injury change); 0 if none"""
+    version = (
+        db.query(models.PlayerStatAggregate.version)
+        .filter(models.PlayerStatAggregate.player_id == player_id)
+        .scalar()
+    )
+    return version or 0
+
+def get_team_aggregate(db: Session, team: str):
+    return db.get(models.TeamStatAggregate, team, populate_existing=True)
+
+def _expected_aggregates(db: Session):
+    """Recompute {player_id: row} and {team: row} from the stats table (players that still exist only)"""
+    sums = [func.coalesce(func.sum(func.coalesce(getattr(models.Stat, m), 0)), 0) for m in AGGREGATE_METRICS]
+
+    def grouped(key_col):
+        rows = (
+            db.query(key_col, func.count(models.Stat.id), *sums)
+            .join(models.Player, models.Player.id == models.Stat.player_id)
+            .filter(key_col.isnot(None))
+            .group_by(key_col)
+            .all()
+        )
+        return {
+            r[0]: {"stat_count": r[1], **{f"{m}_sum": r[2 + i] for i, m in enumerate(AGGREGATE_METRICS)}}
+            for r in rows
+        }
+
+    return grouped(models.Stat.player_id), grouped(models.Player.team)
+
+def rebuild_stat_aggregates(db: Session):
+    """Recompute every player/team aggregate from scratch. Versions keep increasing so caches see the change."""
+    expected_players, expected_teams = _expected_aggregates(db)
+    for model, key_name, expected in (
+        (models.PlayerStatAggregate, "player_id", expected_players),
+        (models.TeamStatAggregate, "team", expected_teams),
+    ):
+        versions = {getattr(r, key_name): r.version for r in db.query(model).all()}
+        db.query(model).delete(synchronize_session=False)
+        for key in set(versions) | set(expected):
+            values = expected.get(key, {"stat_count": 0, **{f"{m}_sum": 0 for m in AGGREGATE_METRICS}})
+            db.add(model(**{key_name: key}, version=versions.get(key, 0) + 1, **values))
+    db.commit()
+    cache.team_injury_baselines.clear()
+    cache.player_predictions.clear()
+    cache.dirty_players.mark_all()
+    cache.dirty_percentiles.mark_all()
+    rolling_states.clear()
+    return {"players": len(expected_players), "teams": len(expected_teams)}
+
+def verify_stat_aggregates(db: Session):
+    """Compare stored aggregates with a fresh recomputation. Returns a list of mismatch descriptions."""
+    expected_players, expected_teams = _expected_aggregates(db)
+    zero = {"stat_count": 0, **{f"{m}_sum": 0 for m in AGGREGATE_METRICS}}
+    problems = []
+    for model, key_name, expected in (
+        (models.PlayerStatAggregate, "player_id", expected_players),
+        (models.TeamStatAggregate, "team", expected_teams),
+    ):
+        stored = {getattr(r, key_name): {k: getattr(r, k) for k in zero} for r in db.query(model).all()}
+        for key in set(stored) | set(expected):
+            want, have = expected.get(key, zero), stored.get(key, zero)
+            if want != have:
+                problems.append(f"{model.__tablename__}[{key!r}]: stored {have}, expected {want}")
+    return problems
+
+def ensure_stat_aggregates(db: Session):
+    """Build the aggregates once for databases that have stats but predate the aggregate tables"""
+    if db.query(models.PlayerStatAggregate).first() is None and db.query(models.Stat).first() is not None:
+        rebuild_stat_aggregates(db)
+
+def migrate(engine):
+    """Create missing tables and indexes, then backfill derived tables (python -m backend.manage migrate)"""
+    if "injuries" in inspect(engine).get_table_names():
+        with Session(bind=engine, autoflush=False) as db:
+            _drop_duplicate_injuries(db)
+    models.create_schema(engine)
+    with Session(bind=engine, autoflush=False) as db:
+        ensure_stat_aggregates(db)
+
+@traced("crud.get_percentile_rows")
+def get_percentile_rows(db: Session, player_ids=None):
+    """
+    Per player with stats (all, or player_ids): id, position, stat count, metric sums, then their
+    snapshot's avg_minutes, injury_probability, investment_pct_change, injury_features and computed_at
+    (NULL without one). Reads one row per player; the percentile index never scans stats.
+    """
+    agg, snap = models.PlayerStatAggregate, models.PredictionSnapshot
+    stmt = (
+        select(
+            models.Player.id, models.Player.position, agg.stat_count,
+            *(getattr(agg, f"{m}_sum") for m in AGGREGATE_METRICS),
+            snap.avg_minutes, snap.injury_probability, snap.investment_pct_change, snap.injury_features,
+            snap.computed_at,
+        )
+        .join(agg, agg.player_id == models.Player.id)
+        .outerjoin(snap, snap.player_id == models.Player.id)
+        .where(agg.stat_count > 0)
+    )
+    if player_ids is not None:
+        stmt = stmt.where(models.Player.id.in_(list(player_ids)))
+    return db.execute(stmt).all()
+
+# =========================
+# Async reads (AsyncSession, used by the async def routes)
+# =========================
+@traced("crud.get_players_async")
+async def get_players_async(db: AsyncSession, after_id: int = None, limit: int = None):
+    """Async get_players"""
+    return (await db.scalars(_players_stmt(after_id, limit))).all()
+
+@traced("crud.get_player_rows_async")
+async def get_player_rows_async(db: AsyncSession, columns, after_id: int = None, limit: int = None):
+    """get_players_async as plain tuples of `columns` (no ORM objects), for fastjson rendering"""
+    return (await db.execute(_players_stmt(after_id, limit, columns))).all()
+
+@traced("crud.get_player_async")
+async def get_player_async(db: AsyncSession, player_id: int):
+    return await db.get(models.Player, player_id)
+
+@traced("crud.get_stats_for_player_async")
+async def get_stats_for_player_async(
+    db: AsyncSession, player_id: int, date_from=None, date_to=None, after=None, limit: int = None
+):
+    """Async get_stats_for_player"""
+    return (await db.scalars(_stats_for_player_stmt(player_id, date_from, date_to, after, limit))).all()
+
+@traced("crud.get_stat_rows_for_player_async")
+async def get_stat_rows_for_player_async(
+    db: AsyncSession, player_id: int, columns, date_from=None, date_to=None, after=None, limit: int = None
+):
+    """get_stats_for_player_async as plain tuples of `columns` (no ORM objects), for fastjson rendering"""
+    return (await db.execute(_stats_for_player_stmt(player_id, date_from, date_to, after, limit, columns))).all()
+
+@traced("crud.get_stat_async")
+async def get_stat_async(db: AsyncSession, stat_id: int):
+    return await db.get(models.Stat, stat_id)
+
+async def get_player_aggregate_async(db: AsyncSession, player_id: int):
+    return await db.get(models.PlayerStatAggregate, player_id, populate_existing=True)
+
+async def get_team_aggregate_async(db: AsyncSession, team: str):
+    return await db.get(models.TeamStatAggregate, team, populate_existing=True)
+
+@traced("crud.get_change_versions_async")
+async def get_change_versions_async(db: AsyncSession, player_id: int):
+    row = (await db.execute(_change_versions_stmt(player_id))).first()
+    return tuple(row) if row is not None else None
+
+async def get_stats_version_async(db: AsyncSession, player_id: int):
+    """Async get_stats_version"""
+    version = await db.scalar(
+        select(models.PlayerStatAggregate.version).where(models.PlayerStatAggregate.player_id == player_id)
+    )
+    return version or 0
@@ -1,10 +1,84 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+from . import config, metrics
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+# async drivers for the sync URLs we support; an explicit SOCCER_ASYNC_DATABASE_URL wins
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "mysql": "mysql+aiomysql"}
+
+
+def _async_url(url):
+    if config.ASYNC_DATABASE_URL:
+        return config.ASYNC_DATABASE_URL
+    url = make_url(url)
+    return url.set(drivername=_ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def _engine_kwargs(url):
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return {"connect_args": {"check_same_thread": False}}
+        return {
+            "connect_args": {"check_same_thread": False},
+            "pool_size": config.DB_POOL_SIZE,
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "pool_timeout": config.DB_POOL_TIMEOUT,
+        }
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _sqlite_pragmas():
+    """PRAGMAs run on every new SQLite connection for the configured storage mode"""
+    pragmas = [f"PRAGMA busy_timeout = {config.SQLITE_BUSY_TIMEOUT_MS}"]
+    if config.SQLITE_STORAGE_MODE == "wal":
+        pragmas += [
+            "PRAGMA journal_mode = WAL",
+            f"PRAGMA synchronous = {config.SQLITE_SYNCHRONOUS}",
+            f"PRAGMA cache_size = -{config.SQLITE_CACHE_SIZE_KB}",
+            f"PRAGMA mmap_size = {config.SQLITE_MMAP_SIZE}",
+            "PRAGMA temp_store = MEMORY",
+        ]
+    elif config.SQLITE_STORAGE_MODE != "default":
+        raise ValueError(f"Unknown SOCCER_SQLITE_STORAGE_MODE: {config.SQLITE_STORAGE_MODE!r}")
+    return pragmas
+
+
+def _tune_sqlite(engine):
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = _sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+_tune_sqlite(engine)
+metrics.instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the `async def` read routes; same database, its own connection pool.
+# aiosqlite ignores check_same_thread, so the sync connect_args are dropped.
+_async_kwargs = {k: v for k, v in _engine_kwargs(SQLALCHEMY_DATABASE_URL).items() if k != "connect_args"}
+async_engine = create_async_engine(_async_url(SQLALCHEMY_DATABASE_URL), **_async_kwargs)
+_tune_sqlite(async_engine.sync_engine)
+metrics.instrument_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
@@ -0,0 +1,71 @@
+# backend/etags.py
+"""
+Conditional GETs for the per-player read routes.
+
+- etag(*parts): strong ETag for a response identified by its route, parameters and the change
+  counters it depends on (crud.get_change_versions, model versions, ...)
+- lookup(request, etag): 304 Not Modified when If-None-Match matches, the cached body when this
+  process rendered it before, else None
+- store(etag, tag, content, headers=None): render `content` as JSON, cache the bytes under the
+  ETag (cache.responses, size-bounded LRU tagged by player id) and return the response;
+  store_body() does the same for a body rendered elsewhere (fastjson)
+
+Counters live in the database and change in the same transaction as the data, so a repeat view
+costs one primary-key lookup of the counters, whichever worker served the first view. Routes read
+the counters before the data in the same session (one read snapshot on SQLite), so a body is never
+older than the counters in its ETag. Entries
+of outdated ETags are never hit again; crud drops a player's entries on changes to free the memory.
+"""
+
+import hashlib
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+
+from .cache import responses
+from .metrics import TimedJSONResponse
+
+CACHE_CONTROL = "no-cache"  # clients may keep the body but must revalidate it with If-None-Match
+# bump when a route's response format changes, so clients do not keep bodies in the old format
+_FORMAT = 1
+
+
+def etag(*parts):
+    digest = hashlib.blake2b(repr((_FORMAT,) + parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _matches(if_none_match, current):
+    """If-None-Match uses the weak comparison: W/ prefixes are ignored, "*" matches anything."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == current:
+            return True
+    return False
+
+
+def _headers(etag_value, extra=None):
+    return {**(extra or {}), "ETag": etag_value, "Cache-Control": CACHE_CONTROL}
+
+
+def lookup(request, etag_value):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag_value):
+        return Response(status_code=304, headers=_headers(etag_value))
+    cached = responses.get(etag_value)
+    if cached is None:
+        return None
+    body, headers = cached
+    return Response(content=body, media_type="application/json", headers=_headers(etag_value, headers))
+
+
+def store(etag_value, tag, content, headers=None):
+    response = TimedJSONResponse(jsonable_encoder(content), headers=_headers(etag_value, headers))
+    responses.put(etag_value, (response.body, dict(headers or {})), tag=tag)
+    return response
+
+
+def store_body(etag_value, tag, body, headers=None):
+    """store() for an already rendered JSON body (bytes)."""
+    responses.put(etag_value, (body, dict(headers or {})), tag=tag)
+    return Response(content=body, media_type="application/json", headers=_headers(etag_value, headers))
@@ -0,0 +1,153 @@
+# backend/export.py
+"""
+Streaming exports of the stats table and current predictions (NDJSON or CSV) for warehouse pulls.
+
+Rows are read with a server-side cursor (yield_per) and written out partition by partition, so
+memory stays constant regardless of table size. Both exports accept a `since` watermark:
+- since_id: only stats with id > since_id (predictions: players with such a stat)
+- since_date: only stats with match_date >= since_date (predictions: players with such a stat)
+"""
+
+import csv
+import io
+import json
+import math
+
+from sqlalchemy import select
+
+from . import database, models
+
+# ml.features.FEATURE_COLUMNS, spelled out so that importing this module (the stats export) does not
+# load pandas; backend/tests/test_features.py checks that they still agree
+FEATURE_COLUMNS = ("minutes_sum_7", "minutes_avg_28", "goals_per90_28", "matches_14", "acwr", "minutes_slope")
+
+STAT_EXPORT_COLUMNS = ("id", "player_id", "match_date", "goals", "assists", "minutes_played", "touches", "tackles_won")
+PREDICTION_EXPORT_COLUMNS = (
+    "player_id",
+    "injury_probability",
+    "injury_risk",
+    "injury_model_version",
+    "investment_pct_change",
+    "investment_method",
+    "investment_model_version",
+    *FEATURE_COLUMNS,
+    "last_match_date",
+    "max_stat_id",
+)
+
+
+def _since_filters(since_id=None, since_date=None):
+    filters = []
+    if since_id is not None:
+        filters.append(models.Stat.id > since_id)
+    if since_date is not None:
+        filters.append(models.Stat.match_date >= since_date)
+    return filters
+
+
+def iter_stat_records(since_id=None, since_date=None, batch_size=1000):
+    """Yield lists of stat dicts (one list per fetched partition) in id order."""
+    stmt = (
+        select(*[getattr(models.Stat, c) for c in STAT_EXPORT_COLUMNS])
+        .where(*_since_filters(since_id, since_date))
+        .order_by(models.Stat.id)
+        .execution_options(yield_per=batch_size)
+    )
+    with database.SessionLocal() as db:
+        for partition in db.execute(stmt).partitions():
+            yield [dict(zip(STAT_EXPORT_COLUMNS, row)) for row in partition]
+
+
+def iter_prediction_records(since_id=None, since_date=None, horizon_days=180, batch_size=5000, chunk_players=500):
+    """
+    Yield lists of prediction dicts, scoring `chunk_players` players at a time with the batch engine.
+    Stats are streamed ordered by player, so only one chunk of players is held in memory.
+    """
+    # imported lazily: the stats export should not pay for pandas/NumPy
+    from .ml.injuries import load_injury_index, recent_injury_counts
+    from .ml.market import load_market_trends
+    from .ml.predict import score_players_batch
+    from .ml.store import StatStore
+    from .crud import STAT_ROW_COLUMNS
+
+    stmt = (
+        select(*[getattr(models.Stat, c) for c in STAT_ROW_COLUMNS], models.Stat.id)
+        .join(models.Player, models.Player.id == models.Stat.player_id)
+        .order_by(models.Stat.player_id, models.Stat.match_date, models.Stat.id)
+        .execution_options(yield_per=batch_size)
+    )
+    since = _since_filters(since_id, since_date)
+    if since:
+        changed = select(models.Stat.player_id).where(*since).distinct()
+        stmt = stmt.where(models.Stat.player_id.in_(changed))
+
+    def score(rows):
+        watermarks = {}
+        for row in rows:
+            player_id, match_date, stat_id = row[0], row[1], row[-1]
+            last_date, max_id = watermarks.get(player_id, (match_date, stat_id))
+            watermarks[player_id] = (max(last_date, match_date), max(max_id, stat_id))
+        store = StatStore.from_rows([row[:-1] for row in rows])
+        chunk_filter = models.Player.id.in_(store.player_ids.tolist())
+        with database.SessionLocal() as chunk_db:
+            market = load_market_trends(chunk_db, chunk_filter, horizon_days=horizon_days)
+            injuries = recent_injury_counts(load_injury_index(chunk_db, chunk_filter), store)
+        results = score_players_batch(store, horizon_days=horizon_days, market=market, injuries=injuries)
+        records = []
+        for player_id, result in results.items():
+            injury, investment = result["injury"], result["investment"]
+            last_date, max_id = watermarks[player_id]
+            records.append({
+                "player_id": player_id,
+                "injury_probability": injury["probability"],
+                "injury_risk": injury["risk"],
+                "injury_model_version": injury["model_version"],
+                "investment_pct_change": investment["predicted_pct_change"],
+                "investment_method": investment["method"],
+                "investment_model_version": investment["model_version"],
+                **{c: injury["features"][c] for c in FEATURE_COLUMNS},
+                "last_match_date": last_date.isoformat() if last_date else None,
+                "max_stat_id": max_id,
+            })
+        return records
+
+    pending, players = [], set()
+    with database.SessionLocal() as db:
+        for partition in db.execute(stmt).partitions():
+            for row in partition:
+                if row[0] not in players and len(players) >= chunk_players:
+                    yield score(pending)
+                    pending, players = [], set()
+                pending.append(tuple(row))
+                players.add(row[0])
+    if pending:
+        yield score(pending)
+
+
+def _jsonable(value):
+    """value with NaN/inf as None (neither is valid JSON) and dates as ISO strings, recursing into dicts and lists."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def to_ndjson(record_batches):
+    for batch in record_batches:
+        yield "".join(json.dumps(_jsonable(r)) + "\n" for r in batch)
+
+
+def to_csv(record_batches, columns):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns, lineterminator="\n")
+    writer.writeheader()
+    for batch in record_batches:
+        writer.writerows(batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
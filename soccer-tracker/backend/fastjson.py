@@ -0,0 +1,69 @@
+# backend/fastjson.py
+"""
+Fast JSON rendering for the list routes (GET /players, GET /players/{id}/stats).
+
+- record_fields(schema): a response schema's field names, in the order FastAPI emits them
+- columns_for(model, fields): the ORM columns to select for those fields
+- render_rows(fields, rows, encoder=None): JSON array of objects from plain column tuples, as bytes
+- standard_render(schema, objects): the response_model path (Pydantic validation + JSONResponse),
+  the reference render_rows is checked against
+
+Uses orjson when installed, otherwise json.dumps with the settings of Starlette's JSONResponse.
+For rows that pass the schema (ints, strings, dates) both produce exactly the bytes of the
+response_model path: compact separators, UTF-8, dates as ISO strings (backend/tests/test_fastjson.py
+checks this). The routes keep their response_model, so the OpenAPI
+schema is unchanged; config.FAST_LIST_RESPONSES=0 switches back to ORM objects + Pydantic.
+"""
+
+import json
+from datetime import date
+from typing import List
+
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse
+
+from .metrics import span
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the json fallback produces the same bytes
+    orjson = None
+
+
+def record_fields(schema):
+    return tuple(schema.model_fields)
+
+
+def columns_for(model, fields):
+    return tuple(getattr(model, f) for f in fields)
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_dumps(content):
+    """The fallback encoder: Starlette JSONResponse settings, dates as ISO strings."""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+def dumps(content):
+    return orjson.dumps(content) if orjson is not None else json_dumps(content)
+
+
+def render_rows(fields, rows, encoder=None):
+    with span("api.render_json") as current:
+        body = (encoder or dumps)([dict(zip(fields, row)) for row in rows])
+        current.rows = len(body)
+    return body
+
+
+def standard_render(schema, objects):
+    """Bytes FastAPI sends for `objects` under response_model=List[schema]."""
+    adapter = TypeAdapter(List[schema])
+    value = adapter.validate_python(objects, from_attributes=True)
+    return JSONResponse(adapter.dump_python(value, mode="json", by_alias=True)).body
@@ -0,0 +1,274 @@
+# backend/ingest.py
+"""
+Bulk stat ingestion for Soccer Tracker.
+
+- import_stats(db, fileobj, filename, chunk_size): stream a CSV or Parquet file in chunks, validate
+  each chunk with vectorized pandas checks, resolve players in bulk and insert the valid rows with
+  one executemany + commit per chunk (crud.bulk_create_stats). Invalid rows are reported, not fatal.
+- import_market_values(...): the same for valuation feeds, upserted per (player, date)
+  (crud.bulk_upsert_market_values)
+- import_injuries(...): the same for injury lists, upserted per (player, start_date, injury_type)
+  (crud.bulk_upsert_injuries)
+
+Expected columns: player_id or player_name, match_date, goals, assists, minutes_played, touches, tackles_won.
+Valuation feeds: player_id or player_name, date, market_value and optionally source.
+Injury lists: player_id or player_name, start_date and optionally end_date, injury_type.
+"""
+
+import pandas as pd
+
+from . import crud
+
+STAT_METRICS = ("goals", "assists", "minutes_played", "touches", "tackles_won")
+REQUIRED_COLUMNS = ("match_date",) + STAT_METRICS
+MARKET_REQUIRED_COLUMNS = ("date", "market_value")
+INJURY_REQUIRED_COLUMNS = ("start_date",)
+
+
+class IngestError(ValueError):
+    """
+    The file as a whole cannot be imported (unknown format, missing columns, unreadable). When chunks
+    before the failure were already committed, `summary` holds the import summary up to there.
+    """
+
+    def __init__(self, message, summary=None):
+        super().__init__(message)
+        self.summary = summary
+
+
+def detect_format(filename: str, content_type: str = None):
+    name = (filename or "").lower()
+    if name.endswith(".parquet") or name.endswith(".pq") or (content_type or "").endswith("parquet"):
+        return "parquet"
+    if name.endswith(".csv") or (content_type or "") in ("text/csv", "application/csv"):
+        return "csv"
+    raise IngestError("Unsupported file type: upload a .csv or .parquet file")
+
+
+def iter_chunks(fileobj, fmt: str, chunk_size: int):
+    """
+    Yield DataFrames of at most chunk_size rows without loading the whole file; a file without rows
+    yields one empty frame with its columns (none for an empty CSV), so they are always checked.
+    Unreadable input (malformed CSV, bad encoding, not Parquet) raises IngestError.
+    """
+    if fmt == "csv":
+        try:
+            yield from pd.read_csv(fileobj, chunksize=chunk_size, dtype=str, skipinitialspace=True)
+        except pd.errors.EmptyDataError:
+            yield pd.DataFrame()
+        except (ValueError, OSError) as e:  # ParserError, UnicodeDecodeError
+            raise IngestError(f"Cannot read the CSV file: {e}") from e
+    else:
+        try:
+            import pyarrow
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise IngestError("Parquet upload requires the 'pyarrow' package (pinned in backend/requirements.txt)")
+        try:
+            parquet = pq.ParquetFile(fileobj)
+            empty = True
+            for batch in parquet.iter_batches(batch_size=chunk_size):
+                empty = False
+                yield batch.to_pandas()
+            if empty:
+                yield parquet.schema_arrow.empty_table().to_pandas()
+        except (pyarrow.ArrowException, ValueError, OSError) as e:
+            raise IngestError(f"Cannot read the Parquet file: {e}") from e
+
+
+def _check_columns(df, required=REQUIRED_COLUMNS):
+    missing = [c for c in required if c not in df.columns]
+    if "player_id" not in df.columns and "player_name" not in df.columns:
+        missing.insert(0, "player_id or player_name")
+    if missing:
+        raise IngestError(f"Missing required columns: {', '.join(missing)}")
+
+
+def _check_market_columns(df):
+    _check_columns(df, MARKET_REQUIRED_COLUMNS)
+
+
+def _check_injury_columns(df):
+    _check_columns(df, INJURY_REQUIRED_COLUMNS)
+
+
+def _error_flagger(n_rows):
+    """(error series, flag(mask, message)) recording the first problem of every row."""
+    error = pd.Series("", index=range(n_rows), dtype=object)
+
+    def flag(mask, message):
+        mask = pd.Series(mask, index=error.index).fillna(False).astype(bool)
+        error[mask & (error == "")] = message
+
+    return error, flag
+
+
+def _resolve_players(db, df, flag):
+    """Int64 player ids per row from player_id (wins) or player_name; unresolvable rows are flagged."""
+    player_id = pd.Series(pd.NA, index=df.index, dtype="Int64")
+    if "player_id" in df.columns:
+        raw_id = pd.to_numeric(df["player_id"], errors="coerce")
+        has_id = df["player_id"].notna() & (df["player_id"].astype(str).str.strip() != "")
+        flag(has_id & (raw_id.isna() | (raw_id % 1 != 0)), "invalid player_id")
+        ok_id = has_id & raw_id.notna() & (raw_id % 1 == 0)
+        player_id[ok_id] = raw_id[ok_id].astype("int64")
+        existing = crud.get_existing_player_ids(db, player_id.dropna().unique().tolist())
+        flag(player_id.notna() & ~player_id.isin(list(existing)), "unknown player_id")
+    if "player_name" in df.columns:
+        names = df["player_name"].fillna("").astype(str).str.strip()
+        by_name = player_id.isna() & (names != "")
+        matches = crud.get_player_ids_by_name(db, names[by_name].unique().tolist())
+        candidates = names.map(lambda n: matches.get(n, []))
+        n_matches = candidates.map(len)
+        flag(by_name & (n_matches > 1), "ambiguous player_name")
+        flag(by_name & (n_matches == 0), "unknown player_name")
+        unique = by_name & (n_matches == 1)
+        player_id[unique] = candidates[unique].map(lambda ids: ids[0]).astype("int64")
+    flag(player_id.isna(), "missing player_id/player_name")
+    return player_id
+
+
+def validate_chunk(db, df: pd.DataFrame):
+    """
+    Vectorized validation of one chunk. Returns (records, errors) where records are dicts ready for
+    crud.bulk_create_stats and errors maps chunk position -> message (first problem per row).
+    """
+    df = df.reset_index(drop=True)
+    error, flag = _error_flagger(len(df))
+    player_id = _resolve_players(db, df, flag)
+
+    dates = pd.to_datetime(df["match_date"], errors="coerce", format="ISO8601")
+    flag(dates.isna(), "invalid match_date")
+
+    values = {}
+    for col in STAT_METRICS:
+        v = pd.to_numeric(df[col], errors="coerce")
+        flag(v.isna(), f"missing or non-numeric {col}")
+        flag(v.notna() & ((v % 1 != 0) | (v < 0)), f"{col} must be a non-negative integer")
+        values[col] = v
+
+    ok = error == ""
+    columns = {
+        "player_id": player_id[ok].astype("int64").tolist(),
+        "match_date": dates[ok].dt.date.tolist(),
+        **{col: values[col][ok].astype("int64").tolist() for col in STAT_METRICS},
+    }
+    records = [dict(zip(columns, row)) for row in zip(*columns.values())]
+    return records, error[~ok].to_dict()
+
+
+def validate_market_chunk(db, df: pd.DataFrame):
+    """validate_chunk for valuation feeds: records ready for crud.bulk_upsert_market_values."""
+    df = df.reset_index(drop=True)
+    error, flag = _error_flagger(len(df))
+    player_id = _resolve_players(db, df, flag)
+
+    dates = pd.to_datetime(df["date"], errors="coerce", format="ISO8601")
+    flag(dates.isna(), "invalid date")
+    value = pd.to_numeric(df["market_value"], errors="coerce")
+    flag(value.isna(), "missing or non-numeric market_value")
+    flag(value.notna() & (value < 0), "market_value must be non-negative")
+
+    ok = error == ""
+    columns = {
+        "player_id": player_id[ok].astype("int64").tolist(),
+        "date": dates[ok].dt.date.tolist(),
+        "market_value": value[ok].astype(float).tolist(),
+    }
+    if "source" in df.columns:
+        source = df["source"].astype(object).where(df["source"].notna(), None)
+        columns["source"] = source[ok].tolist()
+    records = [dict(zip(columns, row)) for row in zip(*columns.values())]
+    # a feed listing the same (player, date) twice: the last row wins, as it would row by row
+    records = list({(r["player_id"], r["date"]): r for r in records}.values())
+    return records, error[~ok].to_dict()
+
+
+def validate_injury_chunk(db, df: pd.DataFrame):
+    """validate_chunk for injury lists: records ready for crud.bulk_upsert_injuries."""
+    df = df.reset_index(drop=True)
+    error, flag = _error_flagger(len(df))
+    player_id = _resolve_players(db, df, flag)
+
+    start = pd.to_datetime(df["start_date"], errors="coerce", format="ISO8601")
+    flag(start.isna(), "invalid start_date")
+    if "end_date" in df.columns:
+        has_end = df["end_date"].notna() & (df["end_date"].astype(str).str.strip() != "")
+        end = pd.to_datetime(df["end_date"].where(has_end), errors="coerce", format="ISO8601")
+        flag(has_end & end.isna(), "invalid end_date")
+        flag(end.notna() & start.notna() & (end < start), "end_date before start_date")
+
+    ok = error == ""
+    columns = {
+        "player_id": player_id[ok].astype("int64").tolist(),
+        "start_date": start[ok].dt.date.tolist(),
+    }
+    if "end_date" in df.columns:
+        columns["end_date"] = [None if pd.isna(d) else d.date() for d in end[ok]]
+    if "injury_type" in df.columns:
+        columns["injury_type"] = df["injury_type"].astype(object).where(df["injury_type"].notna(), None)[ok].tolist()
+    records = [dict(zip(columns, row)) for row in zip(*columns.values())]
+    return records, error[~ok].to_dict()
+
+
+def _import(fileobj, fmt, chunk_size, max_errors, check_columns, validate, write):
+    summary = {"format": fmt, "rows": 0, "inserted": 0, "rejected": 0, "chunks": 0, "errors": [], "errors_truncated": False}
+    first_row = 1
+    try:
+        for chunk in iter_chunks(fileobj, fmt, chunk_size):
+            if summary["chunks"] == 0:
+                check_columns(chunk)
+            records, errors = validate(chunk)
+            summary["inserted"] += write(records)
+            summary["rejected"] += len(errors)
+            for pos, message in errors.items():
+                if len(summary["errors"]) >= max_errors:
+                    summary["errors_truncated"] = True
+                    break
+                summary["errors"].append({"row": first_row + pos, "error": message})
+            summary["rows"] += len(chunk)
+            summary["chunks"] += 1
+            first_row += len(chunk)
+    except IngestError as e:
+        if not summary["chunks"]:
+            raise
+        # each chunk commits on its own: tell the caller what already landed
+        raise IngestError(
+            f"{e} (after row {first_row - 1}; {summary['inserted']} rows from the first "
+            f"{summary['chunks']} chunks were already committed)",
+            summary,
+        ) from e
+    return summary
+
+
+def import_stats(db, fileobj, filename: str, content_type: str = None, chunk_size: int = 10_000, max_errors: int = 1000):
+    """Stream, validate and insert a stats file. Returns a summary with per-row errors (1-based data rows)."""
+    fmt = detect_format(filename, content_type)
+    return _import(
+        fileobj, fmt, chunk_size, max_errors, _check_columns,
+        lambda chunk: validate_chunk(db, chunk), lambda records: crud.bulk_create_stats(db, records),
+    )
+
+
+def import_market_values(db, fileobj, filename: str, content_type: str = None, chunk_size: int = 10_000, max_errors: int = 1000):
+    """
+    Stream, validate and upsert a valuation feed (one transaction per chunk). Same summary as
+    import_stats; "inserted" counts written rows, including replaced (player, date) values.
+    """
+    fmt = detect_format(filename, content_type)
+    return _import(
+        fileobj, fmt, chunk_size, max_errors, _check_market_columns,
+        lambda chunk: validate_market_chunk(db, chunk), lambda records: crud.bulk_upsert_market_values(db, records),
+    )
+
+
+def import_injuries(db, fileobj, filename: str, content_type: str = None, chunk_size: int = 10_000, max_errors: int = 1000):
+    """
+    Stream, validate and upsert an injury list (one transaction per chunk). Same summary as import_stats;
+    an injury already stored (same player, start_date and injury_type) gets the file's end_date.
+    """
+    fmt = detect_format(filename, content_type)
+    return _import(
+        fileobj, fmt, chunk_size, max_errors, _check_injury_columns,
+        lambda chunk: validate_injury_chunk(db, chunk), lambda records: crud.bulk_upsert_injuries(db, records),
+    )
@@ -1,26 +1,68 @@
 # backend/main.py
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
-import pandas as pd
+from contextlib import asynccontextmanager
+from datetime import date
+import asyncio
+import heapq
+import importlib
+import json
+import logging
+import threading
 
 # app modules
-from . import models, schemas, crud, database
-
-# Import ML helpers (relative import)
-from .ml.predict import (
-    predict_injury_from_stats_df,
-    predict_investment_from_stats_df,
-    predict_injury,
-    predict_investment,
-)
+from . import models, schemas, crud, config, database, etags, fastjson, metrics, snapshots, writebehind
+from .ml import batch
+
+# The ML modules (NumPy / pandas), ingest, export and percentiles are imported where they are used, so a
+# worker starts without them; the lifespan pre-warms them in the background. The schema is created by
+# `python -m backend.manage migrate`, not at import. Import costs: `python -m backend.manage startup-report`.
+logger = logging.getLogger(__name__)
 
-# Create DB tables if they don't exist
-models.Base.metadata.create_all(bind=database.engine)
+PREWARM_MODULES = ("ml.predict", "ml.batch", "ml.registry", "ingest", "export", "percentiles")
 
-app = FastAPI(title="Soccer Tracker API")
+def _prewarm():
+    """Import the lazily loaded modules and load the models, off the request path."""
+    try:
+        with metrics.span("startup.prewarm"):
+            for name in PREWARM_MODULES:
+                importlib.import_module(f".{name}", __package__)
+            from .ml.registry import model_registry
+            model_registry.info()
+    except Exception:  # the first request that needs them imports them (and reports the error) instead
+        logger.exception("Pre-warming the ML modules failed")
+
+def _check_schema():
+    missing = models.missing_schema(database.engine)
+    if not missing:
+        return
+    if not config.AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema is missing {', '.join(missing)}; run `python -m backend.manage migrate`"
+        )
+    logger.info("Creating missing %s (SOCCER_AUTO_MIGRATE)", ", ".join(missing))
+    crud.migrate(database.engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _check_schema()
+    if config.PREWARM_ML:
+        threading.Thread(target=_prewarm, name="ml-prewarm", daemon=True).start()
+    snapshots.start_scheduler()
+    yield
+    # thread / process joins: keep them off the event loop
+    await asyncio.to_thread(snapshots.shutdown_scheduler)
+    await asyncio.to_thread(writebehind.shutdown_queue)
+    await asyncio.to_thread(batch.shutdown_pool)
+    await database.async_engine.dispose()
+
+app = FastAPI(title="Soccer Tracker API", lifespan=lifespan, default_response_class=metrics.TimedJSONResponse)
 
 # CORS - allow frontend dev server
 app.add_middleware(
@@ -29,8 +71,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "X-Prediction-Source", "ETag"],
 )
 
+# Request latency histograms + opt-in per-stage profile (X-Profile: 1 -> Server-Timing header)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Dependency: DB session
 def get_db():
     db = database.SessionLocal()
@@ -39,9 +85,19 @@ def get_db():
     finally:
         db.close()
 
+# Dependency: async DB session for the async def read routes (no threadpool slot while waiting on the DB)
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
 # ------------------------------
 # Health
 # ------------------------------
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Request and stage histograms of this process in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"message": "Soccer Player Tracker API is running!"}
@@ -49,20 +105,54 @@ def root():
 # ------------------------------
 # Player endpoints (CRUD)
 # ------------------------------
+# The list routes select plain column tuples and render them with fastjson (same bytes as the
+# response_model path, which still documents them) unless SOCCER_FAST_LIST_RESPONSES=0
+PLAYER_FIELDS = fastjson.record_fields(schemas.Player)
+PLAYER_COLUMNS = fastjson.columns_for(models.Player, PLAYER_FIELDS)
+STAT_FIELDS = fastjson.record_fields(schemas.Stat)
+STAT_COLUMNS = fastjson.columns_for(models.Stat, STAT_FIELDS)
+
 @app.get("/players", response_model=List[schemas.Player])
-def read_players(db: Session = Depends(get_db)):
-    return crud.get_players(db)
+async def read_players(
+    response: Response,
+    after: Optional[int] = Query(None, description="Keyset cursor: only players with id > after (see X-Next-Cursor)"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every player"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    fetch = limit + 1 if limit else None
+    if not config.FAST_LIST_RESPONSES:
+        players = await crud.get_players_async(db, after_id=after, limit=fetch)
+        if limit and len(players) > limit:
+            players = players[:limit]
+            response.headers["X-Next-Cursor"] = str(players[-1].id)
+        return players
+
+    rows = await crud.get_player_rows_async(db, PLAYER_COLUMNS, after_id=after, limit=fetch)
+    headers = {}
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1].id)
+    return Response(fastjson.render_rows(PLAYER_FIELDS, rows), media_type="application/json", headers=headers)
 
 @app.post("/players", response_model=schemas.Player)
 def create_new_player(player: schemas.PlayerCreate, db: Session = Depends(get_db)):
     return crud.create_player(db, player)
 
+# Per-player reads answer If-None-Match with 304 and serve repeat views from the rendered-body
+# cache; the ETag covers the change counters the body depends on (see etags.py)
 @app.get("/players/{player_id}", response_model=schemas.Player)
-def read_player(player_id: int, db: Session = Depends(get_db)):
-    db_player = crud.get_player(db, player_id)
+async def read_player(player_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    versions = await crud.get_change_versions_async(db, player_id)
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    etag = etags.etag("player", player_id, versions[0])
+    cached = etags.lookup(request, etag)
+    if cached is not None:
+        return cached
+    db_player = await crud.get_player_async(db, player_id)
     if not db_player:
         raise HTTPException(status_code=404, detail="Player not found")
-    return db_player
+    return etags.store(etag, player_id, schemas.Player.model_validate(db_player, from_attributes=True))
 
 @app.put("/players/{player_id}", response_model=schemas.Player)
 def update_player(player_id: int, updated_player: schemas.PlayerCreate, db: Session = Depends(get_db)):
@@ -81,21 +171,71 @@ def delete_player(player_id: int, db: Session = Depends(get_db)):
 # ------------------------------
 # Stat endpoints (per-player)
 # ------------------------------
+def _stat_cursor(stat):
+    return f"{stat.match_date.isoformat()}_{stat.id}"
+
+def _parse_stat_cursor(cursor: str):
+    try:
+        match_date, stat_id = cursor.rsplit("_", 1)
+        return date.fromisoformat(match_date), int(stat_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/players/{player_id}/stats", response_model=List[schemas.Stat])
-def read_player_stats(player_id: int, db: Session = Depends(get_db)):
-    if not crud.get_player(db, player_id):
+async def read_player_stats(
+    player_id: int,
+    request: Request,
+    date_from: Optional[date] = Query(None, alias="from", description="Only matches on or after this date"),
+    date_to: Optional[date] = Query(None, alias="to", description="Only matches on or before this date"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the previous page's X-Next-Cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every match"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    versions = await crud.get_change_versions_async(db, player_id)
+    if versions is None:
         raise HTTPException(status_code=404, detail="Player not found")
-    return crud.get_stats_for_player(db, player_id)
+    after = _parse_stat_cursor(cursor) if cursor else None
+    etag = etags.etag("stats", player_id, versions[0], date_from, date_to, cursor, limit)
+    cached = etags.lookup(request, etag)
+    if cached is not None:
+        return cached
+    fetch = limit + 1 if limit else None
+    headers = {}
+    if not config.FAST_LIST_RESPONSES:
+        stats = await crud.get_stats_for_player_async(
+            db, player_id, date_from=date_from, date_to=date_to, after=after, limit=fetch
+        )
+        if limit and len(stats) > limit:
+            stats = stats[:limit]
+            headers["X-Next-Cursor"] = _stat_cursor(stats[-1])
+        return etags.store(etag, player_id, [schemas.Stat.model_validate(s, from_attributes=True) for s in stats], headers)
+
+    rows = await crud.get_stat_rows_for_player_async(
+        db, player_id, STAT_COLUMNS, date_from=date_from, date_to=date_to, after=after, limit=fetch
+    )
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = _stat_cursor(rows[-1])
+    return etags.store_body(etag, player_id, fastjson.render_rows(STAT_FIELDS, rows), headers)
 
 @app.post("/players/{player_id}/stats", response_model=schemas.Stat)
-def create_player_stat(player_id: int, stat: schemas.StatCreate, db: Session = Depends(get_db)):
-    if not crud.get_player(db, player_id):
+async def create_player_stat(player_id: int, stat: schemas.StatCreate, db: AsyncSession = Depends(get_async_db)):
+    if not await crud.get_player_async(db, player_id):
         raise HTTPException(status_code=404, detail="Player not found")
-    return crud.create_stat_for_player(db, player_id, stat)
+    stat_queue = writebehind.get_stat_queue()
+    if stat_queue is not None:
+        # write-behind: answered once the group commit holding this row has committed (see writebehind.py
+        # on durability)
+        return await asyncio.wrap_future(stat_queue.submit(player_id, stat))
+    return await run_in_threadpool(_create_stat, player_id, stat)
+
+def _create_stat(player_id: int, stat: schemas.StatCreate):
+    with database.SessionLocal() as db:
+        return crud.create_stat_for_player(db, player_id, stat)  # refreshed, so usable once detached
 
 @app.get("/players/{player_id}/stats/{stat_id}", response_model=schemas.Stat)
-def read_single_stat(player_id: int, stat_id: int, db: Session = Depends(get_db)):
-    db_stat = crud.get_stat(db, stat_id)
+async def read_single_stat(player_id: int, stat_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_stat = await crud.get_stat_async(db, stat_id)
     if not db_stat or db_stat.player_id != player_id:
         raise HTTPException(status_code=404, detail="Stat not found for this player")
     return db_stat
@@ -115,45 +255,175 @@ def delete_player_stat(player_id: int, stat_id: int, db: Session = Depends(get_d
     crud.delete_stat(db, stat_id)
     return {"message": f"Stat {stat_id} deleted successfully"}
 
+# ------------------------------
+# Bulk stat import (CSV / Parquet)
+# ------------------------------
+@app.post("/stats/import")
+def import_stats_file(
+    file: UploadFile = File(..., description="CSV or Parquet with player_id or player_name, match_date and stat columns"),
+    chunk_size: int = Query(10_000, ge=1, le=200_000, description="Rows per chunk (one transaction each)"),
+    max_errors: int = Query(1000, ge=0, description="Maximum per-row errors to report"),
+    db: Session = Depends(get_db),
+):
+    from . import ingest
+
+    try:
+        return ingest.import_stats(db, file.file, file.filename, file.content_type, chunk_size, max_errors)
+    except ingest.IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ------------------------------
+# Injuries
+# ------------------------------
+def _player_injury(db: Session, player_id: int, injury_id: int):
+    injury = crud.get_injury(db, injury_id)
+    if not injury or injury.player_id != player_id:
+        raise HTTPException(status_code=404, detail="Injury not found for this player")
+    return injury
+
+@app.get("/players/{player_id}/injuries", response_model=List[schemas.Injury])
+def read_player_injuries(player_id: int, db: Session = Depends(get_db)):
+    if not crud.get_player(db, player_id):
+        raise HTTPException(status_code=404, detail="Player not found")
+    return crud.get_injuries(db, player_id)
+
+@app.post("/players/{player_id}/injuries", response_model=schemas.Injury)
+def create_player_injury(player_id: int, injury: schemas.InjuryCreate, db: Session = Depends(get_db)):
+    """Add an injury; posting one the player already has (same start_date and injury_type) updates its end_date."""
+    if not crud.get_player(db, player_id):
+        raise HTTPException(status_code=404, detail="Player not found")
+    return crud.create_injury(db, player_id, injury)
+
+@app.put("/players/{player_id}/injuries/{injury_id}", response_model=schemas.Injury)
+def update_player_injury(player_id: int, injury_id: int, updated: schemas.InjuryCreate, db: Session = Depends(get_db)):
+    injury = _player_injury(db, player_id, injury_id)
+    other = crud.find_injury(db, player_id, updated.start_date, updated.injury_type)
+    if other is not None and other.id != injury_id:
+        raise HTTPException(
+            status_code=409, detail="The player already has an injury with this start_date and injury_type"
+        )
+    return crud.update_injury(db, injury, updated)
+
+@app.delete("/players/{player_id}/injuries/{injury_id}")
+def delete_player_injury(player_id: int, injury_id: int, db: Session = Depends(get_db)):
+    crud.delete_injury(db, _player_injury(db, player_id, injury_id))
+    return {"message": f"Injury {injury_id} deleted successfully"}
+
+@app.post("/injuries/import")
+def import_injuries_file(
+    file: UploadFile = File(..., description="CSV or Parquet with player_id or player_name, start_date [, end_date, injury_type]"),
+    chunk_size: int = Query(10_000, ge=1, le=200_000, description="Rows per chunk (one transaction each)"),
+    max_errors: int = Query(1000, ge=0, description="Maximum per-row errors to report"),
+    db: Session = Depends(get_db),
+):
+    from . import ingest
+
+    try:
+        return ingest.import_injuries(db, file.file, file.filename, file.content_type, chunk_size, max_errors)
+    except ingest.IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ------------------------------
+# Market values
+# ------------------------------
+@app.get("/players/{player_id}/market_values", response_model=List[schemas.MarketValue])
+def read_market_values(
+    player_id: int,
+    date_from: Optional[date] = Query(None, description="Only valuations on or after this date"),
+    date_to: Optional[date] = Query(None, description="Only valuations on or before this date"),
+    db: Session = Depends(get_db),
+):
+    if not crud.get_player(db, player_id):
+        raise HTTPException(status_code=404, detail="Player not found")
+    return crud.get_market_values(db, player_id, date_from=date_from, date_to=date_to)
+
+@app.post("/market_values/import")
+def import_market_values_file(
+    file: UploadFile = File(..., description="CSV or Parquet with player_id or player_name, date, market_value [, source]"),
+    chunk_size: int = Query(10_000, ge=1, le=200_000, description="Rows per chunk (one transaction each)"),
+    max_errors: int = Query(1000, ge=0, description="Maximum per-row errors to report"),
+    db: Session = Depends(get_db),
+):
+    """Bulk load a valuation feed; an existing (player, date) value is replaced."""
+    from . import ingest
+
+    try:
+        return ingest.import_market_values(db, file.file, file.filename, file.content_type, chunk_size, max_errors)
+    except ingest.IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ------------------------------
+# Streaming exports (NDJSON / CSV)
+# ------------------------------
+def _export_response(batches, columns, fmt: str, name: str):
+    from . import export
+
+    if fmt == "csv":
+        return StreamingResponse(
+            export.to_csv(batches, columns),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{name}.csv"'},
+        )
+    return StreamingResponse(export.to_ndjson(batches), media_type="application/x-ndjson")
+
+@app.get("/export/stats")
+def export_stats(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since_id: Optional[int] = Query(None, description="Only stats with id > since_id"),
+    since_date: Optional[date] = Query(None, description="Only stats with match_date >= since_date"),
+):
+    """Stream the stats table in id order with constant memory."""
+    from . import export
+
+    batches = export.iter_stat_records(since_id=since_id, since_date=since_date)
+    return _export_response(batches, export.STAT_EXPORT_COLUMNS, format, "stats")
+
+@app.get("/export/predictions")
+def export_predictions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since_id: Optional[int] = Query(None, description="Only players with a stat id > since_id"),
+    since_date: Optional[date] = Query(None, description="Only players with a match on or after since_date"),
+    horizon_days: int = 180,
+):
+    """Stream current injury / investment predictions for every player (or those changed since the watermark)."""
+    from . import export
+
+    batches = export.iter_prediction_records(since_id=since_id, since_date=since_date, horizon_days=horizon_days)
+    return _export_response(batches, export.PREDICTION_EXPORT_COLUMNS, format, "predictions")
+
 # ------------------------------
 # Radar Chart endpoint
 # ------------------------------
 @app.get("/players/{player_id}/radar")
-def get_radar_data(player_id: int, db: Session = Depends(get_db)):
+async def get_radar_data(player_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Returns radar chart data: player averages vs. team averages
     across key scouting metrics in array format for frontend.
     """
-    player = crud.get_player(db, player_id)
+    versions = await crud.get_change_versions_async(db, player_id)
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    etag = etags.etag("radar", player_id, *versions)
+    cached = etags.lookup(request, etag)
+    if cached is not None:
+        return cached
+    player = await crud.get_player_async(db, player_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
 
-    # Get player's stats
-    player_stats = crud.get_stats_for_player(db, player_id)
-    if not player_stats:
+    # Running aggregates maintained by crud: two primary-key lookups instead of scanning stats
+    player_agg = await crud.get_player_aggregate_async(db, player_id)
+    if not player_agg or not player_agg.stat_count:
         raise HTTPException(status_code=404, detail="No stats for this player")
 
-    def avg(values):
-        return sum(values) / len(values) if values else 0
+    def avg(agg, metric):
+        return getattr(agg, f"{metric}_sum") / agg.stat_count if agg and agg.stat_count else 0
 
-    player_avg = {
-        "goals": avg([s.goals for s in player_stats]),
-        "assists": avg([s.assists for s in player_stats]),
-        "touches": avg([s.touches for s in player_stats]),
-        "tackles_won": avg([s.tackles_won for s in player_stats]),
-    }
+    player_avg = {m: avg(player_agg, m) for m in crud.AGGREGATE_METRICS}
 
     # Team averages
-    team_players = db.query(models.Player).filter(models.Player.team == player.team).all()
-    team_ids = [p.id for p in team_players]
-    team_stats = db.query(models.Stat).filter(models.Stat.player_id.in_(team_ids)).all()
-
-    team_avg = {
-        "goals": avg([s.goals for s in team_stats]),
-        "assists": avg([s.assists for s in team_stats]),
-        "touches": avg([s.touches for s in team_stats]),
-        "tackles_won": avg([s.tackles_won for s in team_stats]),
-    }
+    team_agg = await crud.get_team_aggregate_async(db, player.team)
+    team_avg = {m: avg(team_agg, m) for m in crud.AGGREGATE_METRICS}
 
     radar_data = [
         {"metric": "Goals", "player": player_avg["goals"], "team_avg": team_avg["goals"]},
@@ -162,7 +432,26 @@ def get_radar_data(player_id: int, db: Session = Depends(get_db)):
         {"metric": "Tackles Won", "player": player_avg["tackles_won"], "team_avg": team_avg["tackles_won"]},
     ]
 
-    return radar_data
+    return etags.store(etag, player_id, radar_data)
+
+# ------------------------------
+# League percentiles
+# ------------------------------
+@app.get("/players/{player_id}/percentiles")
+def get_player_percentiles(player_id: int, db: Session = Depends(get_db)):
+    """
+    Where the player ranks league-wide and within their position: per-match goals, assists, touches
+    and tackles won, and the ML features / predictions of their snapshot. Served from the in-memory
+    percentile index (binary searches), which only re-reads the players that changed.
+    """
+    from . import percentiles
+
+    result = percentiles.player_percentiles(db, player_id)
+    if result is None:
+        if not crud.get_player(db, player_id):
+            raise HTTPException(status_code=404, detail="Player not found")
+        raise HTTPException(status_code=404, detail="No stats for this player")
+    return result
 
 # ------------------------------
 # ML Prediction endpoints
@@ -181,12 +470,16 @@ class PredictRequest(BaseModel):
 
 @app.post("/predict")
 def run_prediction(req: PredictRequest):
+    import pandas as pd
+    from .ml.predict import predict_from_stats_df
+
     try:
-        stats_df = pd.DataFrame([s.dict() for s in req.stats])
+        with metrics.span("api.dataframe", rows=len(req.stats)):
+            stats_df = pd.DataFrame([s.dict() for s in req.stats])
         if stats_df.empty:
             raise HTTPException(status_code=400, detail="No stats provided")
 
-        injury_prob, injury_feats = predict_injury_from_stats_df(stats_df)
+        (injury_prob, injury_feats, injury_version), inv = predict_from_stats_df(stats_df)
         if injury_prob > 0.7:
             injury_risk = "high"
         elif injury_prob > 0.4:
@@ -194,13 +487,13 @@ def run_prediction(req: PredictRequest):
         else:
             injury_risk = "low"
 
-        inv = predict_investment_from_stats_df(stats_df)
         inv_forecast = "rise" if inv.get("predicted_pct_change", 0) >= 0 else "fall"
 
         return {
             "injury_risk": injury_risk,
             "injury_probability": float(injury_prob),
             "injury_features": injury_feats,
+            "injury_model_version": injury_version,
             "investment_forecast": inv_forecast,
             "investment_details": inv,
         }
@@ -210,71 +503,223 @@ def run_prediction(req: PredictRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {e}")
 
+class BatchPredictRequest(BaseModel):
+    player_ids: List[int] = []
+    all_players: bool = False
+    stat_sets: List[PredictRequest] = []
+    horizon_days: int = 180
+    stream: bool = False
+
+@app.post("/predict/batch")
+def run_batch_prediction(req: BatchPredictRequest, db: Session = Depends(get_db)):
+    """
+    Injury + investment predictions for many players at once: DB players (player_ids or all_players)
+    and/or inline stat sets. Work is split into player chunks scored across the process pool.
+    With stream=true, results come back as NDJSON lines in completion order.
+    """
+    import pandas as pd
+    from . import export
+    from .ml.injuries import load_injury_index, recent_injury_counts
+    from .ml.market import load_market_trends
+    from .ml.store import load_stats
+
+    if req.all_players:
+        player_filter = models.Player.id.isnot(None)
+    elif req.player_ids:
+        player_filter = models.Player.id.in_(set(req.player_ids))
+    else:
+        player_filter = None
+    store = load_stats(db, player_filter) if player_filter is not None else None
+    market = load_market_trends(db, player_filter, horizon_days=req.horizon_days) if player_filter is not None else None
+    injuries = recent_injury_counts(load_injury_index(db, player_filter), store) if store is not None else None
+    db_frames = batch.split_players(store) if store is not None else []
+
+    inline_rows = [
+        {"set_index": i, **stat.dict()} for i, stat_set in enumerate(req.stat_sets) for stat in stat_set.stats
+    ]
+    inline_frames = batch.split_players(pd.DataFrame(inline_rows), player_col="set_index") if inline_rows else []
+
+    def results():
+        for chunk in batch.score_chunks(db_frames, req.horizon_days, market=market, injuries=injuries):
+            for player_id, result in chunk.items():
+                yield {"source": "db", "player_id": player_id, **result}
+        for chunk in batch.score_chunks(inline_frames, req.horizon_days, player_col="set_index"):
+            for i, result in chunk.items():
+                yield {"source": "inline", "index": i, "player_id": req.stat_sets[i].player_id, **result}
+
+    scored_ids = set(store.player_ids.tolist()) if store is not None else set()
+    missing = [
+        {"source": "db", "player_id": pid, "error": "No stats found for this player"}
+        for pid in dict.fromkeys(req.player_ids) if pid not in scored_ids
+    ]
+    missing += [
+        {"source": "inline", "index": i, "player_id": s.player_id, "error": "No stats provided"}
+        for i, s in enumerate(req.stat_sets) if not s.stats
+    ]
+
+    # kernel features can be NaN (no minutes in a window): written as null, as the export does
+    if req.stream:
+        def ndjson():
+            for item in results():
+                yield json.dumps(export._jsonable(item)) + "\n"
+            for item in missing:
+                yield json.dumps(item) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    items = list(results()) + missing
+    items.sort(key=lambda r: (r["source"] != "db", r.get("index", 0), r["player_id"]))
+    return {"count": len(items), "horizon_days": req.horizon_days, "results": export._jsonable(items)}
+
+# Snapshot-served routes: a current snapshot at most max_staleness seconds old (default
+# SOCCER_SNAPSHOT_MAX_STALENESS_SECONDS) answers without scoring; fresh=true always computes live.
+# X-Prediction-Source tells which happened ("snapshot", "live" or "mixed").
+MAX_STALENESS_QUERY = Query(None, ge=0, description="Oldest snapshot to serve, in seconds")
+FRESH_QUERY = Query(False, description="Ignore snapshots and compute live")
+
+def _player_snapshot(db: Session, player_agg, max_staleness: Optional[int], fresh: bool, response: Response):
+    snap = None if fresh else snapshots.player_snapshot(
+        db, player_agg.player_id, player_agg.version, max_staleness=max_staleness
+    )
+    response.headers["X-Prediction-Source"] = "live" if snap is None else "snapshot"
+    return snap
+
+def _prediction_etag(request: Request, db: Session, fresh: bool, *parts):
+    """ETag for a GET of a prediction route (None for POST and fresh=true, which are never cached)."""
+    if request.method != "GET" or fresh:
+        return None
+    versions = crud.get_change_versions(db, parts[1])
+    if versions is None:
+        raise HTTPException(status_code=404, detail="No stats found for this player")
+    return etags.etag(*parts[:2], versions[0], *parts[2:])
+
+def _model_version(kind: str):
+    from .ml.registry import model_registry
+
+    return model_registry.version(kind)
+
+def _prediction_response(etag: Optional[str], player_id: int, body: dict, response: Response):
+    if etag is None:
+        return body
+    return etags.store(etag, player_id, body, {"X-Prediction-Source": response.headers["X-Prediction-Source"]})
+
+@app.get("/predict/injury/{player_id}")
 @app.post("/predict/injury/{player_id}")
-def predict_injury_for_player(player_id: int, db: Session = Depends(get_db)):
-    stats = crud.get_stats_for_player(db, player_id)
-    if not stats:
+def predict_injury_for_player(
+    player_id: int,
+    request: Request,
+    response: Response,
+    max_staleness: Optional[int] = MAX_STALENESS_QUERY,
+    fresh: bool = FRESH_QUERY,
+    db: Session = Depends(get_db),
+):
+    # a cached body implies the player had stats at this version, so it is checked on a miss only
+    etag = _prediction_etag(request, db, fresh, "predict_injury", player_id, _model_version("injury"))
+    cached = etags.lookup(request, etag) if etag else None
+    if cached is not None:
+        return cached
+    player_agg = crud.get_player_aggregate(db, player_id)
+    if not player_agg or not player_agg.stat_count:
         raise HTTPException(status_code=404, detail="No stats found for this player")
-    rows = []
-    for s in stats:
-        rows.append({
-            "match_date": getattr(s, "match_date", None),
-            "minutes_played": getattr(s, "minutes_played", None),
-            "goals": getattr(s, "goals", None),
-            "assists": getattr(s, "assists", None),
-            "touches": getattr(s, "touches", None),
-            "tackles_won": getattr(s, "tackles_won", None),
-        })
-    stats_df = pd.DataFrame(rows)
-    prob, feats = predict_injury_from_stats_df(stats_df)
+    snap = _player_snapshot(db, player_agg, max_staleness, fresh, response)
+    if snap is not None and snap.injury_probability is not None:
+        prob, feats, model_version = snap.injury_probability, snap.injury_features, snap.injury_model_version
+    else:
+        response.headers["X-Prediction-Source"] = "live"
+        from .ml.predict import predict_injury_with_features
+
+        prob, feats, model_version = predict_injury_with_features(player_id, db)
     risk = "low" if prob < 0.33 else "medium" if prob < 0.66 else "high"
-    return {"player_id": player_id, "probability": float(prob), "risk": risk, "features": feats}
+    return _prediction_response(etag, player_id, {
+        "player_id": player_id,
+        "probability": float(prob),
+        "risk": risk,
+        "features": feats,
+        "model_version": model_version,
+    }, response)
 
+@app.get("/predict/investment/{player_id}")
 @app.post("/predict/investment/{player_id}")
-def predict_investment_for_player(player_id: int, db: Session = Depends(get_db), horizon_days: int = 180):
-    stats = crud.get_stats_for_player(db, player_id)
-    if not stats:
+def predict_investment_for_player(
+    player_id: int,
+    request: Request,
+    response: Response,
+    horizon_days: int = 180,
+    max_staleness: Optional[int] = MAX_STALENESS_QUERY,
+    fresh: bool = FRESH_QUERY,
+    db: Session = Depends(get_db),
+):
+    etag = _prediction_etag(
+        request, db, fresh, "predict_investment", player_id, horizon_days, _model_version("investment")
+    )
+    cached = etags.lookup(request, etag) if etag else None
+    if cached is not None:
+        return cached
+    player_agg = crud.get_player_aggregate(db, player_id)
+    if not player_agg or not player_agg.stat_count:
         raise HTTPException(status_code=404, detail="No stats found for this player")
-    rows = []
-    for s in stats:
-        rows.append({
-            "match_date": getattr(s, "match_date", None),
-            "minutes_played": getattr(s, "minutes_played", None),
-            "goals": getattr(s, "goals", None),
-            "assists": getattr(s, "assists", None),
-            "touches": getattr(s, "touches", None),
-            "tackles_won": getattr(s, "tackles_won", None),
-        })
-    stats_df = pd.DataFrame(rows)
-    result = predict_investment_from_stats_df(stats_df, horizon_days=horizon_days)
-    return {"player_id": player_id, "horizon_days": horizon_days, **result}
+    # snapshots are taken at one horizon; other horizons are always computed
+    fresh = fresh or horizon_days != config.SNAPSHOT_HORIZON_DAYS
+    snap = _player_snapshot(db, player_agg, max_staleness, fresh, response)
+    if snap is not None:
+        result = dict(snap.investment)
+    else:
+        from .ml.predict import predict_investment
+
+        result = predict_investment(player_id, db, horizon_days=horizon_days)
+    return _prediction_response(etag, player_id, {"player_id": player_id, "horizon_days": horizon_days, **result}, response)
+
+@app.get("/predict/cache")
+def get_prediction_cache_info():
+    """Hit / miss / eviction counters of the per-player prediction cache."""
+    from .ml.predict import prediction_cache_info
+
+    return prediction_cache_info()
+
+@app.get("/predict/snapshots")
+def get_snapshot_info(db: Session = Depends(get_db)):
+    """Prediction snapshot coverage and the background scheduler's last refresh."""
+    return snapshots.snapshot_info(db)
+
+@app.get("/models")
+def get_model_versions():
+    """Model version serving each prediction kind ("heuristic" when no trained model is loaded)."""
+    from .ml.registry import model_registry
+
+    return model_registry.info()
+
+@app.post("/models/reload")
+def reload_models():
+    """Swap in newer model artifacts now; requests already running finish on the model they started with."""
+    from .ml.registry import model_registry
+
+    return model_registry.reload()
 
 # ------------------------------
 # Scouting Insights endpoints
 # ------------------------------
 @app.get("/insights/top_undervalued")
 def get_top_undervalued(
+    response: Response,
     max_age: int = Query(21, description="Maximum age to consider (inclusive)"),
     top_n: int = Query(5, description="Number of top players to return"),
+    max_staleness: Optional[int] = MAX_STALENESS_QUERY,
+    fresh: bool = FRESH_QUERY,
     db: Session = Depends(get_db),
 ):
-    players = crud.get_players(db)
-    scored = []
-
-    for p in players:
-        try:
-            age = getattr(p, "age", None)
-            if age is None or age > max_age:
-                continue
-
-            stats = crud.get_stats_for_player(db, p.id)
-            if stats:
-                minutes_list = [getattr(s, "minutes_played", 0) or 0 for s in stats]
-                avg_minutes = float(sum(minutes_list)) / len(minutes_list)
-            else:
-                avg_minutes = 0.0
-
-            inv = predict_investment(p.id, db)
+    # Age filter in SQL, forecasts from the snapshots (one batch computation for players without a
+    # current one), bounded heap for top_n
+    players = crud.get_players_up_to_age(db, max_age)
+    investments, avg_minutes_by_player, source = snapshots.investment_inputs(
+        db, models.Player.age <= max_age, max_staleness=max_staleness, fresh=fresh
+    )
+    response.headers["X-Prediction-Source"] = source
+
+    with metrics.span("api.rank_undervalued", rows=len(players)):
+        scored = []
+        for p in players:
+            age = p.age
+            avg_minutes = float(avg_minutes_by_player.get(p.id, 0.0))
+            inv = investments.get(p.id, {"predicted_pct_change": 0.0, "method": "no_data"})
             predicted_pct = float(inv.get("predicted_pct_change", 0.0))
 
             age_boost = 1.0 + max(0.0, (25.0 - float(age)) / 100.0)
@@ -292,36 +737,50 @@ def get_top_undervalued(
                 "undervalued_score": float(undervalued_score),
                 "investment_method": inv.get("method", None),
             })
-        except Exception:
-            continue
 
-    scored_sorted = sorted(scored, key=lambda x: x["undervalued_score"], reverse=True)
-    return {"count": len(scored_sorted), "top_n": top_n, "players": scored_sorted[:top_n]}
+        top = heapq.nlargest(top_n, scored, key=lambda x: x["undervalued_score"]) if top_n > 0 else []
+    return {"count": len(scored), "top_n": top_n, "players": top}
 
 @app.get("/insights/injury_compare/{player_id}")
-def compare_injury_to_team(player_id: int, db: Session = Depends(get_db)):
+def compare_injury_to_team(
+    player_id: int,
+    request: Request,
+    response: Response,
+    max_staleness: Optional[int] = MAX_STALENESS_QUERY,
+    fresh: bool = FRESH_QUERY,
+    db: Session = Depends(get_db),
+):
     player = crud.get_player(db, player_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
+    etag = None
+    if not fresh:
+        # the team counter moves with the roster and every squad member's stats and injuries
+        etag = etags.etag("injury_compare", player_id, *crud.get_change_versions(db, player_id),
+                          _model_version("injury"))
+        cached = etags.lookup(request, etag)
+        if cached is not None:
+            return cached
 
     try:
-        player_prob = float(predict_injury(player_id, db))
+        baseline, source = snapshots.team_injury_inputs(db, player.team, max_staleness=max_staleness, fresh=fresh)
+        response.headers["X-Prediction-Source"] = source
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed computing player injury: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed computing team injury baseline: {e}")
 
-    team_players = db.query(models.Player).filter(models.Player.team == player.team).all()
-    if not team_players:
+    if not baseline["probabilities"]:
         raise HTTPException(status_code=404, detail="No team players found to compare")
 
-    probs = []
-    for tp in team_players:
+    player_prob = baseline["probabilities"].get(player_id)
+    if player_prob is None:
         try:
-            prob = float(predict_injury(tp.id, db))
-            probs.append(prob)
-        except Exception:
-            continue
+            from .ml.predict import predict_injury
+
+            player_prob = float(predict_injury(player_id, db))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed computing player injury: {e}")
 
-    team_avg = float(sum(probs) / len(probs)) if probs else 0.0
+    team_avg = baseline["average"]
     abs_diff = player_prob - team_avg
     rel_diff = None
     if team_avg != 0:
@@ -338,7 +797,7 @@ def compare_injury_to_team(player_id: int, db: Session = Depends(get_db)):
         else:
             message = "Player injury risk is close to team average."
 
-    return {
+    return _prediction_response(etag, player_id, {
         "player_id": player_id,
         "player_name": getattr(player, "name", None),
         "player_probability": player_prob,
@@ -346,4 +805,4 @@ def compare_injury_to_team(player_id: int, db: Session = Depends(get_db)):
         "absolute_difference": abs_diff,
         "relative_difference": rel_diff,
         "message": message,
-    }
+    }, response)
@@ -0,0 +1,290 @@
+# backend/manage.py
+"""
+Maintenance commands for the Soccer Tracker backend.
+
+Run from the soccer-tracker directory:
+    python -m backend.manage migrate              # create missing tables / indexes (before starting workers)
+    python -m backend.manage startup-report       # import cost per module and worker time-to-ready
+    python -m backend.manage rebuild-aggregates   # recompute player/team stat aggregates from scratch
+    python -m backend.manage verify-aggregates    # compare stored aggregates with the stats table
+    python -m backend.manage train-models         # fit injury / investment models, save versioned artifacts
+    python -m backend.manage backtest             # walk-forward backtest + grid search of the heuristics
+    python -m backend.manage import-market-values feed.csv   # upsert a valuation feed (CSV / Parquet)
+    python -m backend.manage import-injuries injuries.csv    # add an injury list (CSV / Parquet)
+    python -m backend.manage refresh-snapshots    # rescore every player into the prediction snapshots
+"""
+
+import argparse
+import sys
+
+from . import crud, database, models
+
+
+def migrate(args):
+    missing = models.missing_schema(database.engine)
+    crud.migrate(database.engine)
+    print(f"Created {', '.join(missing)}" if missing else "Schema up to date")
+    return 0
+
+
+# Child of startup-report: a worker's startup without serving (no pre-warm or scheduler threads)
+_STARTUP_CHILD = """
+import asyncio, time
+start = time.perf_counter()
+from backend.main import app
+imported = time.perf_counter()
+async def startup():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+ready = asyncio.run(startup())
+print(imported - start, ready - start)
+"""
+
+_HEAVY_MODULES = ("numpy", "pandas", "sklearn", "joblib", "pyarrow")
+
+
+def _parse_importtime(stderr):
+    """[(name, self_us, cumulative_us, parent)] from `python -X importtime` output (parent: importing module)."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative, name = line.removeprefix("import time:").split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append([name.strip(), int(self_us), int(cumulative), depth, None])
+    # a module is printed after everything it imports: its parent is the next line one level up
+    stack = []
+    for entry in reversed(entries):
+        while stack and stack[-1][3] >= entry[3]:
+            stack.pop()
+        entry[4] = stack[-1][0] if stack else None
+        stack.append(entry)
+    return [(name, self_us, cumulative, parent) for name, self_us, cumulative, _, parent in entries]
+
+
+def startup_report(args):
+    import os
+    import subprocess
+    from collections import Counter
+
+    env = dict(os.environ, SOCCER_PREWARM_ML="0", SOCCER_SNAPSHOT_SCHEDULER="0")
+    child = subprocess.run([sys.executable, "-X", "importtime", "-c", _STARTUP_CHILD],
+                           capture_output=True, text=True, env=env)
+    if child.returncode:
+        print(child.stderr.strip().splitlines()[-1] if child.stderr.strip() else "startup failed")
+        return 1
+    import_s, ready_s = map(float, child.stdout.split()[-2:])
+    entries = _parse_importtime(child.stderr)
+    parents = {name: parent for name, _, _, parent in entries}
+
+    print(f"import backend.main: {import_s * 1000:.0f} ms, ready to serve (lifespan done): {ready_s * 1000:.0f} ms")
+    print(f"{len(entries)} modules imported; import time per top-level package (self time):")
+    packages = Counter()
+    for name, self_us, _, _ in entries:
+        packages[name.split(".")[0]] += self_us
+    for package, us in packages.most_common(args.top):
+        print(f"  {us / 1000:8.1f} ms  {package}")
+    print("backend modules (self / cumulative):")
+    for name, self_us, cumulative, _ in sorted(entries, key=lambda e: -e[2]):
+        if name.split(".")[0] == "backend":
+            print(f"  {self_us / 1000:8.1f} / {cumulative / 1000:8.1f} ms  {name}")
+    heavy = [(name, cumulative) for name, _, cumulative, _ in entries if name in _HEAVY_MODULES]
+    for name, cumulative in heavy:
+        chain, parent = [], parents.get(name)
+        while parent is not None and not parent.startswith("backend"):
+            parent = parents.get(parent)
+        while parent is not None and parent.startswith("backend"):
+            chain.append(parent)
+            parent = parents.get(parent)
+        print(f"heavy import at startup: {name} ({cumulative / 1000:.0f} ms) via {' <- '.join(chain) or '?'}")
+    return 0
+
+
+def rebuild_aggregates(args):
+    with database.SessionLocal() as db:
+        counts = crud.rebuild_stat_aggregates(db)
+    print(f"Rebuilt aggregates for {counts['players']} players and {counts['teams']} teams")
+    return 0
+
+
+def verify_aggregates(args):
+    with database.SessionLocal() as db:
+        problems = crud.verify_stat_aggregates(db)
+    for problem in problems:
+        print(problem)
+    print("Aggregates OK" if not problems else f"{len(problems)} aggregate mismatches")
+    return 0 if not problems else 1
+
+
+def train_models(args):
+    from .ml import train
+
+    with database.SessionLocal() as db:
+        results = train.train_models(
+            db,
+            model_dir=args.model_dir,
+            step_days=args.step_days,
+            absence_days=args.absence_days,
+            horizon_days=args.horizon_days,
+        )
+    for kind, meta in results.items():
+        if "path" in meta:
+            scores = {k: round(v, 4) for k, v in meta.items() if k.startswith("holdout_")}
+            print(f"{kind}: version {meta['version']} on {meta['samples']} samples {scores} -> {meta['path']}")
+        else:
+            print(f"{kind}: skipped ({meta['skipped']})")
+    return 0
+
+
+def _parse_grid(specs):
+    """{kind: {coefficient: values}} from "name=v1,v2,..." options."""
+    from .ml import backtest
+
+    grids = {}
+    for spec in specs or ():
+        name, _, values = spec.partition("=")
+        kind = next((k for k, params in backtest.HEURISTICS.items() if name in params), None)
+        if kind is None or not values:
+            raise SystemExit(f"--grid {spec}: expected <coefficient>=<v1>,<v2>,... with a coefficient of "
+                             + ", ".join(f"{k} ({', '.join(p)})" for k, p in backtest.HEURISTICS.items()))
+        grids.setdefault(kind, {})[name] = [float(v) for v in values.split(",")]
+    return grids
+
+
+def _format_params(params):
+    return " ".join(f"{k}={v:g}" for k, v in params.items())
+
+
+def _format_scores(result):
+    return " ".join(f"{k} {v:.4f}" for k, v in result.items() if k != "params")
+
+
+def backtest(args):
+    import time
+
+    from .ml import backtest as engine
+
+    kinds = engine.KINDS if args.kind == "both" else (args.kind,)
+    start = time.perf_counter()
+    with database.SessionLocal() as db:
+        report = engine.run_backtest(
+            db,
+            kinds=kinds,
+            grids=_parse_grid(args.grid),
+            fold_days=args.fold_days,
+            injury_horizon_days=args.injury_horizon_days,
+            investment_horizon_days=args.investment_horizon_days,
+            workers=args.workers,
+            top=args.top,
+        )
+    print(f"{report['matches']} matches, {report['history_rows']} player match dates "
+          f"in {time.perf_counter() - start:.1f}s")
+    for kind, result in report["results"].items():
+        loss = result["loss"]
+        print(f"\n{kind}: {result['samples']} samples, horizon {result['horizon_days']} days, "
+              f"{result['combinations']} combinations, loss {loss}")
+        print(f"  heuristic  {_format_params(result['heuristic']['params'])}: {_format_scores(result['heuristic'])}")
+        for rank, best in enumerate(result["best"], 1):
+            print(f"  best #{rank}    {_format_params(best['params'])}: {_format_scores(best)}")
+        if "walk_forward" in result:
+            summary = result["walk_forward"]
+            print(f"  walk-forward over {len(result['folds'])} folds of {args.fold_days} days ({summary['samples']} samples): "
+                  f"{loss} {summary['loss']:.4f} vs heuristic {summary['heuristic_loss']:.4f}")
+            for fold in result["folds"]:
+                print(f"    {fold['start']}  train {fold['train_samples']:>7}  test {fold['samples']:>6}  "
+                      f"{fold['loss']:.4f} (heuristic {fold['heuristic_loss']:.4f})  {_format_params(fold['params'])}")
+    return 0
+
+
+def _import_file(args, importer, what):
+    import os
+
+    from .ingest import IngestError
+
+    with open(args.path, "rb") as f, database.SessionLocal() as db:
+        try:
+            summary = importer(db, f, os.path.basename(args.path), chunk_size=args.chunk_size)
+        except IngestError as e:
+            print(e)
+            return 1
+    print(f"{summary['inserted']} {what} written, {summary['rejected']} rejected of {summary['rows']} rows")
+    for error in summary["errors"][:20]:
+        print(f"  row {error['row']}: {error['error']}")
+    return 0 if not summary["rejected"] else 1
+
+
+def import_market_values(args):
+    from . import ingest
+
+    return _import_file(args, ingest.import_market_values, "valuations")
+
+
+def import_injuries(args):
+    from . import ingest
+
+    return _import_file(args, ingest.import_injuries, "injuries")
+
+
+def refresh_snapshots(args):
+    from . import snapshots
+
+    with database.SessionLocal() as db:
+        ids = snapshots.outdated_player_ids(db) if args.outdated_only else None
+        written = snapshots.refresh_snapshots(db, ids)
+    print(f"Wrote {written} prediction snapshots")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.manage", description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="create missing tables and indexes").set_defaults(func=migrate, schema=False)
+    report = sub.add_parser("startup-report", help="import cost per module and time until a worker is ready")
+    report.add_argument("--top", type=int, default=15, help="top-level packages to list")
+    report.set_defaults(func=startup_report, schema=False)
+    sub.add_parser("rebuild-aggregates", help="recompute player/team stat aggregates").set_defaults(func=rebuild_aggregates)
+    sub.add_parser("verify-aggregates", help="check stored aggregates against the stats table").set_defaults(func=verify_aggregates)
+
+    training = sub.add_parser("train-models", help="train the injury / investment models")
+    training.add_argument("--model-dir", default=None, help="artifact directory (default: SOCCER_MODEL_DIR)")
+    training.add_argument("--step-days", type=int, default=14, help="days between training snapshots")
+    training.add_argument("--absence-days", type=int, default=21, help="no match for this long counts as injured")
+    training.add_argument("--horizon-days", type=int, default=90, help="investment label horizon")
+    training.set_defaults(func=train_models)
+
+    bt = sub.add_parser("backtest", help="walk-forward backtest and grid search of the heuristic coefficients")
+    bt.add_argument("--kind", choices=["injury", "investment", "both"], default="both")
+    bt.add_argument("--grid", action="append", metavar="NAME=V1,V2,...",
+                    help="values to try for one coefficient (repeatable; default: the built-in grid)")
+    bt.add_argument("--fold-days", type=int, default=91, help="length of a walk-forward fold")
+    bt.add_argument("--injury-horizon-days", type=int, default=30, help="an injury starting this soon counts")
+    bt.add_argument("--investment-horizon-days", type=int, default=180, help="market value change horizon")
+    bt.add_argument("--workers", type=int, default=None, help="processes for the grid search (default: CPU count)")
+    bt.add_argument("--top", type=int, default=5, help="best combinations to list")
+    bt.set_defaults(func=backtest)
+
+    market = sub.add_parser("import-market-values", help="bulk load a market value feed")
+    market.add_argument("path", help="CSV or Parquet with player_id or player_name, date, market_value [, source]")
+    market.add_argument("--chunk-size", type=int, default=10_000, help="rows per transaction")
+    market.set_defaults(func=import_market_values)
+
+    injuries = sub.add_parser("import-injuries", help="bulk load an injury list")
+    injuries.add_argument("path", help="CSV or Parquet with player_id or player_name, start_date [, end_date, injury_type]")
+    injuries.add_argument("--chunk-size", type=int, default=10_000, help="rows per transaction")
+    injuries.set_defaults(func=import_injuries)
+
+    refresh = sub.add_parser("refresh-snapshots", help="recompute the precomputed prediction snapshots")
+    refresh.add_argument("--outdated-only", action="store_true", help="only players without a current snapshot")
+    refresh.set_defaults(func=refresh_snapshots)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "schema", True):
+        missing = models.missing_schema(database.engine)
+        if missing:
+            print(f"Database schema is missing {', '.join(missing)}; run `python -m backend.manage migrate`")
+            return 1
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+# backend/metrics.py
+"""
+Request and stage instrumentation.
+
+- MetricsMiddleware: request latency histogram per (method, route template, status); with the
+  opt-in request header `X-Profile: 1` the response carries a Server-Timing header breaking the
+  request down by stage
+- span(stage, rows=None): time a block as a stage; set `.rows` on the yielded span to record how
+  many rows it handled
+- traced(stage): decorator doing the same for a whole (sync or async) function, rows = len(result)
+- instrument_engine(engine): every DBAPI cursor execute becomes a "sql.execute" stage
+- TimedJSONResponse: JSONResponse whose encoding is the "api.render_json" stage (rows = bytes)
+- render(): all metrics in the Prometheus text format, served on GET /metrics
+
+Spans nest: a stage's self time excludes the stages opened inside it, so in a profile the
+"crud.*" self time is row fetching + ORM hydration, "sql.execute" the database itself, and
+"other" whatever ran outside any stage (request parsing, validation, jsonable_encoder).
+Rows per second come from soccer_stage_rows_total / soccer_stage_duration_seconds_sum.
+Metrics are per process; with several uvicorn workers, scrape each or aggregate downstream.
+"""
+
+import asyncio
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+
+from . import config
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_HEADER = "x-profile"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(names, values):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(snapshot.items()):
+            base = _label_str(self.labelnames, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base + "," if base else ""}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{{{_label_str(self.labelnames, labels)}}} {value}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+REQUEST_SECONDS = Histogram(
+    "soccer_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram("soccer_stage_duration_seconds", "Time spent per instrumented stage.", ("stage",))
+STAGE_ROWS = Counter("soccer_stage_rows_total", "Rows handled per instrumented stage.", ("stage",))
+
+_REGISTRY = (REQUEST_SECONDS, STAGE_SECONDS, STAGE_ROWS)
+
+
+def render():
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    for metric in _REGISTRY:
+        metric.clear()
+
+
+# ------------------------------
+# Spans
+# ------------------------------
+class Span:
+    __slots__ = ("stage", "rows", "parent", "child_s")
+
+    def __init__(self, stage, rows, parent):
+        self.stage = stage
+        self.rows = rows
+        self.parent = parent
+        self.child_s = 0.0
+
+
+_current_span = contextvars.ContextVar("soccer_current_span", default=None)
+# (stage, seconds, self seconds, rows, top level) of every finished span of a profiled request
+_request_profile = contextvars.ContextVar("soccer_request_profile", default=None)
+
+
+def _record(stage, seconds, rows, parent, child_s=0.0):
+    STAGE_SECONDS.observe((stage,), seconds)
+    if rows is not None:
+        STAGE_ROWS.inc((stage,), rows)
+    if parent is not None:
+        parent.child_s += seconds
+    profile = _request_profile.get()
+    if profile is not None:
+        profile.append((stage, seconds, seconds - child_s, rows, parent is None))
+
+
+@contextmanager
+def span(stage, rows=None):
+    if not config.METRICS_ENABLED:
+        yield Span(stage, rows, None)
+        return
+    current = Span(stage, rows, _current_span.get())
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        seconds = time.perf_counter() - start
+        _current_span.reset(token)
+        _record(stage, seconds, current.rows, current.parent, current.child_s)
+
+
+def _row_count(result):
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result  # e.g. bulk inserts returning the number of rows written
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def traced(stage):
+    """Run the decorated function inside span(stage), counting len(result) as its rows."""
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage) as current:
+                    result = await fn(*args, **kwargs)
+                    current.rows = _row_count(result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage) as current:
+                result = fn(*args, **kwargs)
+                current.rows = _row_count(result)
+            return result
+        return wrapper
+    return decorate
+
+
+def instrument_engine(engine):
+    """Record every cursor execute on `engine` (a sync Engine; pass async_engine.sync_engine) as sql.execute."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("soccer_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("soccer_query_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        if config.METRICS_ENABLED:
+            rowcount = cursor.rowcount
+            _record("sql.execute", seconds, rowcount if rowcount >= 0 else None, _current_span.get())
+
+
+class TimedJSONResponse(JSONResponse):
+    def render(self, content):
+        with span("api.render_json") as current:
+            body = super().render(content)
+            current.rows = len(body)
+        return body
+
+
+# ------------------------------
+# Middleware
+# ------------------------------
+def server_timing(profile, total_s):
+    """Server-Timing header value: per stage total ms, with call count, self time, rows and rows/s."""
+    stages = {}
+    for stage, seconds, self_s, rows, _ in profile:
+        entry = stages.setdefault(stage, [0, 0.0, 0.0, None])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += self_s
+        if rows is not None:
+            entry[3] = (entry[3] or 0) + rows
+    covered = sum(seconds for _, seconds, _, _, top_level in profile if top_level)
+
+    parts = [f"total;dur={total_s * 1000:.3f}"]
+    for stage, (calls, seconds, self_s, rows) in sorted(stages.items(), key=lambda kv: -kv[1][2]):
+        desc = f"n={calls} self={self_s * 1000:.3f}ms"
+        if rows is not None:
+            desc += f" rows={rows}"
+            if seconds > 0:
+                desc += f" rows/s={rows / seconds:.0f}"
+        parts.append(f'{stage};dur={seconds * 1000:.3f};desc="{desc}"')
+    parts.append(f"other;dur={max(total_s - covered, 0.0) * 1000:.3f}")
+    return ", ".join(parts)
+
+
+def _wants_profile(headers):
+    for name, value in headers:
+        if name == PROFILE_HEADER.encode():
+            return value.strip() not in (b"", b"0", b"false")
+    return False
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request latency histogram and, on request, a per-stage Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        profile = [] if config.REQUEST_PROFILING and _wants_profile(scope["headers"]) else None
+        token = _request_profile.set(profile)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile is not None:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", server_timing(list(profile), time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_profile.reset(token)
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                (scope["method"], getattr(route, "path", "unmatched"), str(status)), time.perf_counter() - start
+            )
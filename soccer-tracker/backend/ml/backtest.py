@@ -0,0 +1,454 @@
+# backend/ml/backtest.py
+"""
+Walk-forward backtest of the injury and investment heuristics.
+
+    python -m backend.manage backtest [--kind injury] [--fold-days 91] [--workers 8] [--grid acwr=0.2,0.4,0.6]
+
+- history_features(store): rolling features of every player at every one of their match dates, as
+  compute_rolling_features gives them on the player's matches up to and including that date
+- prefix_features(store, player_id): the same for one player by calling compute_rolling_features
+  on every prefix; the O(n^2) reference history_features is checked against (backend/tests/test_backtest.py)
+- injury_sample(history, index, horizon_days) / investment_sample(history, market_rows, horizon_days):
+  the features joined with what happened next (an injury starting within the horizon; the change of
+  the latest recorded market value over the horizon)
+- walk_forward(kind, sample, grid, fold_days, workers): score every coefficient combination of `grid`,
+  in parallel across processes; for each fold of `fold_days`, pick the combination with the lowest
+  loss on the samples whose outcome was known before the fold starts and report it on the fold
+- run_backtest(db, kinds, ...): all of the above from the database
+
+history_features is one pass over the StatStore arrays: prefix sums over the rows turn each 7/14/28-day
+window sum into a subtraction, and the window starts of all rows come from merging the sorted
+(player, day - window) keys into the sorted (player, day) keys, the vectorized form of advancing a
+left pointer per player. That is O(n) in the matches instead of a compute_rolling_features call per
+prefix. The injuries_365 feature only counts injuries up to the match date (no look-ahead).
+
+HEURISTICS holds the coefficients of predict.score_injury_features / predict.performance_trend,
+the row every result is compared against; the heuristics are scored without a trained model.
+"""
+
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .. import config, crud, models
+from ..metrics import span
+from .features import FEATURE_COLUMNS
+from .injuries import INJURY_WINDOW_DAYS, load_injury_index
+from .predict import _goals_trend_slope, compute_rolling_features
+from .store import MISSING, load_stats
+
+KINDS = ("injury", "investment")
+LOSSES = {"injury": "log_loss", "investment": "mae"}
+
+HEURISTICS = {
+    "injury": {"intercept": 0.0, "acwr": 0.4, "matches_14": 0.08, "minutes_slope": 0.05, "injury_bump": 0.05},
+    "investment": {"scale": 4.0, "cap": 0.2},
+}
+
+# the heuristic's own value is always added to each axis
+DEFAULT_GRIDS = {
+    "injury": {
+        "intercept": (-4.0, -3.0, -2.0, -1.0),
+        "acwr": (0.0, 0.2, 0.6, 0.8),
+        "matches_14": (0.0, 0.04, 0.12, 0.16),
+        "minutes_slope": (-0.05, 0.0, 0.1),
+        "injury_bump": (0.0, 0.025, 0.1),
+    },
+    "investment": {"scale": (1.0, 2.0, 8.0, 16.0, 32.0), "cap": (0.05, 0.1, 0.3, 0.4)},
+}
+
+INJURY_HORIZON_DAYS = 30
+INVESTMENT_HORIZON_DAYS = 180
+FOLD_DAYS = 91
+
+_SLOPE_WINDOW = 8
+_EPS = 1e-6
+_EPOCH = date(1970, 1, 1).toordinal()
+_DAY_OFFSET = -np.iinfo(np.int32).min
+
+
+def _keys(player_ids, days):
+    """int64 keys ordered by player, then day (days as int32 day numbers)."""
+    return (np.asarray(player_ids, dtype=np.int64) << 32) | (np.asarray(days, dtype=np.int64) + _DAY_OFFSET)
+
+
+def _prefix(values):
+    return np.concatenate(([0], np.cumsum(values)))
+
+
+def _tail_slope(prefix_y, prefix_xy, prefix_missing, starts, ends):
+    """
+    Least-squares slope (x = 0..k-1) of rows starts..ends (inclusive) from prefix sums of y and x*y,
+    where x is the global row number: 0.0 below 2 rows, NaN when a value in the tail is missing.
+    """
+    k = ends - starts + 1
+    sum_y = prefix_y[ends + 1] - prefix_y[starts]
+    sum_xy = prefix_xy[ends + 1] - prefix_xy[starts]
+    numerator = (sum_xy - starts * sum_y) - (k - 1) / 2.0 * sum_y
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where(k > 1, numerator / (k * (k * k - 1) / 12.0), 0.0)
+    missing = prefix_missing[ends + 1] - prefix_missing[starts] > 0
+    return np.where((k > 1) & missing, np.nan, slope)
+
+
+def history_features(store):
+    """
+    DataFrame with one row per (player, match date): player_id, day (days since 1970-01-01), matches
+    (rows so far), FEATURE_COLUMNS and goals_slope, each as compute_rolling_features / the goals
+    trend of predict_investment_from_stats_df give them on the matches up to that date.
+    """
+    n = len(store)
+    columns = ["player_id", "day", "matches", *FEATURE_COLUMNS, "goals_slope"]
+    if not n:
+        return pd.DataFrame(columns=columns)
+    with span("ml.backtest_features", rows=n):
+        codes = store.codes()
+        days = store.days.astype(np.int64)
+        keys = _keys(codes, days)
+        # the features on a date include every match of that date: evaluate at the last one
+        ends = np.flatnonzero(np.r_[keys[1:] != keys[:-1], True])
+        player_starts = store.offsets[codes[ends]]
+
+        def window_starts(window_days):
+            return np.searchsorted(keys, keys[ends] - window_days, side="left")
+
+        raw_minutes = store.metrics["minutes_played"]
+        minutes = np.where(raw_minutes == MISSING, 0, raw_minutes).astype(np.int64)
+        raw_goals = store.metrics["goals"]
+        goals = np.where(raw_goals == MISSING, 0, raw_goals).astype(np.int64)
+        rows = np.arange(n, dtype=np.int64)
+        prefix_minutes, prefix_goals = _prefix(minutes), _prefix(goals)
+        prefix_valid = _prefix(raw_minutes != MISSING)
+
+        def window_sum(prefix, starts):
+            return prefix[ends + 1] - prefix[starts]
+
+        start_7, start_14, start_28 = window_starts(7), window_starts(14), window_starts(28)
+        minutes_sum_7 = window_sum(prefix_minutes, start_7)
+        minutes_sum_28 = window_sum(prefix_minutes, start_28)
+        valid_28 = window_sum(prefix_valid, start_28)
+        goals_28 = window_sum(prefix_goals, start_28)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            minutes_avg_28 = minutes_sum_28 / valid_28
+            goals_per90_28 = np.where(minutes_sum_28 > 0, goals_28 / minutes_sum_28 * 90.0, 0.0)
+        chronic = np.where(minutes_avg_28 > 0, minutes_avg_28, 1e-6)
+
+        tail_starts = np.maximum(ends - (_SLOPE_WINDOW - 1), player_starts)
+        return pd.DataFrame({
+            "player_id": store.player_ids[codes[ends]],
+            "day": days[ends],
+            "matches": ends - player_starts + 1,
+            "minutes_sum_7": minutes_sum_7,
+            "minutes_avg_28": minutes_avg_28,
+            "goals_per90_28": goals_per90_28,
+            "matches_14": ends - start_14 + 1,
+            "acwr": minutes_sum_7 / chronic,
+            "minutes_slope": _tail_slope(
+                prefix_minutes, _prefix(rows * minutes), _prefix(raw_minutes == MISSING), tail_starts, ends
+            ),
+            "goals_slope": _tail_slope(
+                prefix_goals, _prefix(rows * goals), _prefix(raw_goals == MISSING), tail_starts, ends
+            ),
+        }, columns=columns)
+
+
+def prefix_features(store, player_id):
+    """history_features rows of one player, by running compute_rolling_features on each prefix."""
+    records = store.records(player_id)
+    frame = pd.DataFrame({
+        "match_date": pd.to_datetime([r.match_date for r in records]),
+        "minutes_played": [np.nan if r.minutes_played is None else r.minutes_played for r in records],
+        "goals": [np.nan if r.goals is None else r.goals for r in records],
+    })
+    rows = []
+    for i, record in enumerate(records):
+        if i + 1 < len(records) and records[i + 1].match_date == record.match_date:
+            continue
+        prefix = frame.iloc[: i + 1]
+        slope = _goals_trend_slope(prefix)
+        rows.append({
+            "player_id": player_id,
+            "day": record.match_date.toordinal() - _EPOCH,
+            "matches": i + 1,
+            **compute_rolling_features(prefix),
+            "goals_slope": 0.0 if slope is None else slope,
+        })
+    return pd.DataFrame(rows, columns=["player_id", "day", "matches", *FEATURE_COLUMNS, "goals_slope"])
+
+
+def injury_sample(history, index, horizon_days=INJURY_HORIZON_DAYS, end_day=None, window_days=INJURY_WINDOW_DAYS):
+    """
+    history rows whose horizon ends by end_day (default: the last match date), with injuries_365
+    (injuries starting in the window up to the match date), `outcome` (1.0 when an injury starts
+    within horizon_days after the match date) and known_day. Rows with a missing minutes slope are dropped.
+    """
+    player_ids, days = history["player_id"].to_numpy(), history["day"].to_numpy(dtype=np.int64)
+    end_day = int(days.max()) if end_day is None and len(days) else end_day
+
+    def since(day):
+        return index.counts_since(player_ids, day)
+
+    after_match = since(days + 1)
+    sample = history.assign(
+        injuries_365=since(days - window_days) - after_match,
+        outcome=((after_match - since(days + horizon_days + 1)) > 0).astype(float),
+        known_day=days + horizon_days,
+    )
+    keep = (sample["known_day"].to_numpy() <= end_day) & np.isfinite(sample["minutes_slope"].to_numpy())
+    return sample[keep].reset_index(drop=True)
+
+
+def investment_sample(history, market_rows, horizon_days=INVESTMENT_HORIZON_DAYS):
+    """
+    history rows of players with 2+ matches, a valuation on or before the match date and one on or
+    after the end of the horizon, with `outcome` = relative change of the latest valuation from the
+    match date to horizon_days later, and known_day.
+    """
+    if not market_rows or history.empty:
+        return history.iloc[:0].assign(outcome=[], known_day=[])
+    market_ids, market_dates, market_values = (np.asarray(c) for c in zip(*market_rows))
+    market_days = np.fromiter(
+        ((d if isinstance(d, date) else date.fromisoformat(str(d)[:10])).toordinal() - _EPOCH for d in market_dates),
+        dtype=np.int64, count=len(market_dates),
+    )
+    market_keys = _keys(market_ids, market_days)
+    market_ids, market_values = market_ids.astype(np.int64), market_values.astype(float)
+    player_ids, days = history["player_id"].to_numpy(dtype=np.int64), history["day"].to_numpy(dtype=np.int64)
+
+    def latest(day):
+        """(value, day, found) of each player's latest valuation on or before `day`."""
+        pos = np.searchsorted(market_keys, _keys(player_ids, day), side="right") - 1
+        found = (pos >= 0) & (market_ids[np.maximum(pos, 0)] == player_ids)
+        pos = np.maximum(pos, 0)
+        return market_values[pos], market_days[pos], found
+
+    horizon_end = days + horizon_days
+    start_value, _, has_start = latest(days)
+    end_value, _, has_end = latest(horizon_end)
+    _, last_day, has_any = latest(np.full(len(days), np.iinfo(np.int32).max))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        outcome = np.where(start_value > 0, end_value / start_value - 1.0, np.nan)
+    sample = history.assign(outcome=outcome, known_day=horizon_end)
+    keep = (
+        has_start & has_end & has_any & (last_day >= horizon_end) & (start_value > 0)
+        & (history["matches"].to_numpy() > 1) & np.isfinite(history["goals_slope"].to_numpy())
+    )
+    return sample[keep].reset_index(drop=True)
+
+
+# ================================
+# Scoring
+# ================================
+
+def _sigmoid(raw):
+    return 1.0 / (1.0 + np.exp(-raw))
+
+
+def predictions(kind, inputs, params):
+    """The heuristic of `kind` with coefficients `params` on sample columns `inputs` ({name: array})."""
+    if kind == "injury":
+        raw = (
+            params["intercept"]
+            - params["acwr"] * (1.0 - inputs["acwr"])
+            + params["matches_14"] * inputs["matches_14"]
+            + params["minutes_slope"] * inputs["minutes_slope"]
+        )
+        return np.clip(_sigmoid(raw) + params["injury_bump"] * inputs["injuries_365"], 0.0, 1.0)
+    return np.tanh(inputs["goals_slope"] / params["scale"]) * params["cap"]
+
+
+def losses(kind, predicted, outcome):
+    """Per-sample loss: log loss for the injury probability, absolute error for the investment change."""
+    if kind == "injury":
+        p = np.clip(predicted, _EPS, 1.0 - _EPS)
+        return -(outcome * np.log(p) + (1.0 - outcome) * np.log(1.0 - p))
+    return np.abs(predicted - outcome)
+
+
+def _auc(predicted, outcome):
+    positives = int(outcome.sum())
+    negatives = len(outcome) - positives
+    if not positives or not negatives:
+        return float("nan")
+    ranks = pd.Series(predicted).rank().to_numpy()
+    return float((ranks[outcome == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def metrics(kind, sample, params):
+    """Loss plus the usual summary scores of one coefficient set on a whole sample."""
+    inputs = _inputs(kind, sample)
+    outcome = sample["outcome"].to_numpy(dtype=float)
+    predicted = predictions(kind, inputs, params)
+    result = {LOSSES[kind]: float(losses(kind, predicted, outcome).mean()) if len(outcome) else float("nan")}
+    if kind == "injury":
+        result["brier"] = float(np.mean((predicted - outcome) ** 2)) if len(outcome) else float("nan")
+        result["auc"] = _auc(predicted, outcome)
+        result["mean_probability"] = float(predicted.mean()) if len(outcome) else float("nan")
+        result["outcome_rate"] = float(outcome.mean()) if len(outcome) else float("nan")
+    else:
+        result["rmse"] = float(np.sqrt(np.mean((predicted - outcome) ** 2))) if len(outcome) else float("nan")
+        result["direction_hit_rate"] = float(np.mean(np.sign(predicted) == np.sign(outcome))) if len(outcome) else float("nan")
+    return result
+
+
+_INPUTS = {
+    "injury": ("acwr", "matches_14", "minutes_slope", "injuries_365"),
+    "investment": ("goals_slope",),
+}
+
+
+def _inputs(kind, sample):
+    return {name: sample[name].to_numpy(dtype=float) for name in _INPUTS[kind]}
+
+
+def combinations(kind, grid=None):
+    """(names, rows): every combination of `grid` (default DEFAULT_GRIDS) with the heuristic's values added."""
+    grid = {**DEFAULT_GRIDS[kind], **(grid or {})}
+    unknown = set(grid) - set(HEURISTICS[kind])
+    if unknown:
+        raise ValueError(f"unknown {kind} coefficients: {', '.join(sorted(unknown))}")
+    names = tuple(HEURISTICS[kind])
+    axes = [sorted(set(map(float, grid[name])) | {HEURISTICS[kind][name]}) for name in names]
+    return names, np.array(list(itertools.product(*axes)), dtype=float)
+
+
+# worker state, set once per process by _init_worker (the sample is shipped once, not per task)
+_worker = {}
+
+
+def _init_worker(kind, inputs, outcome, test_folds, known_folds, n_folds):
+    _worker.update(kind=kind, inputs=inputs, outcome=outcome, test_folds=test_folds,
+                   known_folds=known_folds, n_folds=n_folds)
+
+
+def _fold_losses(names, rows):
+    """(loss sums per test fold, loss sums per known fold) for each coefficient row."""
+    w = _worker
+    test_sums = np.empty((len(rows), w["n_folds"]))
+    known_sums = np.empty((len(rows), w["n_folds"]))
+    for i, row in enumerate(rows):
+        loss = losses(w["kind"], predictions(w["kind"], w["inputs"], dict(zip(names, row))), w["outcome"])
+        test_sums[i] = np.bincount(w["test_folds"], weights=loss, minlength=w["n_folds"])
+        known_sums[i] = np.bincount(w["known_folds"], weights=loss, minlength=w["n_folds"])
+    return test_sums, known_sums
+
+
+def _score_all(names, rows, worker_args, workers):
+    """_fold_losses of every row, in `workers` processes when there are enough rows to split."""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(rows)))
+    if workers == 1:
+        _init_worker(*worker_args)
+        try:
+            return _fold_losses(names, rows)
+        finally:
+            _worker.clear()
+    blocks = np.array_split(rows, workers * 4)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(config.PREDICT_POOL_START_METHOD),
+        initializer=_init_worker,
+        initargs=worker_args,
+    ) as executor:
+        results = list(executor.map(_fold_losses, [names] * len(blocks), blocks))
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def _day_iso(day):
+    return date.fromordinal(int(day) + _EPOCH).isoformat()
+
+
+def walk_forward(kind, sample, grid=None, fold_days=FOLD_DAYS, workers=None, top=5):
+    """
+    Score the heuristic and every combination of `grid` on `sample` (injury_sample / investment_sample).
+    Returns a dict: the heuristic's and the `top` best combinations' metrics on the whole sample, and
+    per fold the combination chosen on the samples known before the fold with its loss on the fold.
+    """
+    names, rows = combinations(kind, grid)
+    heuristic = HEURISTICS[kind]
+    result = {
+        "kind": kind,
+        "loss": LOSSES[kind],
+        "samples": len(sample),
+        "combinations": len(rows),
+        "heuristic": {"params": dict(heuristic), **metrics(kind, sample, heuristic)},
+        "best": [],
+        "folds": [],
+    }
+    if sample.empty:
+        return result
+
+    days = sample["day"].to_numpy(dtype=np.int64)
+    first = int(days.min())
+    test_folds = (days - first) // fold_days
+    known_folds = (sample["known_day"].to_numpy(dtype=np.int64) - first) // fold_days
+    n_folds = int(known_folds.max()) + 1
+    worker_args = (kind, _inputs(kind, sample), sample["outcome"].to_numpy(dtype=float), test_folds, known_folds, n_folds)
+
+    with span("ml.backtest_grid", rows=len(sample) * (len(rows) + 1)):
+        test_sums, known_sums = _score_all(names, np.vstack([rows, [heuristic[n] for n in names]]), worker_args, workers)
+    test_counts = np.bincount(test_folds, minlength=n_folds)
+    known_counts = np.cumsum(np.bincount(known_folds, minlength=n_folds))
+
+    totals = test_sums[:-1].sum(axis=1)
+    for i in np.argsort(totals, kind="stable")[:top]:
+        params = dict(zip(names, rows[i].tolist()))
+        result["best"].append({"params": params, **metrics(kind, sample, params)})
+
+    known_cum = np.cumsum(known_sums, axis=1)
+    oos_loss = heuristic_loss = oos_samples = 0.0
+    for k in range(1, n_folds):
+        if not test_counts[k] or not known_counts[k - 1]:
+            continue
+        chosen = int(np.argmin(known_cum[:-1, k - 1]))
+        result["folds"].append({
+            "start": _day_iso(first + k * fold_days),
+            "train_samples": int(known_counts[k - 1]),
+            "samples": int(test_counts[k]),
+            "params": dict(zip(names, rows[chosen].tolist())),
+            "loss": float(test_sums[chosen, k] / test_counts[k]),
+            "heuristic_loss": float(test_sums[-1, k] / test_counts[k]),
+        })
+        oos_loss += test_sums[chosen, k]
+        heuristic_loss += test_sums[-1, k]
+        oos_samples += test_counts[k]
+    if oos_samples:
+        result["walk_forward"] = {
+            "samples": int(oos_samples),
+            "loss": float(oos_loss / oos_samples),
+            "heuristic_loss": float(heuristic_loss / oos_samples),
+        }
+    return result
+
+
+def run_backtest(
+    db,
+    kinds=KINDS,
+    grids=None,
+    fold_days=FOLD_DAYS,
+    injury_horizon_days=INJURY_HORIZON_DAYS,
+    investment_horizon_days=INVESTMENT_HORIZON_DAYS,
+    workers=None,
+    top=5,
+):
+    """Backtest the heuristics of `kinds` on the whole database. grids: {kind: {coefficient: values}}."""
+    grids = grids or {}
+    store = load_stats(db, models.Player.id.isnot(None))
+    history = history_features(store)
+    results = {}
+    if "injury" in kinds:
+        index = load_injury_index(db, models.Player.id.isnot(None))
+        end_day = max(int(store.days.max()) if len(store) else 0, int(index.days.max()) if len(index) else 0)
+        sample = injury_sample(history, index, injury_horizon_days, end_day=end_day)
+        results["injury"] = walk_forward("injury", sample, grids.get("injury"), fold_days, workers, top)
+        results["injury"]["horizon_days"] = injury_horizon_days
+    if "investment" in kinds:
+        market_rows = crud.get_market_value_rows(db, models.Player.id.isnot(None))
+        sample = investment_sample(history, market_rows, investment_horizon_days)
+        results["investment"] = walk_forward("investment", sample, grids.get("investment"), fold_days, workers, top)
+        results["investment"]["horizon_days"] = investment_horizon_days
+    return {"matches": len(store), "history_rows": len(history), "results": results}
@@ -0,0 +1,116 @@
+# backend/ml/batch.py
+"""
+Batch scoring across a process pool.
+
+- score_chunks(frames, horizon_days): score player chunks in worker processes, yielding
+  {key: result} dicts as each chunk completes
+- split_players(stats, player_col, chunk_size): cut a long-format stats table (or StatStore) into per-player chunks
+
+pandas/NumPy feature work holds the GIL, so large scoring runs are fanned out to a
+ProcessPoolExecutor (size: config.PREDICT_POOL_WORKERS) instead of the request threadpool.
+NumPy / pandas and the scorer are imported on first use, so main.py can import this module
+(for shutdown_pool) without loading them.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .. import config
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Lazily start the shared process pool (None when pooling is disabled)."""
+    global _executor
+    if config.PREDICT_POOL_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=config.PREDICT_POOL_WORKERS,
+                mp_context=multiprocessing.get_context(config.PREDICT_POOL_START_METHOD),
+            )
+        return _executor
+
+
+def shutdown_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def split_players(stats_df, player_col: str = "player_id", chunk_size: int = None):
+    """
+    Split a long-format stats table into frames of at most chunk_size players (rows of a player stay together).
+    A StatStore is split into smaller stores, which are also much cheaper to ship to the workers.
+    """
+    import numpy as np
+    import pandas as pd
+
+    from .store import StatStore
+
+    chunk_size = chunk_size or config.PREDICT_BATCH_CHUNK_PLAYERS
+    if isinstance(stats_df, StatStore):
+        return stats_df.split(chunk_size)
+    if stats_df.empty:
+        return []
+    codes, _ = pd.factorize(stats_df[player_col], sort=True)
+    chunk_ids = codes // chunk_size
+    return [stats_df[chunk_ids == i] for i in np.unique(chunk_ids)]
+
+
+def _score_chunk(stats_df, horizon_days, player_col, injuries=None):
+    from .predict import score_players_batch
+
+    return score_players_batch(stats_df, horizon_days=horizon_days, player_col=player_col, injuries=injuries)
+
+
+def _chunk_injuries(frame, injuries, player_col):
+    """The part of {player_id: injuries_365} a chunk needs (keeps what is shipped to a worker small)."""
+    if not injuries:
+        return None
+    from .store import StatStore
+
+    keys = frame.player_ids.tolist() if isinstance(frame, StatStore) else frame[player_col].unique().tolist()
+    return {key: injuries[key] for key in keys if key in injuries}
+
+
+def _with_market(chunk, market, horizon_days):
+    """Swap in market trends (computed once in the parent, see ml/market.py) for the investment results."""
+    if market:
+        for key, result in chunk.items():
+            trend = market.get(key)
+            if trend is not None:
+                result["investment"] = {"horizon_days": horizon_days, **trend}
+    return chunk
+
+
+def score_chunks(
+    frames, horizon_days: int = 180, player_col: str = "player_id", market: dict = None, injuries: dict = None
+):
+    """
+    Yield {key: result} per chunk as chunks finish; a single chunk (or no pool) is scored in-process.
+    market: {key: market_trend dict} overriding the investment forecast of those players;
+    injuries: {key: injuries_365} for the injury forecast.
+    """
+    executor = get_executor() if len(frames) > 1 else None
+    if executor is None:
+        for frame in frames:
+            chunk = _score_chunk(frame, horizon_days, player_col, _chunk_injuries(frame, injuries, player_col))
+            yield _with_market(chunk, market, horizon_days)
+        return
+    futures = [
+        executor.submit(_score_chunk, frame, horizon_days, player_col, _chunk_injuries(frame, injuries, player_col))
+        for frame in frames
+    ]
+    try:
+        for future in as_completed(futures):
+            yield _with_market(future.result(), market, horizon_days)
+    finally:
+        for future in futures:
+            future.cancel()
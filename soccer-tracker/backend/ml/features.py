@@ -0,0 +1,201 @@
+# backend/ml/features.py
+"""
+League-wide feature engine for Soccer Player Tracker.
+
+- compute_rolling_features_batch(stats_df): one long-format stats table (every player) → feature matrix
+- batch_features_to_dicts(features_df): feature matrix → {player_id: features dict}
+- compute_tail_slope_batch(stats_df, col): per-player _slope of the last 8 values of `col`, in input row order
+- compute_rolling_features_store(store) / compute_tail_slope_store(store, col): the same, straight from the
+  arrays of a store.StatStore (already grouped and sorted, so no DataFrame and no sort)
+
+Produces the same features as predict.compute_rolling_features, but for every player in a single
+grouped, vectorized pass (one sort + a handful of np.bincount reductions) instead of one pandas
+pipeline per player.
+"""
+
+import numpy as np
+import pandas as pd
+
+FEATURE_COLUMNS = [
+    "minutes_sum_7",
+    "minutes_avg_28",
+    "goals_per90_28",
+    "matches_14",
+    "acwr",
+    "minutes_slope",
+]
+
+_INT_FEATURES = ("minutes_sum_7", "matches_14")
+
+_NS_PER_DAY = 86_400 * 10**9
+_SLOPE_WINDOW = 8
+
+
+def _empty_features(index=None, name="player_id"):
+    idx = pd.Index([] if index is None else index, name=name)
+    df = pd.DataFrame(0.0, index=idx, columns=FEATURE_COLUMNS)
+    for col in _INT_FEATURES:
+        df[col] = df[col].astype("int64")
+    return df
+
+
+def _metric(df, col, order):
+    """Return a float array for `col` in sorted order, or None if the column is missing."""
+    if col not in df.columns:
+        return None
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)[order]
+
+
+def _group_tail_slope(codes, counts, values, window=_SLOPE_WINDOW):
+    """
+    Per-group least-squares slope of the last `window` values (x = 0..k-1), i.e. _slope(values[-window:])
+    for every group at once. `codes` must be grouped (sorted) and `values` aligned with it.
+    Groups with fewer than 2 values get 0.0; a NaN in the tail gives NaN, as np.polyfit does.
+    """
+    n_groups = len(counts)
+    ends = np.cumsum(counts)
+    from_end = ends[codes] - 1 - np.arange(len(codes))
+    in_tail = from_end < window
+    k = np.minimum(counts, window).astype(float)
+    x_centered = (k[codes] - 1 - from_end) - (k[codes] - 1) / 2.0
+    nan = np.isnan(values)
+    weights = np.where(in_tail & ~nan, x_centered * np.where(nan, 0.0, values), 0.0)
+    numerator = np.bincount(codes, weights=weights, minlength=n_groups)
+    tail_has_nan = np.bincount(codes, weights=in_tail & nan, minlength=n_groups) > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = numerator / (k * (k * k - 1) / 12.0)
+    slope = np.where(k > 1, slope, 0.0)
+    return np.where((k > 1) & tail_has_nan, np.nan, slope)
+
+
+def compute_rolling_features_batch(stats_df: pd.DataFrame, player_col: str = "player_id"):
+    """
+    stats_df: long-format stats for any number of players; needs `player_col` and match_date (or date),
+    plus any of minutes_played / goals.
+    Returns a DataFrame indexed by player id with FEATURE_COLUMNS, matching compute_rolling_features
+    for each player's rows (up to float rounding in minutes_slope; ties in match_date keep input order).
+    """
+    if stats_df is None or stats_df.empty:
+        return _empty_features(name=player_col)
+
+    date_col = "match_date" if "match_date" in stats_df.columns else "date" if "date" in stats_df.columns else None
+    codes, players = pd.factorize(stats_df[player_col], sort=True)
+    n_players = len(players)
+    if date_col is None:
+        return _empty_features(players, name=player_col)
+
+    dates = pd.to_datetime(stats_df[date_col]).to_numpy(dtype="datetime64[ns]").astype("int64")
+    # lexsort is stable: group by player, then by date, keeping input order for same-day rows
+    order = np.lexsort((dates, codes))
+    codes = codes[order]
+    counts = np.bincount(codes, minlength=n_players)
+    return _features_from_sorted(
+        players,
+        player_col,
+        codes,
+        counts,
+        dates[order],
+        _NS_PER_DAY,
+        _metric(stats_df, "minutes_played", order),
+        _metric(stats_df, "goals", order),
+    )
+
+
+def compute_rolling_features_store(store):
+    """compute_rolling_features_batch for a store.StatStore; its rows are already in (player, history) order."""
+    return _features_from_sorted(
+        store.player_ids,
+        "player_id",
+        store.codes(),
+        store.counts(),
+        store.days.astype("int64"),
+        1,
+        store.column("minutes_played"),
+        store.column("goals"),
+    )
+
+
+def _features_from_sorted(players, player_col, codes, counts, dates, day, minutes, goals):
+    """
+    Feature matrix from rows grouped by player (codes) and sorted by date within each player.
+    `dates` are integers in units where one day is `day`; minutes / goals are float arrays or None.
+    """
+    n_players = len(players)
+    ends = np.cumsum(counts)
+    last_date = dates[ends - 1]
+    age = last_date[codes] - dates
+    in_7 = age <= 7 * day
+    in_14 = age <= 14 * day
+    in_28 = age <= 28 * day
+
+    def group_sum(weights):
+        return np.bincount(codes, weights=weights, minlength=n_players)
+
+    out = _empty_features(players, name=player_col)
+    out["matches_14"] = group_sum(in_14).astype("int64")
+
+    if minutes is None:
+        return out
+
+    # pandas sums skip NaN; mirror that with a validity mask
+    valid = ~np.isnan(minutes)
+    minutes_0 = np.where(valid, minutes, 0.0)
+
+    minutes_sum_7 = group_sum(minutes_0 * in_7).astype("int64")
+    minutes_sum_28 = group_sum(minutes_0 * in_28)
+    valid_28 = group_sum(valid & in_28)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        minutes_avg_28 = minutes_sum_28 / valid_28
+
+    total_min_28 = minutes_sum_28.astype("int64")
+    if goals is not None:
+        total_goals_28 = group_sum(np.where(np.isnan(goals), 0.0, goals) * in_28).astype("int64")
+    else:
+        total_goals_28 = np.zeros(n_players, dtype="int64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        goals_per90_28 = np.where(total_min_28 > 0, total_goals_28 / total_min_28 * 90.0, 0.0)
+
+    chronic = np.where(minutes_avg_28 > 0, minutes_avg_28, 1e-6)
+    acwr = minutes_sum_7 / chronic
+
+    slope = _group_tail_slope(codes, counts, minutes)
+
+    out["minutes_sum_7"] = minutes_sum_7
+    out["minutes_avg_28"] = minutes_avg_28
+    out["goals_per90_28"] = goals_per90_28
+    out["acwr"] = acwr
+    out["minutes_slope"] = slope
+    return out
+
+
+def compute_tail_slope_batch(stats_df: pd.DataFrame, col: str, player_col: str = "player_id"):
+    """
+    Per-player slope of the last 8 values of `col` in input row order (what predict_investment_from_stats_df
+    does with goals). Returns a float Series indexed by player id.
+    """
+    if stats_df is None or stats_df.empty or col not in stats_df.columns:
+        return pd.Series([], index=pd.Index([], name=player_col), dtype=float)
+    codes, players = pd.factorize(stats_df[player_col], sort=True)
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    counts = np.bincount(codes, minlength=len(players))
+    slope = _group_tail_slope(codes, counts, _metric(stats_df, col, order))
+    return pd.Series(slope, index=pd.Index(players, name=player_col))
+
+
+def compute_tail_slope_store(store, col: str):
+    """compute_tail_slope_batch for a store.StatStore (rows in history order, as get_stat_rows returns them)."""
+    slope = _group_tail_slope(store.codes(), store.counts(), store.column(col))
+    return pd.Series(slope, index=pd.Index(store.player_ids, name="player_id"))
+
+
+def batch_features_to_dicts(features_df: pd.DataFrame):
+    """Convert a feature matrix into {player_id: features dict} with the same types as compute_rolling_features."""
+    result = {}
+    columns = [features_df[c].to_numpy() for c in FEATURE_COLUMNS]
+    for i, player_id in enumerate(features_df.index):
+        feats = {}
+        for name, values in zip(FEATURE_COLUMNS, columns):
+            feats[name] = int(values[i]) if name in _INT_FEATURES else float(values[i])
+        result[player_id.item() if hasattr(player_id, "item") else player_id] = feats
+    return result
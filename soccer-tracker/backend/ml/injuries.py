@@ -0,0 +1,92 @@
+# backend/ml/injuries.py
+"""
+Injury history lookups for the injury forecast.
+
+- InjuryIndex: every loaded player's injury start dates as one sorted int32 day array grouped by
+  player (offsets, like StatStore); count_since() bisects one player's slice, counts_since() does
+  a whole league in one searchsorted
+- load_injury_index(db, *player_filters): InjuryIndex for every player matching the filters (one query)
+- recent_injury_counts(index, store): {player_id: injuries starting at most INJURY_WINDOW_DAYS
+  before the player's last match} for the players of a StatStore, the `injuries_365` feature
+
+Counting "start_date >= last match - 365 days" is what predict_injury_from_stats_df does with an
+injuries_df; the single-player DB path runs the same count in SQL (crud.count_recent_injuries).
+"""
+
+import bisect
+from datetime import date
+
+import numpy as np
+
+from .. import crud
+
+INJURY_WINDOW_DAYS = 365
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def _to_day(value):
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - _EPOCH
+
+
+class InjuryIndex:
+    """Injury start days per player; rows of player_ids[i] are offsets[i]:offsets[i + 1] of `days`, ascending."""
+
+    __slots__ = ("player_ids", "offsets", "days")
+
+    def __init__(self, player_ids, offsets, days):
+        self.player_ids = player_ids  # int64, sorted, unique
+        self.offsets = offsets  # int64, len(player_ids) + 1
+        self.days = days  # int32 days since 1970-01-01
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (player_id, start_date) tuples sorted by player, then start_date (crud.get_injury_rows)."""
+        n = len(rows)
+        player_col = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+        days = np.fromiter((_to_day(r[1]) for r in rows), dtype=np.int32, count=n)
+        starts = np.flatnonzero(np.r_[True, player_col[1:] != player_col[:-1]]) if n else np.zeros(0, dtype=np.int64)
+        return cls(player_col[starts], np.append(starts, n).astype(np.int64), days)
+
+    def __len__(self):
+        return len(self.days)
+
+    def count_since(self, player_id, day):
+        """Injuries of the player starting on or after `day` (days since 1970-01-01)."""
+        i = bisect.bisect_left(self.player_ids, player_id)
+        if i == len(self.player_ids) or self.player_ids[i] != player_id:
+            return 0
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return end - bisect.bisect_left(self.days, day, start, end)
+
+    def counts_since(self, player_ids, days):
+        """count_since for arrays of players and cutoff days at once."""
+        player_ids = np.asarray(player_ids, dtype=np.int64)
+        days = np.asarray(days, dtype=np.int64)
+        if not len(self.player_ids) or not len(player_ids):
+            return np.zeros(len(player_ids), dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.player_ids, player_ids), len(self.player_ids) - 1)
+        known = self.player_ids[pos] == player_ids
+        # one sorted key space: (player position, day); a cutoff's insertion point is its count boundary
+        keys = np.repeat(np.arange(len(self.player_ids), dtype=np.int64), np.diff(self.offsets)) << 32
+        keys |= self.days.astype(np.int64) - np.iinfo(np.int32).min
+        cutoffs = (pos.astype(np.int64) << 32) | (np.clip(days, np.iinfo(np.int32).min, np.iinfo(np.int32).max)
+                                                  - np.iinfo(np.int32).min)
+        counts = self.offsets[pos + 1] - np.searchsorted(keys, cutoffs, side="left")
+        return np.where(known, counts, 0)
+
+
+def load_injury_index(db, *player_filters):
+    """InjuryIndex of every player matching `player_filters` (criteria on models.Player), in one query."""
+    return InjuryIndex.from_rows(crud.get_injury_rows(db, *player_filters))
+
+
+def recent_injury_counts(index, store, window_days=INJURY_WINDOW_DAYS):
+    """{player_id: injuries in the window before the player's last match} for every player of `store`."""
+    if not store.n_players:
+        return {}
+    last_days = store.days[store.offsets[1:] - 1].astype(np.int64)
+    counts = index.counts_since(store.player_ids, last_days - window_days)
+    return dict(zip(store.player_ids.tolist(), counts.tolist()))
@@ -0,0 +1,129 @@
+# backend/ml/kernel.py
+"""
+NumPy-only scoring kernel for a single player.
+
+- stats_arrays(stats_df): (dates, minutes, goals) plain arrays from a stats DataFrame, or None when the
+  pandas reference path has to handle it (unparseable dates / NaT, non-numeric metrics)
+- rolling_features(dates, minutes, goals): same dict as predict.compute_rolling_features_pandas
+- tail_slope(values): closed-form least-squares slope of a short sequence (x = 0..k-1), what _slope
+  computes with np.polyfit
+
+For the 10-50 rows of one player, DataFrame.copy / pd.to_datetime / sort_values / boolean-mask
+indexing and np.polyfit cost far more than the arithmetic; this does one stable argsort and a few
+masked sums. The public predict.*_from_stats_df functions dispatch here automatically.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+_NS_PER_DAY = 86_400 * 10**9
+_SLOPE_WINDOW = 8
+_NAT = np.datetime64("NaT", "ns").astype("int64")
+
+
+def default_features():
+    return {
+        "minutes_sum_7": 0,
+        "minutes_avg_28": 0.0,
+        "goals_per90_28": 0.0,
+        "matches_14": 0,
+        "acwr": 0.0,  # acute / chronic workload ratio (minutes)
+        "minutes_slope": 0.0,
+    }
+
+
+def tail_slope(values):
+    """Least-squares slope of `values` against 0..k-1; 0.0 below 2 points, NaN if any value is NaN."""
+    k = len(values)
+    if k < 2:
+        return 0.0
+    x_centered = np.arange(k) - (k - 1) / 2.0
+    return float(np.dot(x_centered, values) / (k * (k * k - 1) / 12.0))
+
+
+def _dates_ns(series):
+    """int64 nanoseconds; numpy parses ISO strings / date objects directly, pandas handles the rest."""
+    if np.issubdtype(series.dtype, np.datetime64):
+        return series.to_numpy(dtype="datetime64[ns]").astype("int64")
+    try:
+        return np.asarray(series.to_numpy(), dtype="datetime64[ns]").astype("int64")
+    except (ValueError, TypeError):
+        return pd.to_datetime(series).to_numpy(dtype="datetime64[ns]").astype("int64")
+
+
+def _float_column(df, col):
+    if col not in df.columns:
+        return None
+    if df[col].dtype.kind not in "iufb":
+        # object columns (e.g. all None) behave differently under pandas sums / np.polyfit
+        raise TypeError(f"non-numeric column {col}")
+    return df[col].to_numpy(dtype=float, na_value=np.nan)
+
+
+def stats_arrays(stats_df):
+    """
+    (dates as int64 ns, minutes or None, goals or None) from a per-player stats DataFrame, in input order.
+    An empty frame or one without match_date / date gives empty dates. Returns None for input only the
+    pandas path reproduces faithfully (missing dates, non-numeric metric columns).
+    """
+    if stats_df is None or stats_df.empty:
+        return np.empty(0, dtype="int64"), None, None
+    date_col = "match_date" if "match_date" in stats_df.columns else "date" if "date" in stats_df.columns else None
+    if date_col is None:
+        return np.empty(0, dtype="int64"), None, None
+    try:
+        dates = _dates_ns(stats_df[date_col])
+        minutes = _float_column(stats_df, "minutes_played")
+        goals = _float_column(stats_df, "goals")
+    except (ValueError, TypeError):
+        return None
+    if (dates == _NAT).any():
+        return None
+    return dates, minutes, goals
+
+
+def rolling_features(dates, minutes=None, goals=None, day=_NS_PER_DAY):
+    """
+    Rolling features of one player from plain arrays in any row order: `dates` as integers where one
+    day is `day` units (int64 ns by default), minutes / goals as float arrays (NaN = missing) or None.
+    Same-day rows keep their input order, as in the pandas path.
+    """
+    features = default_features()
+    if len(dates) == 0:
+        return features
+
+    order = np.argsort(dates, kind="stable")
+    dates = dates[order]
+    last_date = dates[-1]
+    in_7 = dates >= last_date - 7 * day
+    in_14 = dates >= last_date - 14 * day
+    in_28 = dates >= last_date - 28 * day
+
+    total_min_28 = 0
+    if minutes is not None:
+        minutes = minutes[order]
+        valid = ~np.isnan(minutes)
+        minutes_0 = np.where(valid, minutes, 0.0)
+        features["minutes_sum_7"] = int(minutes_0[in_7].sum())
+        sum_28 = minutes_0[in_28].sum()
+        count_28 = int(np.count_nonzero(valid & in_28))
+        features["minutes_avg_28"] = float(sum_28 / count_28) if count_28 else math.nan
+        total_min_28 = int(sum_28)
+
+    total_goals_28 = 0
+    if goals is not None:
+        goals_28 = goals[order][in_28]
+        total_goals_28 = int(goals_28[~np.isnan(goals_28)].sum())
+    if total_min_28 > 0:
+        features["goals_per90_28"] = float(total_goals_28 / total_min_28 * 90.0)
+
+    features["matches_14"] = int(np.count_nonzero(in_14))
+
+    chronic = features["minutes_avg_28"] if features["minutes_avg_28"] > 0 else 1e-6
+    features["acwr"] = float(features["minutes_sum_7"] / chronic)
+
+    if minutes is not None and len(minutes) > 1:
+        features["minutes_slope"] = tail_slope(minutes[-_SLOPE_WINDOW:])
+    return features
@@ -0,0 +1,106 @@
+# backend/ml/market.py
+"""
+Market value trends for the investment forecast.
+
+- market_trends(player_ids, days, values, horizon_days): least-squares trend of every player's
+  valuation series in one vectorized pass → {player_id: investment dict with method "market_trend"}
+- load_market_trends(db, *player_filters, horizon_days): the same for every player matching the
+  filters, from one query over the market_values table
+- market_trend_for_player(db, player_id, horizon_days): single-player form used by predict_investment
+
+Each player's series is windowed to the config.MARKET_WINDOW_DAYS before their latest valuation.
+The dicts match the market_trend branch of predict_investment_from_stats_df (np.polyfit on days
+since the first valuation, extrapolated horizon_days past the last one), plus model_version.
+Players with fewer than two valuations in the window get no entry and fall back to the stats.
+"""
+
+from datetime import date
+
+import numpy as np
+
+from .. import config, crud, models
+from ..metrics import span
+from .registry import HEURISTIC_VERSION
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def _to_day(value):
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - _EPOCH
+
+
+def _windowed(player_ids, days, values, window_days):
+    """Drop valuations older than window_days before each player's latest one (rows sorted by player, date)."""
+    if not window_days or not len(days):
+        return player_ids, days, values
+    ends = np.flatnonzero(np.r_[player_ids[1:] != player_ids[:-1], True])
+    codes = np.repeat(np.arange(len(ends)), np.diff(np.r_[-1, ends]))
+    keep = days >= days[ends][codes] - window_days
+    return player_ids[keep], days[keep], values[keep]
+
+
+def market_trends(player_ids, days, values, horizon_days=180, window_days=None):
+    """
+    Investment dicts from valuation series given as parallel arrays sorted by player, then day
+    (days as integers, one unit per day). Returns {player_id: dict} for players with 2+ valuations.
+    """
+    window_days = config.MARKET_WINDOW_DAYS if window_days is None else window_days
+    player_ids, days, values = _windowed(
+        np.asarray(player_ids, dtype=np.int64), np.asarray(days, dtype=np.int64), np.asarray(values, dtype=float),
+        window_days,
+    )
+    if not len(days):
+        return {}
+    with span("ml.market_trends", rows=len(days)):
+        starts = np.flatnonzero(np.r_[True, player_ids[1:] != player_ids[:-1]])
+        counts = np.diff(np.r_[starts, len(days)])
+        codes = np.repeat(np.arange(len(starts)), counts)
+
+        # centered least squares per player: slope = sum(dx * dy) / sum(dx^2)
+        x = (days - days[starts][codes]).astype(float)
+        x_mean = np.bincount(codes, weights=x) / counts
+        y_mean = np.bincount(codes, weights=values) / counts
+        dx = x - x_mean[codes]
+        sxx = np.bincount(codes, weights=dx * dx)
+        sxy = np.bincount(codes, weights=dx * (values - y_mean[codes]))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slopes = np.where(sxx > 0, sxy / sxx, 0.0)
+
+        last_values = values[starts + counts - 1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct = np.where(last_values > 0, slopes * horizon_days / last_values, 0.0)
+
+        results = {}
+        for player_id, n, slope, last_value, pct_change in zip(
+            player_ids[starts].tolist(), counts.tolist(), slopes.tolist(), last_values.tolist(), pct.tolist()
+        ):
+            if n > 1:
+                results[player_id] = {
+                    "predicted_pct_change": float(pct_change),
+                    "method": "market_trend",
+                    "slope_per_day": float(slope),
+                    "last_value": float(last_value),
+                    "model_version": HEURISTIC_VERSION,
+                }
+        return results
+
+
+def _trends_from_rows(rows, horizon_days):
+    if not rows:
+        return {}
+    player_ids, dates, values = zip(*rows)
+    days = np.fromiter((_to_day(d) for d in dates), dtype=np.int64, count=len(rows))
+    return market_trends(player_ids, days, values, horizon_days=horizon_days)
+
+
+def load_market_trends(db, *player_filters, horizon_days=180):
+    """{player_id: market_trend dict} for every player matching `player_filters` (criteria on models.Player)."""
+    return _trends_from_rows(crud.get_market_value_rows(db, *player_filters), horizon_days)
+
+
+def market_trend_for_player(db, player_id, horizon_days=180):
+    """The player's market_trend dict, or None without two valuations in the window."""
+    rows = crud.get_market_value_rows(db, models.Player.id == player_id)
+    return _trends_from_rows(rows, horizon_days).get(player_id)
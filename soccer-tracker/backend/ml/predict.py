@@ -3,18 +3,52 @@
 Prediction helpers for Soccer Player Tracker.
 
 - compute_rolling_features(stats_df): builds rolling features from per-game stats
+  (NumPy kernel, see ml/kernel.py; compute_rolling_features_pandas is the reference implementation)
 - predict_injury_from_stats_df(stats_df, injuries_df=None): returns (probability 0..1, features)
 - predict_investment_from_stats_df(stats_df, market_df=None, horizon_days=180): returns dict
-- predict_injury(player_id, db): DB wrapper → probability
-- predict_investment(player_id, db): DB wrapper → dict
-
-Uses only numpy + pandas for now. Replace with real ML models later.
+- predict_injury(player_id, db): DB wrapper → probability (with the player's injuries of the last 365 days)
+- predict_investment(player_id, db): DB wrapper → dict (market value trend when the player has valuations)
+- predict_investment_batch(stats): long-format stats for many players → {player_id: dict}
+- predict_injury_batch(stats): long-format stats for many players → {player_id: probability}
+- score_players_batch(stats, horizon_days): injury + investment results for many players at once
+- team_injury_baseline(team, db): cached per-team injury probabilities + average
+- injury_from_features / investment_from_features / predict_from_stats_df: trained model when one is
+  loaded (see ml/registry.py), heuristic otherwise; results carry the model_version that served them
+
+The DB wrappers memoize results per (player_id, stats version, horizon_days) (see backend/cache.py)
+and read features from the incremental per-player RollingState (see ml/rolling.py).
+The batch functions take either a long-format DataFrame or a columnar StatStore (see ml/store.py).
+
+The *_from_stats_df functions are the heuristics; the DB wrappers and batch functions prefer the
+trained models (python -m backend.manage train-models) and fall back to the heuristics without one.
 """
 
 import pandas as pd
 import numpy as np
 from sqlalchemy.orm import Session
-from .. import crud
+from .. import crud, models
+from ..metrics import span
+from ..cache import player_predictions, team_injury_baselines
+from . import kernel
+from .features import (
+    batch_features_to_dicts,
+    compute_rolling_features_batch,
+    compute_rolling_features_store,
+    compute_tail_slope_batch,
+    compute_tail_slope_store,
+)
+from .registry import (
+    HEURISTIC_VERSION,
+    injury_probabilities,
+    injury_probability,
+    investment_change,
+    investment_changes,
+    model_registry,
+)
+from .injuries import load_injury_index, recent_injury_counts
+from .market import market_trend_for_player
+from .rolling import HISTORY_DAYS, HISTORY_MATCHES, RollingState, rolling_states
+from .store import StatRecord, StatStore, load_stats
 
 
 def _safe_to_datetime(df, col):
@@ -39,7 +73,17 @@ def compute_rolling_features(stats_df: pd.DataFrame):
     """
     stats_df expected columns (at least some of): match_date, minutes_played, goals, assists, touches, tackles_won
     Returns a dict of simple rolling features computed relative to the last match_date in the df.
+    Runs the NumPy kernel; input it cannot take as plain arrays goes through the pandas reference.
     """
+    with span("ml.player_features", rows=0 if stats_df is None else len(stats_df)):
+        arrays = kernel.stats_arrays(stats_df)
+        if arrays is None:
+            return compute_rolling_features_pandas(stats_df)
+        return kernel.rolling_features(*arrays)
+
+
+def compute_rolling_features_pandas(stats_df: pd.DataFrame):
+    """pandas reference implementation of compute_rolling_features (same output, slower for small inputs)."""
     features = {
         "minutes_sum_7": 0,
         "minutes_avg_28": 0.0,
@@ -108,6 +152,11 @@ def predict_injury_from_stats_df(stats_df: pd.DataFrame, injuries_df: pd.DataFra
             injuries_df["start_date"] = pd.to_datetime(injuries_df["start_date"])
             last_date = stats_df["match_date"].max() if "match_date" in stats_df.columns else pd.to_datetime("today")
             recent_injuries = int(injuries_df[injuries_df["start_date"] >= last_date - pd.Timedelta(days=365)].shape[0])
+    return score_injury_features(feats, recent_injuries)
+
+
+def score_injury_features(feats: dict, recent_injuries: int = 0):
+    """Injury heuristic on already computed rolling features. Returns (probability, features)."""
     feats["injuries_365"] = recent_injuries
 
     # Heuristic scoring: tune the coefficients later
@@ -130,8 +179,6 @@ def predict_investment_from_stats_df(stats_df: pd.DataFrame, market_df: pd.DataF
     If market_df exists and has 'market_value' (and date), use linear extrapolation on market value.
     Otherwise fall back to a simple performance trend heuristic based on goals slope.
     """
-    feats = compute_rolling_features(stats_df)
-
     # Use market values if available
     if market_df is not None and not market_df.empty and "market_value" in market_df.columns:
         mdf = market_df.copy()
@@ -163,55 +210,300 @@ def predict_investment_from_stats_df(stats_df: pd.DataFrame, market_df: pd.DataF
             }
 
     # Fallback: use goals slope across last matches
-    if "goals" in stats_df.columns and not stats_df.empty:
-        last_goals = stats_df["goals"].values[-8:] if len(stats_df) >= 1 else np.array([])
-        if len(last_goals) > 1:
-            goals_slope = _slope(last_goals)
-            # map slope to a bounded pct (heuristic): tanh to bound, scaled to ~ +/- 20%
-            predicted_pct = float(np.tanh(goals_slope / 4.0) * 0.2)
-            return {
-                "predicted_pct_change": predicted_pct,
-                "method": "performance_trend",
-                "goals_slope": float(goals_slope),
-            }
+    goals_slope = _goals_trend_slope(stats_df)
+    if goals_slope is not None:
+        return performance_trend(goals_slope)
 
     # Nothing to do
     return {"predicted_pct_change": 0.0, "method": "no_data"}
 
 
+def _goals_trend_slope(stats_df: pd.DataFrame):
+    """Slope of goals over the last 8 rows in input order, or None when the heuristic has no data."""
+    if stats_df is None or "goals" not in stats_df.columns or stats_df.empty:
+        return None
+    last_goals = stats_df["goals"].values[-8:]
+    if len(last_goals) < 2:
+        return None
+    # object columns (e.g. holding None) keep np.polyfit's exact behaviour
+    numeric = last_goals.dtype.kind in "iufb"
+    return kernel.tail_slope(last_goals.astype(float)) if numeric else _slope(last_goals)
+
+
+def performance_trend(goals_slope: float):
+    """Investment heuristic from the slope of goals over the last matches."""
+    # map slope to a bounded pct (heuristic): tanh to bound, scaled to ~ +/- 20%
+    predicted_pct = float(np.tanh(goals_slope / 4.0) * 0.2)
+    return {
+        "predicted_pct_change": predicted_pct,
+        "method": "performance_trend",
+        "goals_slope": float(goals_slope),
+    }
+
+
 # ================================
 # DB Wrappers for FastAPI endpoints
 # ================================
 
-def _stats_to_df(stats):
-    """Convert list of Stat ORM objects into a pandas DataFrame."""
-    if not stats:
-        return pd.DataFrame()
-    data = []
-    for s in stats:
-        row = {
-            "match_date": getattr(s, "match_date", None),
-            "minutes_played": getattr(s, "minutes_played", None),
-            "goals": getattr(s, "goals", None),
-            "assists": getattr(s, "assists", None),
-            "touches": getattr(s, "touches", None),
-            "tackles_won": getattr(s, "tackles_won", None),
+def _rolling_features(stats, player_col):
+    with span("ml.rolling_features", rows=0 if stats is None else len(stats)):
+        if isinstance(stats, StatStore):
+            return compute_rolling_features_store(stats)
+        return compute_rolling_features_batch(stats, player_col=player_col)
+
+
+def predict_investment_batch(stats, player_col: str = "player_id", feats_df: pd.DataFrame = None, market: dict = None):
+    """
+    Investment forecast for every player in a long-format stats table (or StatStore), in one vectorized pass.
+    Returns {player_id: dict}: without a trained model, identical to predict_investment_from_stats_df on each
+    player's rows (plus model_version). feats_df: rolling features of `stats`, if already computed.
+    market: {player_id: market_trend dict} (ml/market.py); those players get their market trend instead,
+    including players without stats.
+    """
+    with span("ml.goals_slope", rows=0 if stats is None else len(stats)):
+        if isinstance(stats, StatStore):
+            goals_slope = compute_tail_slope_store(stats, "goals")
+            counts = pd.Series(stats.counts(), index=goals_slope.index)
+            has_goals = True
+        else:
+            goals_slope = compute_tail_slope_batch(stats, "goals", player_col=player_col)
+            if stats is None or stats.empty:
+                return dict(market or {})
+            counts = stats.groupby(player_col, sort=True).size()
+            has_goals = "goals" in stats.columns
+    predicted = np.tanh(goals_slope.to_numpy() / 4.0) * 0.2
+    method, version = "performance_trend", HEURISTIC_VERSION
+    if has_goals and model_registry.get("investment") is not None:
+        if feats_df is None:
+            feats_df = _rolling_features(stats, player_col)
+        model_result = investment_changes(feats_df, goals_slope.to_numpy())
+        if model_result is not None:
+            (predicted, version), method = model_result, "model"
+
+    results = {}
+    for i, player_id in enumerate(counts.index):
+        key = player_id.item() if hasattr(player_id, "item") else player_id
+        if has_goals and counts.iloc[i] > 1:
+            results[key] = {
+                "predicted_pct_change": float(predicted[i]),
+                "method": method,
+                "goals_slope": float(goals_slope.iloc[i]),
+                "model_version": version,
+            }
+        else:
+            results[key] = {"predicted_pct_change": 0.0, "method": "no_data", "model_version": HEURISTIC_VERSION}
+    if market:
+        results.update(market)
+    return results
+
+
+def _injury_probability(acwr, matches_14, slope):
+    """Vectorized form of the predict_injury_from_stats_df heuristic (no injury history)."""
+    raw = -0.4 * (1.0 - acwr) + 0.08 * matches_14 + 0.05 * slope
+    return np.clip(1.0 / (1.0 + np.exp(-raw)), 0.0, 1.0)
+
+
+# probability predict_injury_from_stats_df gives a player without any stats
+_NO_STATS_INJURY_PROB = float(_injury_probability(0.0, 0, 0.0))
+
+
+def _injury_counts(feats_df, injuries):
+    """Recent injury count per feature row from {player_id: count} (0 for players not listed)."""
+    if not injuries:
+        return np.zeros(len(feats_df), dtype=np.int64)
+    return np.fromiter((injuries.get(pid, 0) for pid in feats_df.index.tolist()), dtype=np.int64, count=len(feats_df))
+
+
+def _injury_batch_probabilities(feats_df, injuries=None):
+    """
+    (probabilities, model version) for a feature matrix: trained model if loaded, else the heuristic.
+    injuries: {player_id: injuries_365}; each adds the same 0.05 bump as the single-player path.
+    """
+    with span("ml.injury_scoring", rows=len(feats_df)):
+        model_result = injury_probabilities(feats_df)
+        if model_result is not None:
+            probs, version = model_result
+        else:
+            probs = _injury_probability(
+                feats_df["acwr"].to_numpy(), feats_df["matches_14"].to_numpy(), feats_df["minutes_slope"].to_numpy()
+            )
+            version = HEURISTIC_VERSION
+        if injuries:
+            probs = np.clip(probs + 0.05 * _injury_counts(feats_df, injuries), 0.0, 1.0)
+        return probs, version
+
+
+def predict_injury_batch(stats, player_col: str = "player_id", injuries: dict = None):
+    """
+    Injury probability for every player in a long-format stats table (or StatStore), in one vectorized pass.
+    Returns {player_id: probability}; without a trained model these match predict_injury_from_stats_df
+    given the same injury history. injuries: {player_id: injuries_365} (see ml/injuries.py).
+    """
+    feats = _rolling_features(stats, player_col)
+    probs, _ = _injury_batch_probabilities(feats, injuries)
+    return {
+        (pid.item() if hasattr(pid, "item") else pid): float(prob)
+        for pid, prob in zip(feats.index, probs)
+    }
+
+
+def injury_risk_label(prob: float):
+    return "low" if prob < 0.33 else "medium" if prob < 0.66 else "high"
+
+
+def score_players_batch(
+    stats, horizon_days: int = 180, player_col: str = "player_id", market: dict = None, injuries: dict = None
+):
+    """
+    Injury and investment results for every player in a long-format stats table (or StatStore), in one
+    vectorized pass. Returns {player_id: {"injury": {...}, "investment": {...}}} shaped like the per-player
+    predict endpoints. market: as for predict_investment_batch (only players with stats are returned);
+    injuries: as for predict_injury_batch.
+    """
+    feats_df = _rolling_features(stats, player_col)
+    probs, injury_version = _injury_batch_probabilities(feats_df, injuries)
+    investments = predict_investment_batch(stats, player_col=player_col, feats_df=feats_df, market=market)
+
+    results = {}
+    for (player_id, feats), prob in zip(batch_features_to_dicts(feats_df).items(), probs):
+        feats["injuries_365"] = injuries.get(player_id, 0) if injuries else 0
+        results[player_id] = {
+            "injury": {
+                "probability": float(prob),
+                "risk": injury_risk_label(prob),
+                "features": feats,
+                "model_version": injury_version,
+            },
+            "investment": {"horizon_days": horizon_days, **investments[player_id]},
         }
-        data.append(row)
-    return pd.DataFrame(data)
+    return results
+
+
+def team_injury_baseline(team: str, db: Session):
+    """
+    Injury probability of every player on `team` plus the team average, computed in one batch
+    and cached per team until a stat (or the roster) of that team changes.
+    Returns {"average": float, "probabilities": {player_id: float}}.
+    """
+
+    def compute():
+        player_ids = [p.id for p in crud.get_players_by_team(db, team)]
+        store = load_stats(db, models.Player.team == team)
+        injuries = recent_injury_counts(load_injury_index(db, models.Player.team == team), store)
+        batch = predict_injury_batch(store, injuries=injuries)
+        probs = {pid: batch.get(pid, _NO_STATS_INJURY_PROB) for pid in player_ids}
+        average = float(sum(probs.values()) / len(probs)) if probs else 0.0
+        return {"average": average, "probabilities": probs}
+
+    return team_injury_baselines.get_or_compute(team, compute)
+
+
+def _rolling_snapshot(player_id: int, db: Session, version: int):
+    """
+    (features, row count, goals slope) for the player at `version`. Served from the incremental
+    rolling state when it is current, otherwise rebuilt from the full history once.
+
+    The version and the rows are separate reads (pysqlite starts no transaction for SELECTs), so a
+    stat committed in between would be in a state tagged with the older version, and the writer's
+    rolling_states.append would then count it twice. The version is read again after the rows and
+    the rebuilt state is only stored when it did not move.
+    """
+    snapshot = rolling_states.snapshot(player_id, version)
+    if snapshot is None:
+        rows = crud.get_recent_stat_rows(db, player_id, days=HISTORY_DAYS, min_matches=HISTORY_MATCHES)
+        with span("ml.rolling_state_rebuild", rows=len(rows)):
+            state = RollingState.from_rows([StatRecord(*r) for r in rows])
+        snapshot = state.snapshot()  # before put: once stored, writers advance the state in place
+        if crud.get_stats_version(db, player_id) == version:
+            rolling_states.put(player_id, version, state)
+    return snapshot
+
+
+def _cached(kind: str, player_id: int, db: Session, horizon_days, compute):
+    """
+    Memoize a per-player prediction on (kind, player_id, stats version, horizon_days, model version).
+    The stats version is bumped by every stat mutation, so stale entries are never served.
+    """
+    version = crud.get_stats_version(db, player_id)
+    key = (kind, player_id, version, horizon_days, model_registry.version(kind))
+    result = player_predictions.get(key)
+    if result is None:
+        result = compute(*_rolling_snapshot(player_id, db, version))
+        player_predictions.put(key, result, tag=player_id)
+    return result
+
+
+def injury_from_features(feats: dict, recent_injuries: int = 0):
+    """(probability, features, model_version) for rolling features: trained model if loaded, else the heuristic."""
+    model_result = injury_probability(feats)
+    if model_result is None:
+        prob, feats = score_injury_features(feats, recent_injuries)
+        return prob, feats, HEURISTIC_VERSION
+    prob, version = model_result
+    feats["injuries_365"] = recent_injuries
+    return float(np.clip(prob + 0.05 * recent_injuries, 0.0, 1.0)), feats, version
+
+
+def investment_from_features(feats: dict, goals_slope):
+    """Investment forecast dict (with model_version); goals_slope None means not enough matches."""
+    if goals_slope is None:
+        return {"predicted_pct_change": 0.0, "method": "no_data", "model_version": HEURISTIC_VERSION}
+    model_result = investment_change(feats, goals_slope)
+    if model_result is None:
+        return {**performance_trend(goals_slope), "model_version": HEURISTIC_VERSION}
+    predicted, version = model_result
+    return {
+        "predicted_pct_change": predicted,
+        "method": "model",
+        "goals_slope": float(goals_slope),
+        "model_version": version,
+    }
+
+
+def predict_from_stats_df(stats_df: pd.DataFrame):
+    """
+    Injury and investment results for one player's stats frame with the trained models when loaded.
+    Returns ((probability, features, model_version), investment dict).
+    """
+    feats = compute_rolling_features(stats_df)
+    injury = injury_from_features(dict(feats))
+    return injury, investment_from_features(feats, _goals_trend_slope(stats_df))
+
+
+def predict_injury_with_features(player_id: int, db: Session):
+    """
+    Fetch stats from DB (or the prediction cache) and run injury prediction.
+    Returns (probability, features, model_version).
+    """
+    def compute(feats, count, goals_slope):
+        return injury_from_features(dict(feats), crud.count_recent_injuries(db, player_id))
+
+    prob, feats, version = _cached("injury", player_id, db, None, compute)
+    return prob, dict(feats), version
 
 
 def predict_injury(player_id: int, db: Session):
     """Fetch stats from DB and run injury prediction. Returns probability."""
-    stats = crud.get_stats_for_player(db, player_id)
-    stats_df = _stats_to_df(stats)
-    prob, _ = predict_injury_from_stats_df(stats_df)
+    prob, _, _ = predict_injury_with_features(player_id, db)
     return prob
 
 
-def predict_investment(player_id: int, db: Session):
-    """Fetch stats from DB and run investment forecast. Returns dict."""
-    stats = crud.get_stats_for_player(db, player_id)
-    stats_df = _stats_to_df(stats)
-    result = predict_investment_from_stats_df(stats_df)
-    return result
+def _investment_from_snapshot(feats, count, goals_slope):
+    return investment_from_features(feats, goals_slope if count > 1 else None)
+
+
+def predict_investment(player_id: int, db: Session, horizon_days: int = 180):
+    """
+    Investment forecast from the player's market values when there are at least two in the window,
+    else from their stats. Returns dict (with model_version).
+    """
+    def compute(feats, count, goals_slope):
+        trend = market_trend_for_player(db, player_id, horizon_days)
+        return trend if trend is not None else _investment_from_snapshot(feats, count, goals_slope)
+
+    return dict(_cached("investment", player_id, db, horizon_days, compute))
+
+
+def prediction_cache_info():
+    """Hit / miss / eviction counters and size of the per-player prediction cache."""
+    return player_predictions.info()
@@ -0,0 +1,166 @@
+# backend/ml/registry.py
+"""
+Registry of trained models (see ml/train.py) used in place of the heuristics when available.
+
+- model_registry.get(kind): (model, version) for "injury" / "investment", or None (→ heuristic)
+- model_registry.reload(): pick up newer artifacts; in-flight requests keep the model they started with
+- model_registry.info(): loaded versions per kind
+- injury_probabilities(feats_df) / investment_changes(feats_df, goals_slope): batched inference,
+  returning (values, version) or None when no model is loaded; injury_probability / investment_change
+  do the same for one player's features dict
+
+Artifacts are `<kind>-<version>.joblib` files in config.MODEL_DIR; the highest version wins. They
+are loaded lazily with joblib's mmap_mode="r", so uvicorn workers on one host share the pages of
+the model arrays. Every worker rescans the directory at most every MODEL_RELOAD_SECONDS, which
+rolls a newly trained model out without a restart.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from .. import config
+from ..cache import player_predictions, team_injury_baselines
+from .features import FEATURE_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("injury", "investment")
+HEURISTIC_VERSION = "heuristic"
+
+INJURY_FEATURES = list(FEATURE_COLUMNS)
+INVESTMENT_FEATURES = list(FEATURE_COLUMNS) + ["goals_slope"]
+
+
+def artifact_path(kind, version, model_dir=None):
+    return os.path.join(model_dir or config.MODEL_DIR, f"{kind}-{version}.joblib")
+
+
+def _latest_artifacts(model_dir):
+    """{kind: (version, path)} of the newest artifact per kind in model_dir."""
+    latest = {}
+    try:
+        entries = list(os.scandir(model_dir))
+    except FileNotFoundError:
+        return latest
+    for entry in entries:
+        name = entry.name
+        if not name.endswith(".joblib"):
+            continue
+        kind, _, version = name[: -len(".joblib")].partition("-")
+        if kind in KINDS and version and version > latest.get(kind, ("", None))[0]:
+            latest[kind] = (version, entry.path)
+    return latest
+
+
+class ModelRegistry:
+    def __init__(self, model_dir, reload_seconds):
+        self.model_dir = model_dir
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._models = {}  # kind -> (model, version); replaced as a whole, never mutated
+        self._checked_at = None
+
+    def _maybe_reload(self):
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.reload_seconds:
+            self.reload()
+
+    def get(self, kind):
+        self._maybe_reload()
+        return self._models.get(kind)
+
+    def reload(self):
+        """Load artifacts newer than the ones in use and swap them in. Returns the loaded versions."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            models = dict(self._models)
+            changed = False
+            for kind, (version, path) in _latest_artifacts(self.model_dir).items():
+                if kind in models and models[kind][1] == version:
+                    continue
+                try:
+                    import joblib
+
+                    artifact = joblib.load(path, mmap_mode="r")
+                except Exception:  # optional dependency missing or unreadable artifact: keep what we have
+                    logger.exception("Could not load model artifact %s", path)
+                    continue
+                models[kind] = (artifact["model"], version)
+                changed = True
+                logger.info("Loaded %s model %s", kind, version)
+            self._models = models
+        if changed:
+            # cached predictions of the previous model (per-player keys carry the version anyway)
+            team_injury_baselines.clear()
+            player_predictions.clear()
+        return self._versions()
+
+    def clear(self):
+        with self._lock:
+            self._models = {}
+            self._checked_at = None
+
+    def version(self, kind):
+        entry = self.get(kind)
+        return entry[1] if entry else HEURISTIC_VERSION
+
+    def info(self):
+        self._maybe_reload()
+        return self._versions()
+
+    def _versions(self):
+        models = self._models
+        return {kind: models[kind][1] if kind in models else HEURISTIC_VERSION for kind in KINDS}
+
+
+model_registry = ModelRegistry(config.MODEL_DIR, config.MODEL_RELOAD_SECONDS)
+
+
+def feature_matrix(feats_df, columns):
+    """float64 matrix of `columns` with NaN treated as 0 (the models are trained the same way)."""
+    return np.nan_to_num(feats_df[columns].to_numpy(dtype=float), nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def injury_probabilities(feats_df):
+    """(probabilities, version) from the injury model for a feature matrix, or None without a model."""
+    entry = model_registry.get("injury")
+    if entry is None or feats_df.empty:
+        return None
+    model, version = entry
+    return model.predict_proba(feature_matrix(feats_df, INJURY_FEATURES))[:, 1], version
+
+
+def investment_changes(feats_df, goals_slope):
+    """(predicted pct changes, version) from the investment model, or None without a model."""
+    entry = model_registry.get("investment")
+    if entry is None or feats_df.empty:
+        return None
+    model, version = entry
+    frame = feats_df.assign(goals_slope=np.asarray(goals_slope, dtype=float))
+    return model.predict(feature_matrix(frame, INVESTMENT_FEATURES)), version
+
+
+def _feature_row(feats, columns):
+    return np.nan_to_num(np.array([[feats.get(c, 0.0) for c in columns]], dtype=float), nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def injury_probability(feats):
+    """Single-player injury_probabilities for a features dict."""
+    entry = model_registry.get("injury")
+    if entry is None:
+        return None
+    model, version = entry
+    return float(model.predict_proba(_feature_row(feats, INJURY_FEATURES))[0, 1]), version
+
+
+def investment_change(feats, goals_slope):
+    """Single-player investment_changes for a features dict and goals slope."""
+    entry = model_registry.get("investment")
+    if entry is None:
+        return None
+    model, version = entry
+    row = _feature_row({**feats, "goals_slope": goals_slope}, INVESTMENT_FEATURES)
+    return float(model.predict(row)[0]), version
@@ -0,0 +1,230 @@
+# backend/ml/rolling.py
+"""
+Incremental rolling-window state per player.
+
+- RollingState: deques for the 7/14/28-day windows plus running least-squares sums for the
+  8-match slopes; append() is O(1) amortized, features() matches compute_rolling_features.
+- rolling_states: bounded registry of RollingState objects keyed by player_id and stats version.
+
+Appending a match dated on or after the player's last match updates the state in place.
+Out-of-order inserts, updates and deletes drop the state; it is rebuilt on the next prediction
+from the recent history it needs (HISTORY_DAYS / HISTORY_MATCHES).
+"""
+
+import math
+import threading
+from collections import OrderedDict, deque
+from datetime import date
+
+from .. import config
+
+_SLOPE_WINDOW = 8
+
+# history a RollingState needs: matches within 28 days of the latest one, and at least the last 8
+HISTORY_DAYS = 28
+HISTORY_MATCHES = _SLOPE_WINDOW
+
+
+def _day(value):
+    """Day number of a date/datetime (or ISO string) so windows compare like pd.Timedelta(days=n)."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal()
+
+
+class TailSlope:
+    """Least-squares slope of the last 8 values (x = 0..k-1) from running sums; None counts as NaN."""
+
+    __slots__ = ("values", "sum_y", "sum_xy", "missing")
+
+    def __init__(self):
+        self.values = deque()
+        self.sum_y = 0
+        self.sum_xy = 0
+        self.missing = 0
+
+    def push(self, y):
+        if len(self.values) == _SLOPE_WINDOW:
+            oldest = self.values.popleft()
+            oldest_y = 0 if oldest is None else oldest
+            self.missing -= oldest is None
+            # every remaining point moves one step left: x -> x - 1
+            self.sum_y -= oldest_y
+            self.sum_xy -= self.sum_y
+        self.sum_xy += len(self.values) * (0 if y is None else y)
+        self.sum_y += 0 if y is None else y
+        self.missing += y is None
+        self.values.append(y)
+
+    def slope(self):
+        k = len(self.values)
+        if k < 2:
+            return 0.0
+        if self.missing:
+            return math.nan
+        sum_x = k * (k - 1) // 2
+        sum_x2 = (k - 1) * k * (2 * k - 1) // 6
+        return float((k * self.sum_xy - sum_x * self.sum_y) / (k * sum_x2 - sum_x * sum_x))
+
+    def __len__(self):
+        return len(self.values)
+
+
+class _Window:
+    """Matches within `days` of the latest match, with running minutes/goals sums (None skipped)."""
+
+    __slots__ = ("days", "rows", "minutes", "minutes_count", "goals")
+
+    def __init__(self, days):
+        self.days = days
+        self.rows = deque()
+        self.minutes = 0
+        self.minutes_count = 0
+        self.goals = 0
+
+    def push(self, day, minutes, goals):
+        self.rows.append((day, minutes, goals))
+        self._add(minutes, goals, 1)
+
+    def evict_before(self, last_day):
+        while self.rows and self.rows[0][0] < last_day - self.days:
+            _, minutes, goals = self.rows.popleft()
+            self._add(minutes, goals, -1)
+
+    def _add(self, minutes, goals, sign):
+        if minutes is not None:
+            self.minutes += sign * minutes
+            self.minutes_count += sign
+        if goals is not None:
+            self.goals += sign * goals
+
+
+class RollingState:
+    """Rolling features of one player, maintained incrementally as matches are appended."""
+
+    __slots__ = ("last_day", "count", "w7", "w14", "w28", "minutes_tail", "goals_tail")
+
+    def __init__(self):
+        self.last_day = None
+        self.count = 0
+        self.w7 = _Window(7)
+        self.w14 = _Window(14)
+        self.w28 = _Window(28)
+        self.minutes_tail = TailSlope()  # last 8 matches by date
+        self.goals_tail = TailSlope()  # last 8 rows in the order given (investment heuristic)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build from Stat rows (anything with match_date / minutes_played / goals) in history order,
+        i.e. crud's (match_date, id). The rows may be trimmed to HISTORY_DAYS / HISTORY_MATCHES;
+        `count` is then the number of rows seen, which is all the investment heuristic checks (> 1).
+        """
+        state = cls()
+        rows = list(rows)
+        for r in sorted(rows, key=lambda r: _day(r.match_date)):
+            state._push_window(_day(r.match_date), r.minutes_played, r.goals)
+        for r in rows[-_SLOPE_WINDOW:]:
+            state.goals_tail.push(r.goals)
+        state.count = len(rows)
+        return state
+
+    def append(self, match_date, minutes_played, goals):
+        """Add one match in O(1). Returns False (state unchanged) if it is older than the latest match."""
+        day = _day(match_date)
+        if self.last_day is not None and day < self.last_day:
+            return False
+        self._push_window(day, minutes_played, goals)
+        self.goals_tail.push(goals)
+        self.count += 1
+        return True
+
+    def _push_window(self, day, minutes, goals):
+        self.last_day = day if self.last_day is None else max(self.last_day, day)
+        for window in (self.w7, self.w14, self.w28):
+            window.push(day, minutes, goals)
+            window.evict_before(self.last_day)
+        self.minutes_tail.push(minutes)
+
+    def snapshot(self):
+        """(features, row count, goals slope), what the per-player predictions read."""
+        return self.features(), self.count, self.goals_tail.slope()
+
+    def features(self):
+        """Same dict as compute_rolling_features on the player's full history."""
+        features = {
+            "minutes_sum_7": 0,
+            "minutes_avg_28": 0.0,
+            "goals_per90_28": 0.0,
+            "matches_14": 0,
+            "acwr": 0.0,
+            "minutes_slope": 0.0,
+        }
+        if not self.count:
+            return features
+
+        features["minutes_sum_7"] = int(self.w7.minutes)
+        w28 = self.w28
+        features["minutes_avg_28"] = float(w28.minutes / w28.minutes_count) if w28.minutes_count else math.nan
+        total_min_28 = int(w28.minutes)
+        if total_min_28 > 0:
+            features["goals_per90_28"] = float(int(w28.goals) / total_min_28 * 90.0)
+        features["matches_14"] = len(self.w14.rows)
+        chronic = features["minutes_avg_28"] if features["minutes_avg_28"] > 0 else 1e-6
+        features["acwr"] = float(features["minutes_sum_7"] / chronic)
+        features["minutes_slope"] = self.minutes_tail.slope()
+        return features
+
+
+class RollingStateStore:
+    """
+    Bounded (LRU) registry of RollingState per player, each tagged with the stats version it reflects.
+    A state is only served for the exact version it was built or advanced to.
+    """
+
+    def __init__(self, max_players):
+        self.max_players = max_players
+        self._lock = threading.Lock()
+        self._states = OrderedDict()  # player_id -> (version, RollingState)
+
+    def snapshot(self, player_id, version):
+        """(features, row count, goals slope) of the player's state at `version`, or None if not held."""
+        with self._lock:
+            entry = self._states.get(player_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._states.move_to_end(player_id)
+            return entry[1].snapshot()
+
+    def put(self, player_id, version, state):
+        with self._lock:
+            self._states[player_id] = (version, state)
+            self._states.move_to_end(player_id)
+            while len(self._states) > self.max_players:
+                self._states.popitem(last=False)
+
+    def append(self, player_id, version, match_date, minutes_played, goals):
+        """Advance a player's state from version - 1 to `version`; drop it if that is not possible in O(1)."""
+        self.extend(player_id, version, [(match_date, minutes_played, goals)])
+
+    def extend(self, player_id, version, matches):
+        """append() for several (match_date, minutes_played, goals) committed under one version bump."""
+        with self._lock:
+            entry = self._states.get(player_id)
+            if entry is None:
+                return
+            if entry[0] == version - 1 and all(entry[1].append(*match) for match in matches):
+                self._states[player_id] = (version, entry[1])
+            else:
+                del self._states[player_id]
+
+    def discard(self, player_id):
+        with self._lock:
+            self._states.pop(player_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+
+rolling_states = RollingStateStore(config.ROLLING_STATE_MAX_PLAYERS)
@@ -0,0 +1,170 @@
+# backend/ml/store.py
+"""
+Compact columnar stats store for the ML hot path.
+
+- StatStore: every loaded match in contiguous NumPy arrays (dates as int32 days since 1970-01-01,
+  int32 metrics), grouped by player through an offsets array; built straight from SQL column
+  tuples, without ORM objects or a pandas DataFrame
+- StatRecord: __slots__ row type for the few places that need one match at a time
+- load_stats(db, *player_filters): StatStore for every player matching the filters (one query)
+
+The feature engine reads these arrays directly (features.compute_rolling_features_store);
+to_frame() is there for code that still wants the long-format DataFrame.
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .. import crud
+from ..metrics import span
+
+METRIC_COLUMNS = ("minutes_played", "goals", "assists", "touches", "tackles_won")
+
+# int32 stand-in for NULL metrics; column() turns it back into NaN
+MISSING = np.iinfo(np.int32).min
+
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+class StatRecord:
+    """One match; same attribute names as models.Stat, a fraction of the memory."""
+
+    __slots__ = ("player_id", "match_date", *METRIC_COLUMNS)
+
+    def __init__(self, player_id, match_date, minutes_played, goals, assists, touches, tackles_won):
+        self.player_id = player_id
+        self.match_date = match_date
+        self.minutes_played = minutes_played
+        self.goals = goals
+        self.assists = assists
+        self.touches = touches
+        self.tackles_won = tackles_won
+
+    def __repr__(self):
+        return f"StatRecord(player_id={self.player_id}, match_date={self.match_date})"
+
+
+def _to_day(value):
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - _EPOCH
+
+
+def _int32_column(values, n):
+    return np.fromiter((MISSING if v is None else v for v in values), dtype=np.int32, count=n)
+
+
+class StatStore:
+    """
+    Matches of many players, sorted by player and then in history order (match_date, id).
+    Rows of player_ids[i] are offsets[i]:offsets[i + 1] in `days` and every metric array.
+    """
+
+    __slots__ = ("player_ids", "offsets", "days", "metrics")
+
+    def __init__(self, player_ids, offsets, days, metrics):
+        self.player_ids = player_ids  # int64, sorted, unique
+        self.offsets = offsets  # int64, len(player_ids) + 1
+        self.days = days  # int32 days since 1970-01-01
+        self.metrics = metrics  # {name: int32 array}
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build from tuples in crud.STAT_ROW_COLUMNS order (player_id, match_date, *METRIC_COLUMNS),
+        e.g. crud.get_stat_rows. Rows of a player must be in history order; players may be interleaved.
+        """
+        n = len(rows)
+        with span("ml.store_build", rows=n):
+            columns = list(zip(*rows)) if n else [()] * len(crud.STAT_ROW_COLUMNS)
+            player_col = np.fromiter(columns[0], dtype=np.int64, count=n)
+            days = np.fromiter((_to_day(v) for v in columns[1]), dtype=np.int32, count=n)
+            metrics = {name: _int32_column(col, n) for name, col in zip(METRIC_COLUMNS, columns[2:])}
+
+        if n and np.any(player_col[1:] < player_col[:-1]):
+            order = np.argsort(player_col, kind="stable")
+            player_col, days = player_col[order], days[order]
+            metrics = {name: values[order] for name, values in metrics.items()}
+
+        starts = np.flatnonzero(np.r_[True, player_col[1:] != player_col[:-1]]) if n else np.zeros(0, dtype=np.int64)
+        offsets = np.append(starts, n).astype(np.int64)
+        return cls(player_col[starts], offsets, days, metrics)
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def n_players(self):
+        return len(self.player_ids)
+
+    def counts(self):
+        """Rows per player, aligned with player_ids."""
+        return np.diff(self.offsets)
+
+    def codes(self):
+        """Player position (0..n_players-1) of every row."""
+        return np.repeat(np.arange(self.n_players), self.counts())
+
+    def column(self, name):
+        """Metric as float64 with NaN where the value is missing."""
+        values = self.metrics[name].astype(float)
+        values[self.metrics[name] == MISSING] = np.nan
+        return values
+
+    def player_means(self, name, fill=0.0):
+        """{player_id: mean of the metric}, missing values counted as `fill`."""
+        values = np.where(self.metrics[name] == MISSING, fill, self.metrics[name]).astype(float)
+        sums = np.bincount(self.codes(), weights=values, minlength=self.n_players)
+        return dict(zip(self.player_ids.tolist(), (sums / self.counts()).tolist()))
+
+    def _span(self, player_id):
+        i = np.searchsorted(self.player_ids, player_id)
+        if i == self.n_players or self.player_ids[i] != player_id:
+            return 0, 0
+        return self.offsets[i], self.offsets[i + 1]
+
+    def records(self, player_id):
+        """The player's matches as StatRecord objects, in history order."""
+        start, end = self._span(player_id)
+        columns = [self.metrics[name][start:end].tolist() for name in METRIC_COLUMNS]
+        return [
+            StatRecord(
+                player_id,
+                date.fromordinal(day + _EPOCH),
+                *(None if v == MISSING else v for v in values),
+            )
+            for day, *values in zip(self.days[start:end].tolist(), *columns)
+        ]
+
+    def split(self, chunk_players):
+        """Stores of at most chunk_players players each (views, no copies)."""
+        chunks = []
+        for first in range(0, self.n_players, max(1, chunk_players)):
+            last = min(first + chunk_players, self.n_players)
+            start, end = self.offsets[first], self.offsets[last]
+            chunks.append(
+                StatStore(
+                    self.player_ids[first:last],
+                    self.offsets[first:last + 1] - start,
+                    self.days[start:end],
+                    {name: values[start:end] for name, values in self.metrics.items()},
+                )
+            )
+        return chunks
+
+    def to_frame(self):
+        """Long-format DataFrame with crud.STAT_ROW_COLUMNS (match_date as datetime64)."""
+        data = {
+            "player_id": np.repeat(self.player_ids, self.counts()),
+            "match_date": self.days.astype("datetime64[D]").astype("datetime64[ns]"),
+        }
+        for name in METRIC_COLUMNS:
+            data[name] = self.column(name)
+        return pd.DataFrame(data, columns=list(crud.STAT_ROW_COLUMNS))
+
+
+def load_stats(db, *player_filters):
+    """StatStore of every player matching `player_filters` (criteria on models.Player), in one query."""
+    return StatStore.from_rows(crud.get_stat_rows(db, *player_filters))
@@ -0,0 +1,175 @@
+# backend/ml/train.py
+"""
+Training for the models served through ml/registry.py.
+
+    python -m backend.manage train-models [--step-days 14] [--absence-days 21] [--horizon-days 90]
+
+Snapshots the league every `step_days`: features come from the feature engine
+(compute_rolling_features_store) on the stats up to the cutoff, labels from what happened after it.
+There are no injury or market-value tables yet, so the labels are proxies:
+- injury: a player active in the 28 days before the cutoff has no match in the next `absence_days`
+- investment: change in goal involvement (goals + assists per 90) from the 90 days before the cutoff
+  to the `horizon_days` after it, squashed to the heuristic's +/-20% range
+
+Artifacts are plain (uncompressed) joblib files so they can be memory-mapped; they are written to
+a temporary name first, so a serving process never sees a partial file.
+"""
+
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from .. import config, models
+from .features import compute_rolling_features_store, compute_tail_slope_store
+from .registry import INJURY_FEATURES, INVESTMENT_FEATURES, artifact_path, feature_matrix
+from .store import MISSING, StatStore, load_stats
+
+ACTIVE_DAYS = 28
+FORM_DAYS = 90
+MIN_SAMPLES = 20
+
+
+def _truncate(store, cutoff_day):
+    """The store restricted to matches on or before cutoff_day (players without any are dropped)."""
+    mask = store.days <= cutoff_day
+    counts = np.bincount(store.codes()[mask], minlength=store.n_players)
+    keep = counts > 0
+    offsets = np.concatenate(([0], np.cumsum(counts[keep]))).astype(np.int64)
+    metrics = {name: values[mask] for name, values in store.metrics.items()}
+    return StatStore(store.player_ids[keep], offsets, store.days[mask], metrics)
+
+
+def _group_sum(store, weights):
+    return np.bincount(store.codes(), weights=weights, minlength=store.n_players)
+
+
+def _involvement_per90(store, in_window):
+    """(goals + assists) per 90 minutes per player over the rows in `in_window`; NaN without minutes."""
+    def metric(name):
+        values = store.metrics[name]
+        return np.where((values == MISSING) | ~in_window, 0, values).astype(float)
+
+    minutes = _group_sum(store, metric("minutes_played"))
+    involvement = _group_sum(store, metric("goals") + metric("assists"))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(minutes > 0, involvement / minutes * 90.0, np.nan)
+
+
+def build_training_set(store, step_days=14, absence_days=21, horizon_days=90):
+    """
+    One row per (cutoff, active player): INVESTMENT_FEATURES plus the two proxy labels.
+    Returns a DataFrame with columns cutoff, player_id, *features, injured, pct_change (NaN when unknown).
+    """
+    if not len(store):
+        return pd.DataFrame()
+    first, last = int(store.days.min()), int(store.days.max())
+    frames = []
+    for cutoff in range(first + ACTIVE_DAYS, last - absence_days + 1, step_days):
+        past = _truncate(store, cutoff)
+        feats = compute_rolling_features_store(past)
+        feats["goals_slope"] = compute_tail_slope_store(past, "goals").to_numpy()
+        last_day = past.days[past.offsets[1:] - 1]
+        active = last_day >= cutoff - ACTIVE_DAYS
+
+        # labels from the full history of the same players
+        played_after = _group_sum(store, (store.days > cutoff) & (store.days <= cutoff + absence_days)) > 0
+        before = _involvement_per90(store, (store.days > cutoff - FORM_DAYS) & (store.days <= cutoff))
+        after = _involvement_per90(store, (store.days > cutoff) & (store.days <= cutoff + horizon_days))
+        with np.errstate(invalid="ignore"):
+            pct_change = np.tanh((after - before) / np.maximum(before, 0.25)) * 0.2
+        if cutoff + horizon_days > last:
+            pct_change[:] = np.nan  # the horizon is not fully observed yet
+        index = np.searchsorted(store.player_ids, past.player_ids)
+
+        frame = feats.reset_index()
+        frame["cutoff"] = cutoff
+        frame["injured"] = ~played_after[index]
+        frame["pct_change"] = pct_change[index]
+        frames.append(frame[active])
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _new_version():
+    return datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+
+
+def _save(kind, version, model, meta, model_dir):
+    import joblib
+
+    os.makedirs(model_dir, exist_ok=True)
+    path = artifact_path(kind, version, model_dir)
+    tmp_path = path + ".tmp"
+    joblib.dump({"model": model, "meta": meta}, tmp_path, compress=0)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _split_by_cutoff(data, holdout=0.2):
+    """Train on earlier cutoffs, evaluate on the latest ones (no look-ahead)."""
+    cutoffs = np.sort(data["cutoff"].unique())
+    split = cutoffs[int(len(cutoffs) * (1 - holdout))] if len(cutoffs) > 1 else cutoffs[-1] + 1
+    return data[data["cutoff"] < split], data[data["cutoff"] >= split]
+
+
+def train_injury_model(data):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import roc_auc_score
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if len(data) < MIN_SAMPLES or data["injured"].nunique() < 2:
+        return None, {"skipped": "not enough labelled samples with both outcomes"}
+    train, test = _split_by_cutoff(data)
+    if train["injured"].nunique() < 2:
+        train, test = data, data.iloc[:0]
+
+    def fit(frame):
+        model = make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000))
+        return model.fit(feature_matrix(frame, INJURY_FEATURES), frame["injured"].to_numpy())
+
+    meta = {"samples": int(len(data)), "positive_rate": float(data["injured"].mean())}
+    if len(test) and test["injured"].nunique() == 2:
+        probs = fit(train).predict_proba(feature_matrix(test, INJURY_FEATURES))[:, 1]
+        meta["holdout_auc"] = float(roc_auc_score(test["injured"], probs))
+    return fit(data), meta
+
+
+def train_investment_model(data):
+    from sklearn.linear_model import Ridge
+    from sklearn.metrics import mean_absolute_error
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    data = data[data["pct_change"].notna()]
+    if len(data) < MIN_SAMPLES:
+        return None, {"skipped": "not enough samples with an observed horizon"}
+    train, test = _split_by_cutoff(data)
+
+    def fit(frame):
+        model = make_pipeline(StandardScaler(), Ridge(alpha=1.0))
+        return model.fit(feature_matrix(frame, INVESTMENT_FEATURES), frame["pct_change"].to_numpy())
+
+    meta = {"samples": int(len(data))}
+    if len(test) and len(train):
+        predicted = fit(train).predict(feature_matrix(test, INVESTMENT_FEATURES))
+        meta["holdout_mae"] = float(mean_absolute_error(test["pct_change"], predicted))
+    return fit(data), meta
+
+
+def train_models(db, model_dir=None, step_days=14, absence_days=21, horizon_days=90):
+    """Build the training set from the DB, fit both models and save them. Returns {kind: meta}."""
+    model_dir = model_dir or config.MODEL_DIR
+    store = load_stats(db, models.Player.id.isnot(None))
+    data = build_training_set(store, step_days=step_days, absence_days=absence_days, horizon_days=horizon_days)
+    version = _new_version()
+    results = {}
+    for kind, train in (("injury", train_injury_model), ("investment", train_investment_model)):
+        model, meta = train(data) if not data.empty else (None, {"skipped": "no stats"})
+        meta.update(kind=kind, version=version, trained_at=version, step_days=step_days,
+                    absence_days=absence_days, horizon_days=horizon_days)
+        if model is not None:
+            meta["path"] = _save(kind, version, model, meta, model_dir)
+        results[kind] = meta
+    return results
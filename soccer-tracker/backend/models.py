@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Float, Index, JSON, inspect
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -28,3 +28,128 @@ class Stat(Base):
     tackles_won = Column(Integer)
 
     player = relationship("Player", back_populates="stats")
+
+    # a player's history comes back pre-sorted by date straight from the index
+    __table_args__ = (Index("ix_stats_player_id_match_date", "player_id", "match_date"),)
+
+
+# Valuation time series (e.g. from a market value feed), one value per player and date
+class MarketValue(Base):
+    __tablename__ = "market_values"
+
+    id = Column(Integer, primary_key=True)
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    market_value = Column(Float, nullable=False)
+    source = Column(String)
+
+    # upsert key; also serves a player's series in date order
+    __table_args__ = (Index("ux_market_values_player_id_date", "player_id", "date", unique=True),)
+
+
+# Injury history; predictions count the injuries starting within a year of the last match
+class Injury(Base):
+    __tablename__ = "injuries"
+
+    id = Column(Integer, primary_key=True)
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date)
+    injury_type = Column(String)
+
+    # windowed counts are an index range scan per player; the unique index is the upsert key (crud
+    # also matches rows without an injury_type, which a unique index treats as distinct)
+    __table_args__ = (
+        Index("ix_injuries_player_id_start_date", "player_id", "start_date"),
+        Index("ux_injuries_player_id_start_date_type", "player_id", "start_date", "injury_type", unique=True),
+    )
+
+
+# Running aggregates maintained by crud.py alongside every Stat insert/update/delete,
+# so per-player and per-team averages are a primary-key lookup instead of a stats scan.
+# A deleted player's row is zeroed, not deleted (like PlayerVersion below), so a reused id keeps
+# counting versions and never matches prediction cache entries of the earlier player.
+class PlayerStatAggregate(Base):
+    __tablename__ = "player_stat_aggregates"
+
+    player_id = Column(Integer, primary_key=True)
+    stat_count = Column(Integer, nullable=False, default=0)
+    goals_sum = Column(Integer, nullable=False, default=0)
+    assists_sum = Column(Integer, nullable=False, default=0)
+    touches_sum = Column(Integer, nullable=False, default=0)
+    tackles_won_sum = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=0)  # bumped on every change to the player's stats, market values or injuries
+
+
+class TeamStatAggregate(Base):
+    __tablename__ = "team_stat_aggregates"
+
+    team = Column(String, primary_key=True)
+    stat_count = Column(Integer, nullable=False, default=0)
+    goals_sum = Column(Integer, nullable=False, default=0)
+    assists_sum = Column(Integer, nullable=False, default=0)
+    touches_sum = Column(Integer, nullable=False, default=0)
+    tackles_won_sum = Column(Integer, nullable=False, default=0)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# Change counters behind the ETags of the per-player read routes (etags.py), bumped by crud in the
+# same transaction as the change. A player's counter moves with their profile, stats, market values
+# and injuries; a team's with its roster and its players' stats and injuries. Rows are never deleted,
+# so a reused id or team name cannot repeat an earlier ETag.
+class PlayerVersion(Base):
+    __tablename__ = "player_versions"
+
+    player_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class TeamVersion(Base):
+    __tablename__ = "team_versions"
+
+    team = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# Precomputed injury + investment predictions (snapshots.py), refreshed by a background scheduler.
+# A row is current while inputs_version matches the player's aggregate version and models_key the
+# model versions being served; the insights and per-player predict routes read these instead of scoring.
+class PredictionSnapshot(Base):
+    __tablename__ = "prediction_snapshots"
+
+    player_id = Column(Integer, ForeignKey("players.id"), primary_key=True)
+    inputs_version = Column(Integer, nullable=False)
+    models_key = Column(String, nullable=False)
+    computed_at = Column(DateTime, nullable=False)  # UTC
+    horizon_days = Column(Integer, nullable=False)
+    avg_minutes = Column(Float, nullable=False, default=0.0)
+    injury_probability = Column(Float)  # NULL for players without stats
+    injury_features = Column(JSON)
+    injury_model_version = Column(String)
+    investment_pct_change = Column(Float, nullable=False)
+    investment_method = Column(String, nullable=False)
+    investment = Column(JSON, nullable=False)  # full investment dict as predict_investment returns it
+
+
+def missing_schema(engine):
+    """
+    What the database lacks compared with the metadata: missing tables by name, and indexes missing
+    from existing tables as "table.index" (a partially migrated database has the tables but not these).
+    """
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            missing.append(table.name)
+            continue
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing.extend(f"{table.name}.{index.name}" for index in table.indexes if index.name not in indexes)
+    return missing
+
+
+def create_schema(engine):
+    """Create missing tables, plus indexes added to tables that already exist (create_all skips those)."""
+    Base.metadata.create_all(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,205 @@
+# backend/percentiles.py
+"""
+League percentile index: where a player ranks league-wide and within their position.
+
+- METRICS: the ranked metrics: per-match averages from the stat aggregates, then the rolling
+  features, injury probability, market trend and average minutes stored with the prediction snapshots
+- PercentileIndex: one sorted NumPy array per (partition, metric); percentiles by binary search
+  - build(db): load every player with stats (crud.get_percentile_rows: players, player_stat_aggregates
+    and prediction_snapshots, one row per player; the stats table is never read)
+  - apply(db, player_ids): reload those players and move their values within the sorted arrays
+  - lookup(player_id): value, percentile, rank and partition size per metric
+- player_percentiles(db, player_id): what GET /players/{id}/percentiles serves; catches the shared
+  index up with cache.dirty_percentiles first
+
+There is no league column: the database holds one league, so the partitions are the whole league and
+each position. The percentile is the share of the partition's players with a lower value, ties counted
+half, times 100; rank 1 is the highest value. Metrics a player has no value for (no snapshot yet, a
+NaN feature) are left out of that metric's arrays.
+
+crud marks players whose stats, market values, injuries or position change, and refresh_snapshots the
+players it rescored, in cache.dirty_percentiles. Those marks are per process: a worker sees other
+workers' changes when its index is rebuilt, at most PERCENTILE_MAX_AGE_SECONDS after the last build.
+"""
+
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+import numpy as np
+
+from . import config, crud
+from .cache import dirty_percentiles
+from .metrics import span
+
+AGGREGATE_METRICS = crud.AGGREGATE_METRICS
+# ml.features.FEATURE_COLUMNS + injuries_365, spelled out so that importing this module does not load
+# pandas; backend/tests/test_percentiles.py checks that they still agree
+SNAPSHOT_FEATURES = ("minutes_sum_7", "minutes_avg_28", "goals_per90_28", "matches_14", "acwr", "minutes_slope",
+                     "injuries_365")
+SNAPSHOT_METRICS = ("injury_probability", "investment_pct_change", "avg_minutes")
+METRICS = AGGREGATE_METRICS + SNAPSHOT_FEATURES + SNAPSHOT_METRICS
+
+LEAGUE = ("league",)
+
+# more dirty players than this share of the index (and at least _REBUILD_MIN) rebuild it instead:
+# every patched value costs a copy of its arrays
+_REBUILD_FRACTION = 0.1
+_REBUILD_MIN = 50
+
+_Entry = namedtuple("_Entry", "position values computed_at")
+
+
+def _float(value):
+    return np.nan if value is None else float(value)
+
+
+def _entry(row):
+    """_Entry from one crud.get_percentile_rows row."""
+    (_, position, stat_count, *sums, avg_minutes, injury_probability, investment_pct_change,
+     features, computed_at) = row
+    features = features or {}
+    values = [s / stat_count for s in sums]
+    values += [_float(features.get(name)) for name in SNAPSHOT_FEATURES]
+    if computed_at is None:  # no snapshot: its three columns are NULL (avg_minutes included)
+        values += [np.nan] * len(SNAPSHOT_METRICS)
+    else:
+        values += [_float(injury_probability), _float(investment_pct_change), _float(avg_minutes)]
+    return _Entry(position, np.array(values, dtype=np.float64), computed_at)
+
+
+def _partitions(position):
+    return (LEAGUE,) if position is None else (LEAGUE, ("position", position))
+
+
+def _collect(by_key, entry):
+    """Append the entry's values to by_key[(partition, metric index)], skipping NaNs."""
+    for key in _partitions(entry.position):
+        for j, value in enumerate(entry.values):
+            if not np.isnan(value):
+                by_key[key, j].append(value)
+
+
+def rank_in(values, value):
+    """{"percentile", "rank", "players"} of `value` in the sorted array `values` (which contains it)."""
+    below = int(np.searchsorted(values, value, side="left"))
+    up_to = int(np.searchsorted(values, value, side="right"))
+    n = len(values)
+    return {"percentile": 100.0 * (below + 0.5 * (up_to - below)) / n, "rank": n - up_to + 1, "players": n}
+
+
+class PercentileIndex:
+    """
+    Sorted per-(partition, metric) arrays of the players' values. Not thread-safe on its own:
+    player_percentiles serialises access to the shared instance.
+    """
+
+    def __init__(self):
+        self._players = {}  # player_id -> _Entry
+        self._sorted = {}  # (partition, metric index) -> ascending float64 array without NaNs
+        self.built_at = None  # time.monotonic() of the last full build
+
+    def __len__(self):
+        return len(self._players)
+
+    def player_ids(self):
+        return list(self._players)
+
+    def build(self, db):
+        with span("percentiles.build") as current:
+            rows = crud.get_percentile_rows(db)
+            self._players = {row[0]: _entry(row) for row in rows}
+            self._sorted = {}
+            if self._players:
+                positions = np.array([e.position for e in self._players.values()], dtype=object)
+                values = np.stack([e.values for e in self._players.values()])
+                masks = {LEAGUE: slice(None)}
+                masks.update({("position", p): positions == p for p in set(positions.tolist()) if p is not None})
+                for key, mask in masks.items():
+                    for j in range(len(METRICS)):
+                        column = values[mask, j]
+                        self._sorted[key, j] = np.sort(column[~np.isnan(column)])
+            self.built_at = time.monotonic()
+            current.rows = len(rows)
+
+    def apply(self, db, player_ids):
+        """
+        Re-read `player_ids` and move their values: a changed player's old values leave the arrays and
+        the new ones enter, one np.delete and one np.insert per touched array.
+        """
+        player_ids = sorted(set(player_ids))
+        with span("percentiles.apply", rows=len(player_ids)):
+            rows = {row[0]: row for row in crud.get_percentile_rows(db, player_ids)}
+            removed, added = defaultdict(list), defaultdict(list)
+            for player_id in player_ids:
+                old = self._players.pop(player_id, None)
+                if old is not None:
+                    _collect(removed, old)
+                row = rows.get(player_id)
+                if row is not None:
+                    self._players[player_id] = new = _entry(row)
+                    _collect(added, new)
+            for key in removed.keys() | added.keys():
+                values = self._sorted.get(key, np.empty(0))
+                if key in removed:
+                    gone = np.sort(removed[key])
+                    # the k-th of several equal values removes the k-th stored copy
+                    nth = np.arange(len(gone)) - np.searchsorted(gone, gone)
+                    values = np.delete(values, np.searchsorted(values, gone) + nth)
+                if key in added:
+                    new_values = np.sort(added[key])
+                    values = np.insert(values, np.searchsorted(values, new_values), new_values)
+                self._sorted[key] = values
+
+    def lookup(self, player_id):
+        """The player's percentiles, or None when the player has no stats (or does not exist)."""
+        entry = self._players.get(player_id)
+        if entry is None:
+            return None
+        metrics = {}
+        for j, metric in enumerate(METRICS):
+            value = entry.values[j]
+            if np.isnan(value):
+                metrics[metric] = None
+                continue
+            metrics[metric] = {
+                "value": float(value),
+                "league": rank_in(self._sorted[LEAGUE, j], value),
+                "position": None if entry.position is None else rank_in(self._sorted[("position", entry.position), j], value),
+            }
+        return {
+            "player_id": player_id,
+            "position": entry.position,
+            "features_computed_at": None if entry.computed_at is None else entry.computed_at.isoformat(),
+            "metrics": metrics,
+        }
+
+    def sorted_values(self):
+        """{(partition, metric): sorted array}, for checks."""
+        return {(key, METRICS[j]): values for (key, j), values in self._sorted.items()}
+
+
+percentile_index = PercentileIndex()
+_index_lock = threading.Lock()
+
+
+def _needs_rebuild(index, everything, dirty):
+    if everything or index.built_at is None:
+        return True
+    if time.monotonic() - index.built_at > config.PERCENTILE_MAX_AGE_SECONDS:
+        return True
+    return len(dirty) > max(_REBUILD_MIN, _REBUILD_FRACTION * len(index))
+
+
+def player_percentiles(db, player_id):
+    """
+    lookup() on the shared index after catching it up: the dirty marks are drained before reading, so a
+    change committed meanwhile stays marked for the next request.
+    """
+    with _index_lock:
+        everything, dirty = dirty_percentiles.drain()
+        if _needs_rebuild(percentile_index, everything, dirty):
+            percentile_index.build(db)
+        elif dirty:
+            percentile_index.apply(db, dirty)
+        return percentile_index.lookup(player_id)
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
+from typing import Optional
 from datetime import date
 
 # ----- Player -----
@@ -37,3 +38,41 @@ class Stat(StatBase):
 
     class Config:
         orm_mode = True
+
+
+# ----- Market value -----
+class MarketValueBase(BaseModel):
+    date: date
+    market_value: float
+    source: Optional[str] = None
+
+class MarketValueCreate(MarketValueBase):
+    pass
+
+class MarketValue(MarketValueBase):
+    id: int
+    player_id: int
+
+    class Config:
+        orm_mode = True
+
+
+# ----- Injury -----
+class InjuryBase(BaseModel):
+    start_date: date
+    end_date: Optional[date] = None
+    injury_type: Optional[str] = None
+
+class InjuryCreate(InjuryBase):
+    @model_validator(mode="after")
+    def _ends_after_start(self):
+        if self.end_date is not None and self.end_date < self.start_date:
+            raise ValueError("end_date before start_date")
+        return self
+
+class Injury(InjuryBase):
+    id: int
+    player_id: int
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,362 @@
+# backend/snapshots.py
+"""
+Precomputed prediction snapshots (the prediction_snapshots table).
+
+- refresh_snapshots(db, player_ids=None): rescore the given players (every player when None) with the
+  batched scorer, config.PREDICT_BATCH_CHUNK_PLAYERS per chunk and transaction, and store the results
+- outdated_player_ids(db): players without a current snapshot
+- snapshot_lookup(db, *player_filters, max_staleness=None): the matching players' snapshots that are
+  current and at most max_staleness seconds old, plus the ids of the players without one
+- player_snapshot(db, player_id, current_version, max_staleness=None): the same for one player, or None
+- investment_inputs(...) / team_injury_inputs(...): what the insights routes rank on, from the
+  snapshots where possible and computed live for the rest
+- start_scheduler() / shutdown_scheduler(): the background SnapshotScheduler thread
+
+A snapshot is current while its inputs_version equals the player's aggregate version (bumped by every
+stat, market value and injury change) and its models_key the model versions being served, so serving
+one gives the same answer as computing live. crud marks changed players in cache.dirty_players; the
+scheduler rescores those every SNAPSHOT_DIRTY_SECONDS and the whole league daily at
+SNAPSHOT_FULL_REFRESH_HOUR (UTC). Readers fall back to live scoring for whatever is not current yet.
+Rescored players are marked in cache.dirty_percentiles for the percentile index (percentiles.py).
+
+The ML modules (NumPy / pandas) are imported by the functions that score, so importing this module
+from main.py does not load them.
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, or_, select
+
+from . import config, crud, database, models
+from .cache import dirty_percentiles, dirty_players
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+# above this many players to patch live, re-filter by the route's own criteria instead of an IN list
+_LIVE_IN_LIMIT = 500
+
+_COLUMNS = tuple(models.PredictionSnapshot.__table__.c)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def models_key():
+    """Model versions currently served, as stored in PredictionSnapshot.models_key."""
+    from .ml.registry import model_registry
+
+    return json.dumps(model_registry.info(), sort_keys=True)
+
+
+def _resolve_staleness(max_staleness):
+    return config.SNAPSHOT_MAX_STALENESS_SECONDS if max_staleness is None else max_staleness
+
+
+# ------------------------------
+# Writing
+# ------------------------------
+def _input_versions(db, player_ids):
+    rows = db.execute(
+        select(models.PlayerStatAggregate.player_id, models.PlayerStatAggregate.version)
+        .where(models.PlayerStatAggregate.player_id.in_(player_ids))
+    )
+    return dict(rows.all())
+
+
+def _snapshot_rows(db, player_ids, horizon_days):
+    """Snapshot rows for the players, versions read before their inputs so a concurrent change reads as outdated."""
+    from .ml.injuries import load_injury_index, recent_injury_counts
+    from .ml.market import load_market_trends
+    from .ml.predict import score_players_batch
+    from .ml.registry import HEURISTIC_VERSION
+    from .ml.store import load_stats
+
+    versions = _input_versions(db, player_ids)
+    key = models_key()
+    player_filter = models.Player.id.in_(player_ids)
+    store = load_stats(db, player_filter)
+    market = load_market_trends(db, player_filter, horizon_days=horizon_days)
+    injuries = recent_injury_counts(load_injury_index(db, player_filter), store)
+    scored = score_players_batch(store, horizon_days, market=market, injuries=injuries)
+    avg_minutes = store.player_means("minutes_played", fill=0.0)
+
+    computed_at = _utcnow()
+    rows = []
+    for player_id in player_ids:
+        result = scored.get(player_id)
+        injury = result["injury"] if result else {}
+        if result:
+            investment = {k: v for k, v in result["investment"].items() if k != "horizon_days"}
+        else:
+            investment = market.get(
+                player_id, {"predicted_pct_change": 0.0, "method": "no_data", "model_version": HEURISTIC_VERSION}
+            )
+        rows.append({
+            "player_id": player_id,
+            "inputs_version": versions.get(player_id, 0),
+            "models_key": key,
+            "computed_at": computed_at,
+            "horizon_days": horizon_days,
+            "avg_minutes": float(avg_minutes.get(player_id, 0.0)),
+            "injury_probability": injury.get("probability"),
+            "injury_features": injury.get("features"),
+            "injury_model_version": injury.get("model_version"),
+            "investment_pct_change": float(investment.get("predicted_pct_change", 0.0)),
+            "investment_method": investment.get("method"),
+            "investment": investment,
+        })
+    return rows
+
+
+def refresh_snapshots(db, player_ids=None, horizon_days=None, chunk_players=None):
+    """
+    Rescore `player_ids` (every player when None) and replace their snapshots, one transaction per chunk.
+    Snapshots of players that no longer exist are dropped. Returns the number of snapshots written.
+    """
+    horizon_days = config.SNAPSHOT_HORIZON_DAYS if horizon_days is None else horizon_days
+    chunk_players = chunk_players or config.PREDICT_BATCH_CHUNK_PLAYERS
+    if player_ids is None:
+        ids = db.scalars(select(models.Player.id).order_by(models.Player.id)).all()
+        gone = models.PredictionSnapshot.player_id.not_in(select(models.Player.id))
+    else:
+        requested = sorted(set(player_ids))
+        ids = sorted(crud.get_existing_player_ids(db, requested))
+        gone = models.PredictionSnapshot.player_id.in_(sorted(set(requested) - set(ids)))
+
+    written = 0
+    with span("snapshots.refresh") as current:
+        for start in range(0, len(ids), chunk_players):
+            chunk = ids[start:start + chunk_players]
+            rows = _snapshot_rows(db, chunk, horizon_days)
+            db.execute(delete(models.PredictionSnapshot).where(models.PredictionSnapshot.player_id.in_(chunk)))
+            db.execute(insert(models.PredictionSnapshot), rows)
+            db.commit()
+            dirty_percentiles.add(*chunk)
+            written += len(rows)
+        db.execute(delete(models.PredictionSnapshot).where(gone))
+        db.commit()
+        current.rows = written
+    return written
+
+
+# ------------------------------
+# Reading
+# ------------------------------
+def outdated_player_ids(db):
+    """Ids of players whose snapshot is missing, or older than their inputs or the served models."""
+    snapshot, aggregate = models.PredictionSnapshot, models.PlayerStatAggregate
+    stmt = (
+        select(models.Player.id)
+        .outerjoin(snapshot, snapshot.player_id == models.Player.id)
+        .outerjoin(aggregate, aggregate.player_id == models.Player.id)
+        .where(or_(
+            snapshot.player_id.is_(None),
+            snapshot.inputs_version != func.coalesce(aggregate.version, 0),
+            snapshot.models_key != models_key(),
+        ))
+        .order_by(models.Player.id)
+    )
+    return db.scalars(stmt).all()
+
+
+def _is_current(row, current_version, key, cutoff):
+    return (
+        row.inputs_version == (current_version or 0)
+        and row.models_key == key
+        and row.computed_at >= cutoff
+    )
+
+
+def _cutoff(max_staleness):
+    return _utcnow() - timedelta(seconds=_resolve_staleness(max_staleness))
+
+
+def snapshot_lookup(db, *player_filters, max_staleness=None):
+    """
+    ({player_id: snapshot row}, [player ids]) for the players matching `player_filters` (criteria on
+    models.Player), in id order: those with a current snapshot computed at most max_staleness seconds
+    ago (default SNAPSHOT_MAX_STALENESS_SECONDS), and the rest. One query.
+    """
+    snapshot, aggregate = models.PredictionSnapshot, models.PlayerStatAggregate
+    stmt = (
+        select(models.Player.id.label("id"), aggregate.version.label("current_version"), *_COLUMNS)
+        .select_from(models.Player)
+        .outerjoin(snapshot, snapshot.player_id == models.Player.id)
+        .outerjoin(aggregate, aggregate.player_id == models.Player.id)
+        .where(*player_filters)
+        .order_by(models.Player.id)
+    )
+    key, cutoff = models_key(), _cutoff(max_staleness)
+    current, missing = {}, []
+    with span("snapshots.read") as read:
+        for row in db.execute(stmt):
+            if row.player_id is not None and _is_current(row, row.current_version, key, cutoff):
+                current[row.id] = row
+            else:
+                missing.append(row.id)
+        read.rows = len(current)
+    return current, missing
+
+
+def player_snapshot(db, player_id, current_version, max_staleness=None):
+    """
+    The player's snapshot row if current for `current_version` (crud.get_stats_version, which the
+    caller usually has at hand) and computed at most max_staleness seconds ago; else None.
+    """
+    with span("snapshots.read") as read:
+        row = db.execute(select(*_COLUMNS).where(models.PredictionSnapshot.player_id == player_id)).first()
+        if row is None or not _is_current(row, current_version, models_key(), _cutoff(max_staleness)):
+            return None
+        read.rows = 1
+    return row
+
+
+def _source(served, live):
+    return "snapshot" if not live else "live" if not served else "mixed"
+
+
+def investment_inputs(db, player_filter, max_staleness=None, fresh=False):
+    """
+    ({player_id: investment dict}, {player_id: average minutes}, source) for the players matching
+    `player_filter`: snapshots where current, one batched live computation for the rest, both over
+    config.SNAPSHOT_HORIZON_DAYS.
+    source is "snapshot", "live" or "mixed".
+    """
+    from .ml.market import load_market_trends
+    from .ml.predict import predict_investment_batch
+    from .ml.store import load_stats
+
+    snaps, live_ids = ({}, None) if fresh else snapshot_lookup(db, player_filter, max_staleness=max_staleness)
+    investments = {pid: snap.investment for pid, snap in snaps.items()}
+    avg_minutes = {pid: snap.avg_minutes for pid, snap in snaps.items()}
+    if live_ids is None or live_ids:
+        # live_ids None: everything is computed live
+        small = live_ids is not None and len(live_ids) <= _LIVE_IN_LIMIT
+        live_filter = models.Player.id.in_(live_ids) if small else player_filter
+        store = load_stats(db, live_filter)
+        # the snapshots' horizon, so a mixed ranking compares forecasts over the same period
+        market = load_market_trends(db, live_filter, horizon_days=config.SNAPSHOT_HORIZON_DAYS)
+        live = predict_investment_batch(store, market=market)
+        live_minutes = store.player_means("minutes_played", fill=0.0)
+        for pid in (set(live) | set(live_minutes) if live_ids is None else live_ids):
+            if pid in live:
+                investments[pid] = live[pid]
+            if pid in live_minutes:
+                avg_minutes[pid] = live_minutes[pid]
+    return investments, avg_minutes, _source(snaps, live_ids is None or live_ids)
+
+
+def team_injury_inputs(db, team, max_staleness=None, fresh=False):
+    """
+    (team_injury_baseline-shaped dict, source) for `team`: from the snapshots when every squad member
+    has a current one, else the live (cached) team baseline.
+    """
+    from .ml.predict import _NO_STATS_INJURY_PROB, team_injury_baseline
+
+    if not fresh:
+        snaps, missing = snapshot_lookup(db, models.Player.team == team, max_staleness=max_staleness)
+        if snaps and not missing:
+            probs = {
+                pid: _NO_STATS_INJURY_PROB if snap.injury_probability is None else snap.injury_probability
+                for pid, snap in snaps.items()
+            }
+            return {"average": float(sum(probs.values()) / len(probs)), "probabilities": probs}, "snapshot"
+    return team_injury_baseline(team, db), "live"
+
+
+# ------------------------------
+# Scheduler
+# ------------------------------
+class SnapshotScheduler:
+    """
+    Background thread keeping the snapshots current: at start and whenever the served models change it
+    rescores every outdated player, every dirty_seconds the players crud marked dirty, and once a day
+    at full_refresh_hour (UTC; negative disables it) the whole league.
+    """
+
+    def __init__(self, dirty_seconds, full_refresh_hour):
+        self.dirty_seconds = dirty_seconds
+        self.full_refresh_hour = full_refresh_hour
+        self.last_refresh = None  # (kind, UTC finish time, snapshots written)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="prediction-snapshots", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop after the refresh in progress (if any)."""
+        self._stop.set()
+        self._thread.join()
+
+    def _next_full_refresh(self, now):
+        if self.full_refresh_hour < 0:
+            return None
+        due = now.replace(hour=self.full_refresh_hour, minute=0, second=0, microsecond=0)
+        return due if due > now else due + timedelta(days=1)
+
+    def _run(self):
+        served_models = None
+        next_full = self._next_full_refresh(_utcnow())
+        while not self._stop.is_set():
+            everything, dirty = dirty_players.drain()
+            try:
+                key = models_key()
+                with database.SessionLocal() as db:
+                    if everything or (next_full is not None and _utcnow() >= next_full):
+                        kind, written = "full", refresh_snapshots(db)
+                        next_full = self._next_full_refresh(_utcnow())
+                    elif key != served_models:
+                        kind, written = "outdated", refresh_snapshots(db, outdated_player_ids(db))
+                    elif dirty:
+                        kind, written = "dirty", refresh_snapshots(db, dirty)
+                    else:
+                        kind = None
+                served_models = key
+                if kind is not None:
+                    self.last_refresh = (kind, _utcnow(), written)
+            except Exception:
+                logger.exception("Prediction snapshot refresh failed")
+                # retried on the next tick instead of waiting for the nightly full refresh
+                dirty_players.add(*dirty)
+                if everything:
+                    dirty_players.mark_all()
+            self._stop.wait(self.dirty_seconds)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler():
+    """Start the shared scheduler unless disabled (config.SNAPSHOT_SCHEDULER) or already running."""
+    global _scheduler
+    if not config.SNAPSHOT_SCHEDULER:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SnapshotScheduler(config.SNAPSHOT_DIRTY_SECONDS, config.SNAPSHOT_FULL_REFRESH_HOUR)
+        return _scheduler
+
+
+def shutdown_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.close()
+            _scheduler = None
+
+
+def snapshot_info(db):
+    """Snapshot coverage and the scheduler's last run, for monitoring."""
+    last = _scheduler.last_refresh if _scheduler is not None else None
+    return {
+        "scheduler_running": _scheduler is not None,
+        "snapshots": db.scalar(select(func.count()).select_from(models.PredictionSnapshot)),
+        "outdated_players": len(outdated_player_ids(db)),
+        "dirty_players": len(dirty_players),
+        "last_refresh": None if last is None else {"kind": last[0], "finished_at": last[1].isoformat(), "snapshots": last[2]},
+    }
@@ -0,0 +1,46 @@
+# backend/tests/test_backtest.py
+"""
+history_features (ml/backtest.py), the one-pass walk-forward feature matrix, against its O(n^2)
+reference prefix_features on random leagues: same-day matches, gaps longer than every window,
+single-match players and missing minutes / goals.
+"""
+
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from backend.ml import backtest
+from backend.ml.store import StatStore
+
+START = date(2024, 8, 1)
+
+
+def _league(seed):
+    """Rows in crud.STAT_ROW_COLUMNS order, each player's in history order."""
+    rng = random.Random(seed)
+    rows = []
+    for player_id in sorted(rng.sample(range(1, 300), 15)):
+        n = rng.choice([1, rng.randint(2, 12), rng.randint(10, 60)])
+        days = sorted(rng.choice([rng.randrange(400), rng.randrange(10)]) for _ in range(n))
+        for day in days:
+            minutes = None if rng.random() < 0.08 else rng.randint(0, 90)
+            goals = None if rng.random() < 0.03 else rng.randint(0, 3)
+            rows.append((player_id, START + timedelta(days=day), minutes, goals, 0, 40, 1))
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(15))
+def test_history_features_match_prefix_features(seed):
+    store = StatStore.from_rows(_league(seed))
+    history = backtest.history_features(store)
+    assert len(history) == history[["player_id", "day"]].drop_duplicates().shape[0]
+    for player_id in store.player_ids.tolist():
+        actual = history[history["player_id"] == player_id].reset_index(drop=True)
+        expected = backtest.prefix_features(store, player_id)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_exact=False, rtol=1e-9, atol=1e-9)
+
+
+def test_empty_store():
+    assert backtest.history_features(StatStore.from_rows([])).empty
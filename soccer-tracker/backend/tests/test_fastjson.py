@@ -0,0 +1,70 @@
+# backend/tests/test_fastjson.py
+"""
+Contract of the fast list rendering (fastjson.py): for GET /players and GET /players/{id}/stats,
+render_rows over the routes' column tuples produces exactly the bytes of the response_model path,
+with orjson and with the json fallback. Runs on a temporary, seeded SQLite database.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend import crud, fastjson, models, schemas
+
+NAMES = ["Ada Lovelace", "Łukasz Fabiański", "Heung-min Son 손흥민", 'Quote "Q" O\'Neil', "Back\\slash", "Émile\tTab"]
+
+ENCODERS = {"json": fastjson.json_dumps}
+if fastjson.orjson is not None:
+    ENCODERS["orjson"] = fastjson.orjson.dumps
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('fastjson') / 'test.db'}")
+    models.create_schema(engine)
+    with Session(engine) as session:
+        for i, name in enumerate(NAMES):
+            player = crud.create_player(session, schemas.PlayerCreate(
+                name=name, age=17 + i * 4, position=["GK", "DF", "MF", "FW"][i % 4], nationality="Ñ",
+                team=f"Team {i % 2}",
+            ))
+            for k in range(i * 3):
+                crud.create_stat_for_player(session, player.id, schemas.StatCreate(
+                    match_date=date(2024, 12, 30) + timedelta(days=k * 2 - i), goals=k % 3, assists=k % 2,
+                    minutes_played=90 - k, touches=40 + k, tackles_won=k % 4,
+                ))
+        yield session
+    engine.dispose()
+
+
+def _cases(db):
+    player_fields = fastjson.record_fields(schemas.Player)
+    stat_fields = fastjson.record_fields(schemas.Stat)
+    yield (
+        schemas.Player, player_fields,
+        db.execute(crud._players_stmt(columns=fastjson.columns_for(models.Player, player_fields))).all(),
+        crud.get_players(db),
+    )
+    for player in crud.get_players(db):
+        yield (
+            schemas.Stat, stat_fields,
+            db.execute(
+                crud._stats_for_player_stmt(player.id, columns=fastjson.columns_for(models.Stat, stat_fields))
+            ).all(),
+            crud.get_stats_for_player(db, player.id),
+        )
+
+
+@pytest.mark.parametrize("encoder", list(ENCODERS))
+def test_render_rows_matches_response_model(db, encoder):
+    cases = list(_cases(db))
+    assert len(cases) == len(NAMES) + 1
+    for schema, fields, rows, objects in cases:
+        expected = fastjson.standard_render(schema, objects)
+        assert fastjson.render_rows(fields, rows, encoder=ENCODERS[encoder]) == expected
+
+
+def test_empty_lists(db):
+    assert fastjson.render_rows(fastjson.record_fields(schemas.Stat), []) == fastjson.standard_render(schemas.Stat, [])
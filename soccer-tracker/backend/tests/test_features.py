@@ -0,0 +1,117 @@
+# backend/tests/test_features.py
+"""
+Parity of the league-wide feature engine (ml/features.py) with the per-player pandas reference:
+random leagues mixing long histories, same-day matches, single-match players and missing minutes,
+with the players' rows interleaved. Covers the DataFrame path and the StatStore path, and the copy
+of FEATURE_COLUMNS in export.py.
+"""
+
+import random
+import subprocess
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from backend import crud, export
+from backend.ml import features, predict
+from backend.ml.store import StatStore
+
+START = date(2025, 1, 1)
+KINDS = ["random", "gaps", "same_day", "single", "no_minutes", "some_minutes"]
+
+
+def _player_rows(rng, player_id, kind):
+    if kind == "single":
+        days = [rng.randrange(60)]
+    elif kind == "same_day":  # pandas keeps same-day rows in order up to 16 rows
+        days = sorted(rng.randrange(5) * rng.choice([1, 7]) for _ in range(rng.randint(2, 15)))
+    elif kind == "gaps":  # clusters of matches separated by breaks longer than every window
+        days, day = [], 0
+        for _ in range(rng.randint(2, 30)):
+            day += rng.choice([1, 3, 4, 7, 30, 45])
+            days.append(day)
+    else:
+        days = sorted(rng.sample(range(150), rng.randint(2, 40)))
+    rows = []
+    for day in days:
+        if kind == "no_minutes":
+            minutes = None
+        else:
+            minutes = None if rng.random() < (0.3 if kind == "some_minutes" else 0.05) else rng.randint(0, 90)
+        rows.append((player_id, START + timedelta(days=day), minutes, rng.randint(0, 3), rng.randint(0, 2),
+                     rng.randint(10, 80), rng.randint(0, 5)))
+    return rows
+
+
+def _league(seed):
+    """(rows in crud.STAT_ROW_COLUMNS order with the players interleaved, {player_id: rows in history order})"""
+    rng = random.Random(seed)
+    player_ids = rng.sample(range(1, 500), 18)
+    by_player = {pid: _player_rows(rng, pid, KINDS[i % len(KINDS)]) for i, pid in enumerate(player_ids)}
+    # interleave players while keeping each player's history order
+    queues = {pid: list(rows) for pid, rows in by_player.items()}
+    rows = []
+    while queues:
+        pid = rng.choice(list(queues))
+        rows.append(queues[pid].pop(0))
+        if not queues[pid]:
+            del queues[pid]
+    return rows, by_player
+
+
+def _expected(league_df, player_id):
+    player_df = league_df[league_df["player_id"] == player_id]
+    return predict.compute_rolling_features_pandas(player_df), predict._goals_trend_slope(player_df)
+
+
+def _assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        # the batch slope differs from np.polyfit by float rounding only
+        assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-9, nan_ok=True), key
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_batch_features_match_per_player(seed):
+    rows, by_player = _league(seed)
+    league_df = pd.DataFrame(rows, columns=crud.STAT_ROW_COLUMNS)
+    batch = features.batch_features_to_dicts(features.compute_rolling_features_batch(league_df))
+    slopes = features.compute_tail_slope_batch(league_df, "goals")
+    assert batch.keys() == by_player.keys()
+    for player_id in by_player:
+        expected, goals_slope = _expected(league_df, player_id)
+        _assert_same(batch[player_id], expected)
+        if goals_slope is not None:
+            assert slopes[player_id] == pytest.approx(goals_slope, abs=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_store_features_match_per_player(seed):
+    rows, by_player = _league(seed)
+    league_df = pd.DataFrame(rows, columns=crud.STAT_ROW_COLUMNS)
+    store = StatStore.from_rows(rows)
+    batch = features.batch_features_to_dicts(features.compute_rolling_features_store(store))
+    slopes = features.compute_tail_slope_store(store, "goals")
+    assert batch.keys() == by_player.keys()
+    for player_id in by_player:
+        expected, goals_slope = _expected(league_df, player_id)
+        _assert_same(batch[player_id], expected)
+        if goals_slope is not None:
+            assert slopes[player_id] == pytest.approx(goals_slope, abs=1e-9)
+
+
+def test_empty_input():
+    assert features.compute_rolling_features_batch(pd.DataFrame()).empty
+    assert features.batch_features_to_dicts(features.compute_rolling_features_store(StatStore.from_rows([]))) == {}
+
+
+def test_export_spells_out_feature_columns():
+    assert list(export.FEATURE_COLUMNS) == features.FEATURE_COLUMNS
+    # a fresh interpreter: this one has loaded pandas already
+    code = "import sys, backend.export; print(sorted({'numpy', 'pandas'} & set(sys.modules)))"
+    root = Path(__file__).resolve().parents[2]
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout == "[]\n"
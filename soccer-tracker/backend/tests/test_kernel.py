@@ -0,0 +1,75 @@
+# backend/tests/test_kernel.py
+"""
+Parity of the NumPy scoring kernel (ml/kernel.py) with the pandas reference path: random per-player
+frames with gaps, same-day matches, short histories and missing minutes.
+"""
+
+import math
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.ml import kernel, predict
+
+START = pd.Timestamp("2025-01-01")
+
+
+def _days(rng, shape, n):
+    if shape == "gaps":  # clusters of matches separated by breaks longer than every window
+        days, day = [], 0
+        for _ in range(n):
+            day += rng.choice([1, 3, 4, 7, 30, 45])
+            days.append(day)
+        return days
+    if shape == "same_day":  # several matches per day; pandas keeps same-day rows in order up to 16 rows
+        return [rng.randrange(6) * rng.choice([1, 3]) for _ in range(n)]
+    return rng.sample(range(120), n)
+
+
+def _frame(seed, shape):
+    rng = random.Random(seed)
+    n = rng.randint(0, 3) if shape == "short" else rng.randint(2, 15 if shape == "same_day" else 50)
+    dates = [START + pd.Timedelta(days=d) for d in _days(rng, shape, n)]
+    data = {"match_date": [rng.choice([d, d.date(), d.strftime("%Y-%m-%d")]) for d in dates]}
+    if rng.random() < 0.9:
+        data["minutes_played"] = [None if rng.random() < 0.1 else rng.randint(0, 90) for _ in range(n)]
+    if rng.random() < 0.9:
+        data["goals"] = [rng.randint(0, 3) for _ in range(n)]
+    return pd.DataFrame(data)
+
+
+def _assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-9, nan_ok=True), key
+
+
+@pytest.mark.parametrize("shape", ["gaps", "same_day", "short", "random"])
+@pytest.mark.parametrize("seed", range(50))
+def test_rolling_features_match_pandas(shape, seed):
+    stats_df = _frame(seed, shape)
+    expected = predict.compute_rolling_features_pandas(stats_df)
+    arrays = kernel.stats_arrays(stats_df)
+    if arrays is not None:  # None: a column the kernel hands to pandas (e.g. minutes all missing)
+        _assert_same(kernel.rolling_features(*arrays), expected)
+    _assert_same(predict.compute_rolling_features(stats_df), expected)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_injury_probability_matches_pandas(seed):
+    stats_df = _frame(seed, "random")
+    expected, _ = predict.score_injury_features(dict(predict.compute_rolling_features_pandas(stats_df)))
+    actual, _ = predict.predict_injury_from_stats_df(stats_df)
+    assert actual == pytest.approx(expected, rel=1e-9, abs=1e-12, nan_ok=True)
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 3, 8])
+def test_tail_slope_matches_polyfit(n):
+    values = np.random.default_rng(n).integers(0, 90, n).astype(float)
+    assert kernel.tail_slope(values) == pytest.approx(predict._slope(values), abs=1e-9)
+
+
+def test_tail_slope_nan():
+    assert math.isnan(kernel.tail_slope(np.array([1.0, np.nan, 3.0])))
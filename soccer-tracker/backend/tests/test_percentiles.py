@@ -0,0 +1,136 @@
+# backend/tests/test_percentiles.py
+"""
+Contract of the percentile index (percentiles.py): an index patched with apply() holds exactly the
+sorted arrays of a fresh build, through tied values, position changes, new stats, snapshots and
+deletes, and lookup() agrees with a brute-force count. Runs on a temporary, seeded SQLite database.
+"""
+
+import math
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend import crud, models, percentiles, schemas, snapshots
+from backend.ml.features import FEATURE_COLUMNS
+
+POSITIONS = ["GK", "DF", "MF", "FW"]
+
+
+def _player(i, position):
+    return schemas.PlayerCreate(name=f"P{i}", age=20 + i % 12, position=position, nationality="N", team=f"T{i % 3}")
+
+
+def _stats(rng, player_id, n, start=date(2025, 1, 1)):
+    # small ranges: many tied values within every partition
+    return [
+        (player_id, schemas.StatCreate(
+            match_date=start + timedelta(days=3 * k), goals=rng.randint(0, 2), assists=rng.randint(0, 1),
+            minutes_played=rng.choice([0, 45, 90]), touches=rng.randint(20, 24), tackles_won=rng.randint(0, 2),
+        ))
+        for k in range(n)
+    ]
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    models.create_schema(engine)
+    rng = random.Random(0)
+    with Session(engine) as session:
+        ids = [crud.create_player(session, _player(i, POSITIONS[i % 4])).id for i in range(48)]
+        items = []
+        for player_id in ids[:-4]:  # the last four players have no stats
+            items += _stats(rng, player_id, rng.randint(1, 6))
+        crud.create_stats_group(session, items)
+        snapshots.refresh_snapshots(session, ids[::2])  # snapshot metrics for half of the players
+        yield session
+    engine.dispose()
+
+
+def _assert_same_arrays(actual, expected):
+    """Same sorted values per (partition, metric); apply() only creates the arrays it touches."""
+    actual, expected = actual.sorted_values(), expected.sorted_values()
+    for key in actual.keys() | expected.keys():
+        np.testing.assert_array_equal(actual.get(key, np.empty(0)), expected.get(key, np.empty(0)), err_msg=str(key))
+
+
+def _built(db):
+    index = percentiles.PercentileIndex()
+    index.build(db)
+    return index
+
+
+def test_snapshot_features_match_feature_columns():
+    assert list(percentiles.SNAPSHOT_FEATURES) == FEATURE_COLUMNS + ["injuries_365"]
+
+
+def test_apply_matches_build(db):
+    built = _built(db)
+    ids = built.player_ids()
+    assert len(ids) == 44
+    patched = percentiles.PercentileIndex()
+    patched.apply(db, ids)  # every player inserted into empty arrays
+    patched.apply(db, random.Random(1).sample(ids, len(ids) // 2))  # half removed and re-inserted
+    _assert_same_arrays(patched, built)
+
+
+def test_apply_follows_changes(db):
+    rng = random.Random(2)
+    index = _built(db)
+    players = {p.id: p for p in crud.get_players(db)}
+    ids = sorted(players)
+    changed = set()
+
+    for player_id in ids[:6]:  # move between position partitions
+        player = players[player_id]
+        new_position = POSITIONS[(POSITIONS.index(player.position) + 1) % 4]
+        crud.update_player(db, player, _player(player_id, new_position))
+        changed.add(player_id)
+    new_stats = _stats(rng, ids[10], 2, start=date(2025, 3, 1)) + _stats(rng, ids[-1], 3)  # ids[-1] had none
+    crud.create_stats_group(db, new_stats)
+    changed |= {ids[10], ids[-1]}
+    snapshots.refresh_snapshots(db, ids[1:9:2])
+    changed |= set(ids[1:9:2])
+    crud.delete_player(db, players[ids[20]])
+    changed.add(ids[20])
+
+    index.apply(db, changed)
+    rebuilt = _built(db)
+    _assert_same_arrays(index, rebuilt)
+    assert sorted(index.player_ids()) == sorted(rebuilt.player_ids())
+    for player_id in ids:
+        assert index.lookup(player_id) == rebuilt.lookup(player_id)
+
+
+def _brute_force_rank(index, player_id, j, partition):
+    """rank_in() computed by counting over every player of the partition."""
+    entries = index._players
+    value = entries[player_id].values[j]
+    others = [e.values[j] for e in entries.values()
+              if (partition == percentiles.LEAGUE or e.position == partition[1]) and not math.isnan(e.values[j])]
+    below = sum(1 for v in others if v < value)
+    ties = sum(1 for v in others if v == value)
+    return {"percentile": 100.0 * (below + 0.5 * ties) / len(others), "rank": len(others) - below - ties + 1,
+            "players": len(others)}
+
+
+def test_lookup_matches_brute_force(db):
+    index = _built(db)
+    looked_up = 0
+    for player_id in index.player_ids():
+        result = index.lookup(player_id)
+        for j, metric in enumerate(percentiles.METRICS):
+            ranks = result["metrics"][metric]
+            if ranks is None:
+                continue
+            partitions = {"league": percentiles.LEAGUE, "position": ("position", result["position"])}
+            for name, partition in partitions.items():
+                want = _brute_force_rank(index, player_id, j, partition)
+                assert ranks[name] == pytest.approx(want), (player_id, metric, name)
+                looked_up += 1
+    assert looked_up > len(index) * len(percentiles.AGGREGATE_METRICS) * 2
+    assert index.lookup(10_000) is None
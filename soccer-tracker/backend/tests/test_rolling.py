@@ -0,0 +1,190 @@
+# backend/tests/test_rolling.py
+"""
+Incremental rolling state (ml/rolling.py): RollingState.from_rows / append against the pandas
+reference on random histories (window eviction, same-day matches, missing minutes, the running-sum
+slope), RollingStateStore's version gating, and a stat committed while a prediction rebuilds the
+state counted once (temporary SQLite database).
+"""
+
+import random
+from collections import namedtuple
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend import cache, crud, models, schemas
+from backend.ml import predict
+from backend.ml.rolling import HISTORY_DAYS, HISTORY_MATCHES, RollingState, RollingStateStore, rolling_states
+
+START = date(2025, 1, 1)
+
+Row = namedtuple("Row", "match_date minutes_played goals")
+
+
+def _history(seed, shape):
+    """Rows in history order (match_date, then insertion), as crud returns them."""
+    rng = random.Random(seed)
+    if shape == "gaps":  # clusters of matches separated by breaks longer than every window
+        n = rng.randint(2, 40)
+        days = [sum(rng.choice([1, 3, 4, 7, 30, 45]) for _ in range(k + 1)) for k in range(n)]
+    elif shape == "same_day":  # pandas keeps same-day rows in order up to 16 rows
+        days = [rng.randrange(6) * rng.choice([1, 3]) for _ in range(rng.randint(2, 15))]
+    elif shape == "short":
+        days = [rng.randrange(30) for _ in range(rng.randint(1, 3))]
+    else:
+        days = rng.sample(range(120), rng.randint(2, 50))
+    rows = [
+        Row(
+            START + timedelta(days=d) if rng.random() < 0.5 else (START + timedelta(days=d)).isoformat(),
+            None if rng.random() < 0.1 else rng.randint(0, 90),
+            rng.randint(0, 3),
+        )
+        for d in days
+    ]
+    return sorted(rows, key=lambda r: str(r.match_date)[:10])
+
+
+def _frame(rows):
+    return pd.DataFrame({
+        "match_date": pd.to_datetime([str(r.match_date)[:10] for r in rows]),
+        "minutes_played": pd.Series([r.minutes_played for r in rows], dtype="float64"),
+        "goals": [r.goals for r in rows],
+    })
+
+
+def _assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-9, nan_ok=True), key
+
+
+def _stat(match_date, minutes_played):
+    return schemas.StatCreate(
+        match_date=match_date, goals=1, assists=0, minutes_played=minutes_played, touches=30, tackles_won=1,
+    )
+
+
+SHAPES = ["gaps", "same_day", "short", "random"]
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("seed", range(40))
+def test_from_rows_matches_pandas(shape, seed):
+    rows = _history(seed, shape)
+    stats_df = _frame(rows)
+    state = RollingState.from_rows(rows)
+    _assert_same(state.features(), predict.compute_rolling_features_pandas(stats_df))
+    assert state.count == len(rows)
+    if len(rows) > 1:
+        assert state.goals_tail.slope() == pytest.approx(predict._goals_trend_slope(stats_df), abs=1e-9)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("seed", range(40))
+def test_from_trimmed_rows_matches_pandas(shape, seed):
+    """The rows crud.get_recent_stat_rows keeps: within HISTORY_DAYS of the latest match, or the last HISTORY_MATCHES."""
+    rows = _history(seed, shape)
+    latest = max(pd.Timestamp(str(r.match_date)[:10]) for r in rows)
+    kept = [
+        r for i, r in enumerate(rows)
+        if pd.Timestamp(str(r.match_date)[:10]) >= latest - pd.Timedelta(days=HISTORY_DAYS)
+        or i >= len(rows) - HISTORY_MATCHES
+    ]
+    _assert_same(RollingState.from_rows(kept).features(), predict.compute_rolling_features_pandas(_frame(rows)))
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("seed", range(20))
+def test_append_matches_pandas(shape, seed):
+    rows = _history(seed, shape)
+    state = RollingState()
+    for i, row in enumerate(rows):
+        assert state.append(*row)
+        prefix = _frame(rows[:i + 1])
+        _assert_same(state.features(), predict.compute_rolling_features_pandas(prefix))
+        if i:
+            assert state.goals_tail.slope() == pytest.approx(predict._goals_trend_slope(prefix), abs=1e-9)
+    assert state.count == len(rows)
+
+
+def test_append_older_match_is_refused():
+    rows = _history(0, "random")
+    state = RollingState.from_rows(rows)
+    before = state.snapshot()
+    assert not state.append(START - timedelta(days=1), 90, 1)
+    assert state.snapshot() == before
+    assert state.append(rows[-1].match_date, 45, 0)  # same day as the latest match is in order
+
+
+def test_store_serves_exact_versions_only():
+    rows = _history(1, "random")
+    extra = [Row(START + timedelta(days=200), 90, 1), Row(START + timedelta(days=200), None, 0)]
+    store = RollingStateStore(max_players=2)
+
+    store.extend(1, 4, extra)  # no state held: nothing to advance
+    assert store.snapshot(1, 4) is None
+
+    store.put(1, 3, RollingState.from_rows(rows))
+    assert store.snapshot(1, 4) is None
+    store.extend(1, 4, extra)
+    _assert_same(store.snapshot(1, 4)[0], predict.compute_rolling_features_pandas(_frame(rows + extra)))
+    assert store.snapshot(1, 4)[1:] == RollingState.from_rows(rows + extra).snapshot()[1:]
+    assert store.snapshot(1, 3) is None
+
+    store.extend(1, 6, [Row(START + timedelta(days=300), 90, 1)])  # skipped version 5: dropped
+    assert store.snapshot(1, 4) is None and store.snapshot(1, 6) is None
+
+    store.put(1, 3, RollingState.from_rows(rows))
+    store.append(1, 4, START, 90, 1)  # older than the latest match: dropped
+    assert store.snapshot(1, 4) is None and store.snapshot(1, 3) is None
+
+    for player_id in (1, 2, 3):
+        store.put(player_id, 1, RollingState.from_rows(rows))
+    assert store.snapshot(1, 1) is None and store.snapshot(3, 1) is not None  # least recently used evicted
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    models.create_schema(engine)
+    rolling_states.clear()
+    cache.player_predictions.clear()
+    with Session(engine) as session:
+        yield session
+    rolling_states.clear()
+    cache.player_predictions.clear()
+    engine.dispose()
+
+
+def test_stat_committed_during_rebuild_is_counted_once(db, monkeypatch):
+    player = crud.create_player(db, schemas.PlayerCreate(name="P", age=24, position="MF", nationality="N", team="T"))
+    for k in range(4):
+        crud.create_stat_for_player(db, player.id, _stat(date(2025, 1, 1) + timedelta(days=3 * k), 60))
+    rolling_states.clear()  # the next prediction rebuilds the state from the stats table
+
+    writer = Session(db.get_bind())
+    deferred = []
+    read_rows = crud.get_recent_stat_rows
+
+    def racing_read(*args, **kwargs):
+        # the writer commits between the prediction's version read and its rows read, and its
+        # post-commit rolling_states.append only lands after the prediction is done
+        if not deferred:
+            with monkeypatch.context() as m:
+                m.setattr(rolling_states, "append", lambda *match: deferred.append(match))
+                crud.create_stat_for_player(writer, player.id, _stat(date(2025, 1, 13), 90))
+        return read_rows(*args, **kwargs)
+
+    monkeypatch.setattr(crud, "get_recent_stat_rows", racing_read)
+    predict.predict_injury_with_features(player.id, db)
+    rolling_states.append(*deferred[0])
+    writer.close()
+
+    _, feats, _ = predict.predict_injury_with_features(player.id, db)
+    stats_df = pd.DataFrame(crud.get_stat_rows(db), columns=crud.STAT_ROW_COLUMNS)
+    expected = predict.compute_rolling_features_pandas(stats_df)
+    _assert_same({k: feats[k] for k in expected}, expected)
+    assert feats["minutes_sum_7"] == 210
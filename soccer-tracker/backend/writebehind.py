@@ -0,0 +1,113 @@
+# backend/writebehind.py
+"""
+Write-behind queue for live stat inserts.
+
+- get_stat_queue(): the shared StatWriteQueue, started lazily (None when config.STAT_WRITE_BATCH_ROWS is 0)
+- StatWriteQueue.submit(player_id, stat): enqueue one insert; returns a Future resolved with the
+  created row (dict) once the transaction holding it has committed (durable on power loss with
+  SQLite's synchronous=FULL, which config.SQLITE_SYNCHRONOUS defaults to while the queue is enabled)
+- shutdown_queue(): flush whatever is pending and stop the writer thread
+
+One writer thread drains the queue and commits up to STAT_WRITE_BATCH_ROWS inserts per
+transaction, waiting at most STAT_WRITE_BATCH_MS for a batch to fill. SQLite allows a single
+writer, so this turns hundreds of competing per-row commits (and "database is locked" errors)
+into a few group commits. A group that fails is retried row by row, so one bad row does not
+fail the other requests of its group.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from . import config, crud, database, schemas
+
+_STOP = object()
+
+
+class StatWriteQueue:
+    def __init__(self, max_rows, max_delay_ms):
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="stat-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, player_id: int, stat: schemas.StatCreate):
+        future = Future()
+        self._queue.put((player_id, stat, future))
+        return future
+
+    def close(self):
+        """Commit what is queued, then stop the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _next_batch(self):
+        """Block for the first item, then collect until max_rows or max_delay; (batch, stop requested)"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if batch:
+                self._commit(batch)
+
+    def _commit(self, batch):
+        """
+        One transaction for the batch. If it fails (a row breaking a constraint, say), it is rolled back
+        and the rows are retried one transaction each, so only the failing rows' requests get the error.
+        """
+        try:
+            with database.SessionLocal() as db:
+                rows = crud.create_stats_group(db, [(player_id, stat) for player_id, stat, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                batch[0][2].set_exception(exc)
+                return
+            for item in batch:
+                self._commit([item])
+            return
+        for (_, _, future), row in zip(batch, rows):
+            future.set_result(row)
+
+
+_stat_queue = None
+_stat_queue_lock = threading.Lock()
+
+
+def get_stat_queue():
+    """Lazily start the shared write-behind queue (None when disabled)."""
+    global _stat_queue
+    if config.STAT_WRITE_BATCH_ROWS <= 0:
+        return None
+    with _stat_queue_lock:
+        if _stat_queue is None:
+            _stat_queue = StatWriteQueue(config.STAT_WRITE_BATCH_ROWS, config.STAT_WRITE_BATCH_MS)
+        return _stat_queue
+
+
+def shutdown_queue():
+    global _stat_queue
+    with _stat_queue_lock:
+        if _stat_queue is not None:
+            _stat_queue.close()
+            _stat_queue = None
@@ -0,0 +1,13 @@
+# bench/__init__.py
+"""
+Benchmarks for the Soccer Tracker backend.
+
+Run from the soccer-tracker directory (after `pip install -r backend/requirements-dev.txt`: the
+end-to-end suite drives the app through FastAPI's TestClient, which needs httpx):
+    python -m bench run --sizes tiny,small                  # print results
+    python -m bench run --sizes small --save-baseline b.json
+    python -m bench run --sizes small --baseline b.json     # exit 1 on regressions
+
+Each league size runs in its own process against a freshly generated SQLite league (league.py),
+so peak RSS is per size and the backend's settings (DB URL, model dir) are isolated.
+"""
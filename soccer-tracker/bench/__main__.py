@@ -0,0 +1,159 @@
+# bench/__main__.py
+"""Command line for the benchmark suite; see bench/__init__.py."""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from .league import SIZES
+
+REGRESSION_METRICS = ("p50_ms", "p95_ms")
+
+
+def run_one(args):
+    """Child process: generate one league, run both suites, print the results as JSON."""
+    # backend reads its settings at import time; the parent has set them in our environment
+    from fastapi.testclient import TestClient
+
+    from backend import database, models
+    from backend.main import app
+
+    from .e2e import run_e2e
+    from .league import generate_league
+    from .micro import run_micro
+
+    spec = SIZES[args.size]
+    models.create_schema(database.engine)
+    start = time.perf_counter()
+    with database.SessionLocal() as db:
+        counts = generate_league(db, spec, seed=args.seed)
+    generate_s = time.perf_counter() - start
+
+    with database.SessionLocal() as db:
+        micro = run_micro(db, args.repeat)
+    with TestClient(app) as client, database.SessionLocal() as db:
+        e2e = run_e2e(client, db, args.repeat)
+
+    result = {
+        "size": args.size,
+        "spec": spec._asdict(),
+        "league": {**counts, "generate_s": generate_s},
+        "micro": micro["results"],
+        "e2e": e2e["results"],
+        "uncovered_routes": e2e["uncovered"],
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+    }
+    json.dump(result, sys.stdout)
+    return 0
+
+
+def _run_size(size, repeat, seed):
+    with tempfile.TemporaryDirectory(prefix=f"bench-{size}-") as tmp:
+        env = dict(
+            os.environ,
+            SOCCER_DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'league.db')}",
+            SOCCER_MODEL_DIR=os.path.join(tmp, "models"),
+            # snapshots are refreshed by the micro suite, not by a thread racing the timed calls
+            SOCCER_SNAPSHOT_SCHEDULER="0",
+        )
+        env.pop("SOCCER_ASYNC_DATABASE_URL", None)
+        command = [sys.executable, "-m", "bench", "_one", "--size", size, "--repeat", str(repeat), "--seed", str(seed)]
+        proc = subprocess.run(command, env=env, stdout=subprocess.PIPE, check=True)
+    return json.loads(proc.stdout)
+
+
+def _print_size(result):
+    league = result["league"]
+    print(f"\n== {result['size']}: {league['players']} players, {league['stats']} stats, "
+          f"{league['market_values']} market values, {league['injuries']} injuries "
+          f"(generated in {league['generate_s']:.1f}s), max RSS {result['max_rss_mib']:.0f} MiB")
+    header = f"{'benchmark':<52}{'runs':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>11}"
+    for suite in ("micro", "e2e"):
+        print(f"\n{header}")
+        for name, r in result[suite].items():
+            print(f"{suite + ': ' + name:<52}{r['runs']:>6}{r['throughput_per_s']:>10.1f}{r['p50_ms']:>10.2f}"
+                  f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['peak_kib']:>11.0f}")
+    if result["uncovered_routes"]:
+        print(f"\nroutes without a benchmark: {', '.join(result['uncovered_routes'])}")
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing p50/p95 regressions beyond `tolerance` (a fraction) against the baseline."""
+    regressions = []
+    for size, result in results.items():
+        base = baseline.get(size)
+        if base is None:
+            continue
+        for suite in ("micro", "e2e"):
+            for name, r in result[suite].items():
+                before = base.get(suite, {}).get(name)
+                if before is None:
+                    continue
+                for metric in REGRESSION_METRICS:
+                    if before[metric] > 0 and r[metric] > before[metric] * (1 + tolerance):
+                        regressions.append(
+                            f"{size} {suite}: {name} {metric} {before[metric]:.2f} -> {r[metric]:.2f} ms "
+                            f"(+{(r[metric] / before[metric] - 1) * 100:.0f}%)"
+                        )
+    return regressions
+
+
+def run(args):
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        print(f"unknown sizes: {', '.join(unknown)} (choose from {', '.join(SIZES)})", file=sys.stderr)
+        return 2
+
+    results = {}
+    for size in sizes:
+        results[size] = _run_size(size, args.repeat, args.seed)
+        _print_size(results[size])
+
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nwrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%} against {args.baseline}")
+        for line in regressions:
+            print(f"  {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Soccer Tracker benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    runner = sub.add_parser("run", help="generate leagues and run the micro and end-to-end suites")
+    runner.add_argument("--sizes", default="tiny,small", help=f"comma-separated, from {', '.join(SIZES)}")
+    runner.add_argument("--repeat", type=int, default=50, help="timed calls per benchmark (league-wide ones run fewer)")
+    runner.add_argument("--seed", type=int, default=0)
+    runner.add_argument("--out", help="write the results as JSON")
+    runner.add_argument("--save-baseline", help="write the results as a baseline for later --baseline runs")
+    runner.add_argument("--baseline", help="compare against a saved baseline; exit 1 on regressions")
+    runner.add_argument("--tolerance", type=float, default=0.25, help="allowed p50/p95 slowdown (0.25 = 25%%)")
+    runner.set_defaults(func=run)
+
+    one = sub.add_parser("_one", help=argparse.SUPPRESS)
+    one.add_argument("--size", required=True, choices=list(SIZES))
+    one.add_argument("--repeat", type=int, default=50)
+    one.add_argument("--seed", type=int, default=0)
+    one.set_defaults(func=run_one)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# bench/e2e.py
+"""
+End-to-end benchmarks of every route in backend/main.py through an in-process TestClient.
+
+Read routes run first; write routes (which change the league) run afterwards, each iteration on
+fresh targets prepared outside the timer. Routes without a case are reported as uncovered.
+The snapshot-served prediction routes also run with fresh=true (suffix "(fresh)") to compare
+serving a snapshot with computing live; the child process refreshes the snapshots beforehand.
+ETag-validated routes also run as revalidations with If-None-Match (suffix "(304)").
+"""
+
+import io
+import itertools
+
+from fastapi.routing import APIRoute
+
+from backend import models
+
+from .timing import measure
+
+
+def _stat_body(day):
+    return {"match_date": f"2030-01-{day % 28 + 1:02d}", "goals": 1, "assists": 0, "minutes_played": 90,
+            "touches": 50, "tackles_won": 2}
+
+
+def _import_csv(player_ids, rows=500):
+    lines = ["player_id,match_date,goals,assists,minutes_played,touches,tackles_won"]
+    for i in range(rows):
+        lines.append(f"{player_ids[i % len(player_ids)]},2030-02-{i % 28 + 1:02d},1,0,90,40,1")
+    return "\n".join(lines).encode()
+
+
+def _market_csv(player_ids, rows=500):
+    lines = ["player_id,date,market_value,source"]
+    for i in range(rows):
+        lines.append(f"{player_ids[i % len(player_ids)]},2030-{i // len(player_ids) % 12 + 1:02d}-01,{1_000_000 + i},bench")
+    return "\n".join(lines).encode()
+
+
+def _cases(client, db, repeat):
+    player_ids = [pid for (pid,) in db.query(models.Player.id).order_by(models.Player.id)]
+    pid = player_ids[len(player_ids) // 2]
+    stat_id = db.query(models.Stat.id).filter(models.Stat.player_id == pid).first()[0]
+    inline_stats = [{"match_date": f"2024-03-{d:02d}", "minutes_played": 80, "goals": d % 2} for d in range(1, 25)]
+    heavy = max(3, repeat // 10)
+    cycle = itertools.cycle(player_ids)
+    injury = {"start_date": "2030-01-10", "end_date": "2030-02-01", "injury_type": "bench"}
+    new_player = {"name": "Bench Player", "age": 21, "position": "MF", "nationality": "ENG", "team": "Team 0"}
+
+    def req(method, url, **kwargs):
+        return lambda *_: client.request(method, url, **kwargs)
+
+    def revalidate(url):
+        headers = {"If-None-Match": client.get(url).headers["ETag"]}
+        return lambda *_: client.get(url, headers=headers)
+
+    def created_player(i):
+        return (client.post("/players", json=new_player).json()["id"],)
+
+    def created_injury(i):
+        target = next(cycle)
+        return target, client.post(f"/players/{target}/injuries", json=injury).json()["id"]
+
+    def created_stat(i):
+        target = next(cycle)
+        return target, client.post(f"/players/{target}/stats", json=_stat_body(i)).json()["id"]
+
+    csv = _import_csv(player_ids)
+    market_csv = _market_csv(player_ids)
+    injury_csv = "\n".join(
+        ["player_id,start_date,injury_type"] + [f"{p},2030-03-{i % 28 + 1:02d},bench" for i, p in enumerate(player_ids)]
+    ).encode()
+    # (method, route path, call, prepare, runs)
+    reads = [
+        ("GET", "/", req("GET", "/"), None, repeat),
+        ("GET", "/players", req("GET", "/players"), None, heavy),
+        ("GET", "/players/{player_id}", req("GET", f"/players/{pid}"), None, repeat),
+        ("GET", "/players/{player_id}/stats", req("GET", f"/players/{pid}/stats"), None, repeat),
+        ("GET", "/players/{player_id}/stats/{stat_id}", req("GET", f"/players/{pid}/stats/{stat_id}"), None, repeat),
+        ("GET", "/players/{player_id}/radar", req("GET", f"/players/{pid}/radar"), None, repeat),
+        ("GET", "/players/{player_id} (304)", revalidate(f"/players/{pid}"), None, repeat),
+        ("GET", "/players/{player_id}/stats (304)", revalidate(f"/players/{pid}/stats"), None, repeat),
+        ("GET", "/players/{player_id}/radar (304)", revalidate(f"/players/{pid}/radar"), None, repeat),
+        ("GET", "/players/{player_id}/percentiles", req("GET", f"/players/{pid}/percentiles"), None, repeat),
+        ("GET", "/players/{player_id}/market_values", req("GET", f"/players/{pid}/market_values"), None, repeat),
+        ("GET", "/players/{player_id}/injuries", req("GET", f"/players/{pid}/injuries"), None, repeat),
+        ("POST", "/predict", req("POST", "/predict", json={"player_id": pid, "stats": inline_stats}), None, repeat),
+        ("POST", "/predict/injury/{player_id}", req("POST", f"/predict/injury/{pid}"), None, repeat),
+        ("POST", "/predict/investment/{player_id}", req("POST", f"/predict/investment/{pid}"), None, repeat),
+        ("GET", "/predict/injury/{player_id}", req("GET", f"/predict/injury/{pid}"), None, repeat),
+        ("GET", "/predict/investment/{player_id}", req("GET", f"/predict/investment/{pid}"), None, repeat),
+        ("GET", "/predict/injury/{player_id} (304)", revalidate(f"/predict/injury/{pid}"), None, repeat),
+        ("POST", "/predict/injury/{player_id} (fresh)", req("POST", f"/predict/injury/{pid}?fresh=true"), None, repeat),
+        ("POST", "/predict/investment/{player_id} (fresh)", req("POST", f"/predict/investment/{pid}?fresh=true"),
+         None, repeat),
+        ("GET", "/predict/snapshots", req("GET", "/predict/snapshots"), None, heavy),
+        ("POST", "/predict/batch", req("POST", "/predict/batch", json={"all_players": True}), None, heavy),
+        ("GET", "/predict/cache", req("GET", "/predict/cache"), None, repeat),
+        ("GET", "/models", req("GET", "/models"), None, repeat),
+        ("POST", "/models/reload", req("POST", "/models/reload"), None, repeat),
+        ("GET", "/metrics", req("GET", "/metrics"), None, repeat),
+        ("GET", "/insights/top_undervalued", req("GET", "/insights/top_undervalued?max_age=40&top_n=10"), None, heavy),
+        ("GET", "/insights/injury_compare/{player_id}", req("GET", f"/insights/injury_compare/{pid}"), None, repeat),
+        ("GET", "/insights/top_undervalued (fresh)",
+         req("GET", "/insights/top_undervalued?max_age=40&top_n=10&fresh=true"), None, heavy),
+        ("GET", "/insights/injury_compare/{player_id} (fresh)",
+         req("GET", f"/insights/injury_compare/{pid}?fresh=true"), None, repeat),
+        ("GET", "/export/stats", req("GET", "/export/stats"), None, heavy),
+        ("GET", "/export/predictions", req("GET", "/export/predictions"), None, heavy),
+    ]
+    writes = [
+        ("POST", "/players", req("POST", "/players", json=new_player), None, repeat),
+        ("PUT", "/players/{player_id}", lambda *_: client.put(f"/players/{pid}", json={**new_player, "team": "Team 0"}),
+         None, repeat),
+        ("DELETE", "/players/{player_id}", lambda p: client.delete(f"/players/{p}"), created_player, repeat),
+        ("POST", "/players/{player_id}/stats", lambda i: client.post(f"/players/{next(cycle)}/stats", json=_stat_body(i)),
+         lambda i: (i,), repeat),
+        ("PUT", "/players/{player_id}/stats/{stat_id}",
+         lambda p, s: client.put(f"/players/{p}/stats/{s}", json=_stat_body(3)), created_stat, repeat),
+        ("DELETE", "/players/{player_id}/stats/{stat_id}",
+         lambda p, s: client.delete(f"/players/{p}/stats/{s}"), created_stat, repeat),
+        ("POST", "/stats/import",
+         lambda *_: client.post("/stats/import", files={"file": ("stats.csv", io.BytesIO(csv), "text/csv")}),
+         None, heavy),
+        ("POST", "/players/{player_id}/injuries",
+         lambda *_: client.post(f"/players/{next(cycle)}/injuries", json=injury), None, repeat),
+        ("PUT", "/players/{player_id}/injuries/{injury_id}",
+         lambda p, j: client.put(f"/players/{p}/injuries/{j}", json=injury), created_injury, repeat),
+        ("DELETE", "/players/{player_id}/injuries/{injury_id}",
+         lambda p, j: client.delete(f"/players/{p}/injuries/{j}"), created_injury, repeat),
+        ("POST", "/injuries/import",
+         lambda *_: client.post("/injuries/import", files={"file": ("injuries.csv", io.BytesIO(injury_csv), "text/csv")}),
+         None, heavy),
+        ("POST", "/market_values/import",
+         lambda *_: client.post("/market_values/import", files={"file": ("mv.csv", io.BytesIO(market_csv), "text/csv")}),
+         None, heavy),
+    ]
+    return reads + writes
+
+
+def run_e2e(client, db, repeat):
+    results = {}
+    cases = _cases(client, db, repeat)
+    for method, path, call, prepare, runs in cases:
+        def checked(*args, call=call):
+            response = call(*args)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {path}: HTTP {response.status_code} {response.text[:200]}")
+            return response
+        results[f"{method} {path}"] = measure(checked, runs, prepare=prepare)
+
+    covered = {(method, path.split(" ")[0]) for method, path, *_ in cases}
+    uncovered = sorted(
+        f"{method} {route.path}"
+        for route in client.app.routes if isinstance(route, APIRoute)
+        for method in route.methods if (method, route.path) not in covered
+    )
+    return {"results": results, "uncovered": uncovered}
@@ -0,0 +1,129 @@
+# bench/league.py
+"""
+Deterministic synthetic league: teams of players with seasons of weekly (plus some midweek)
+matches, squad rotation, position-dependent stat lines and injury absences (also recorded as
+injuries), plus monthly market values.
+The same (spec, seed) always produces the same rows.
+"""
+
+import random
+from collections import namedtuple
+from datetime import date, timedelta
+
+LeagueSpec = namedtuple("LeagueSpec", "teams players_per_team seasons")
+
+SIZES = {
+    "tiny": LeagueSpec(teams=2, players_per_team=12, seasons=1),
+    "small": LeagueSpec(teams=8, players_per_team=22, seasons=1),
+    "medium": LeagueSpec(teams=20, players_per_team=25, seasons=2),
+    "large": LeagueSpec(teams=40, players_per_team=28, seasons=4),
+}
+
+MATCHDAYS_PER_SEASON = 38
+SEASON_START = date(2021, 8, 7)
+POSITIONS = ("GK", "DF", "DF", "DF", "DF", "MF", "MF", "MF", "FW", "FW", "FW")
+NATIONALITIES = ("ENG", "ESP", "FRA", "GER", "ITA", "BRA", "ARG", "POR", "NED", "USA")
+
+# (goals per 90, assists per 90, touches per 90, tackles won per 90) by position
+_PROFILE = {
+    "GK": (0.0, 0.01, 35, 0.2),
+    "DF": (0.05, 0.08, 65, 2.2),
+    "MF": (0.15, 0.2, 75, 1.6),
+    "FW": (0.45, 0.2, 45, 0.6),
+}
+
+
+def _poisson(rng, lam):
+    # Knuth; the rates here are small
+    limit, k, p = pow(2.718281828459045, -lam), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def generate_players(spec, seed=0):
+    """[(name, age, position, nationality, team)] for every squad."""
+    rng = random.Random(seed)
+    players = []
+    for t in range(spec.teams):
+        for i in range(spec.players_per_team):
+            position = POSITIONS[i % len(POSITIONS)]
+            players.append((f"Player {t}-{i}", rng.randint(17, 35), position, rng.choice(NATIONALITIES), f"Team {t}"))
+    return players
+
+
+def generate_stats(spec, player_ids, positions, seed=0, injuries=None):
+    """
+    Stat dicts (crud.bulk_create_stats format) for players laid out team by team, in generate_players order.
+    Starters (the first 11 of a squad, rotated) play most minutes; an injury keeps a player out 2-8 weeks.
+    Each injury is also appended to `injuries` (crud.bulk_upsert_injuries format) when a list is given.
+    """
+    rng = random.Random(seed + 1)
+    records = []
+    squad = spec.players_per_team
+    out_until = {}
+    for season in range(spec.seasons):
+        day = SEASON_START + timedelta(days=365 * season)
+        for matchday in range(MATCHDAYS_PER_SEASON):
+            day += timedelta(days=rng.choice((3, 4, 7, 7, 7)))
+            for t in range(spec.teams):
+                team = range(t * squad, (t + 1) * squad)
+                available = [i for i in team if out_until.get(i, day) <= day]
+                rng.shuffle(available)
+                starters, bench = available[:11], available[11:16]
+                for i, minutes in [(i, rng.randint(60, 90)) for i in starters] + [(i, rng.randint(5, 30)) for i in bench]:
+                    g90, a90, t90, k90 = _PROFILE[positions[i]]
+                    share = minutes / 90.0
+                    records.append({
+                        "player_id": player_ids[i],
+                        "match_date": day,
+                        "goals": _poisson(rng, g90 * share),
+                        "assists": _poisson(rng, a90 * share),
+                        "minutes_played": minutes,
+                        "touches": max(0, int(rng.gauss(t90 * share, 8))),
+                        "tackles_won": _poisson(rng, k90 * share),
+                    })
+                    if rng.random() < 0.012 * share:
+                        out_until[i] = day + timedelta(days=rng.randint(14, 56))
+                        if injuries is not None:
+                            injuries.append({"player_id": player_ids[i], "start_date": day, "end_date": out_until[i],
+                                             "injury_type": "muscle"})
+    return records
+
+
+def generate_market_values(spec, player_ids, seed=0):
+    """Monthly valuation records (crud.bulk_upsert_market_values format): a random walk per player."""
+    rng = random.Random(seed + 2)
+    records = []
+    months = 12 * spec.seasons
+    for player_id in player_ids:
+        value = rng.uniform(0.5, 60.0) * 1_000_000
+        for month in range(months):
+            day = SEASON_START + timedelta(days=30 * month)
+            value = max(100_000.0, value * (1 + rng.gauss(0.0, 0.06)))
+            records.append({"player_id": player_id, "date": day, "market_value": round(value, -3), "source": "bench"})
+    return records
+
+
+def generate_league(db, spec, seed=0, chunk_rows=50_000):
+    """Insert a synthetic league into an empty database. Returns row counts per table."""
+    from sqlalchemy import insert
+
+    from backend import crud, models
+
+    players = generate_players(spec, seed)
+    columns = ("name", "age", "position", "nationality", "team")
+    db.execute(insert(models.Player.__table__), [dict(zip(columns, p)) for p in players])
+    db.commit()
+    player_ids = [pid for (pid,) in db.query(models.Player.id).order_by(models.Player.id)]
+    injuries = []
+    records = generate_stats(spec, player_ids, [p[2] for p in players], seed, injuries=injuries)
+    for start in range(0, len(records), chunk_rows):
+        crud.bulk_create_stats(db, records[start:start + chunk_rows])
+    crud.bulk_upsert_injuries(db, injuries)
+    valuations = generate_market_values(spec, player_ids, seed)
+    for start in range(0, len(valuations), chunk_rows):
+        crud.bulk_upsert_market_values(db, valuations[start:start + chunk_rows])
+    return {"players": len(players), "stats": len(records), "market_values": len(valuations), "injuries": len(injuries)}
@@ -0,0 +1,64 @@
+# bench/micro.py
+"""
+Micro-benchmarks of the ML functions on data from the generated league.
+
+Per-player functions run on a typical player (median match count); league-wide ones on everyone.
+_stats_to_df no longer exists: ORM rows are not converted any more, and the row-to-array step that
+replaced it (StatStore.from_rows) is measured instead, together with the DataFrame it can produce.
+"""
+
+import numpy as np
+
+from backend import crud, fastjson, models, percentiles, schemas, snapshots
+from backend.ml import backtest, injuries, kernel, market, predict
+from backend.ml.rolling import RollingState
+from backend.ml.store import StatRecord, StatStore, load_stats
+
+from .timing import measure
+
+
+def run_micro(db, repeat):
+    store = load_stats(db, models.Player.id.isnot(None))
+    median_player = int(store.player_ids[np.argsort(store.counts())[store.n_players // 2]])
+    rows = crud.get_stat_rows(db, models.Player.id == median_player)
+    player_store = StatStore.from_rows(rows)
+    player_df = player_store.to_frame().drop(columns="player_id")
+    minutes = player_df["minutes_played"].to_numpy()[-8:]
+    records = [StatRecord(*r) for r in rows]
+    league_repeat = max(3, repeat // 10)
+    players = crud.get_players(db)
+    player_fields = fastjson.record_fields(schemas.Player)
+    player_rows = db.execute(crud._players_stmt(columns=fastjson.columns_for(models.Player, player_fields))).all()
+
+    index = percentiles.PercentileIndex()
+    index.build(db)
+    changed = index.player_ids()[:10]
+
+    cases = {
+        "compute_rolling_features": (lambda: predict.compute_rolling_features(player_df), repeat),
+        "compute_rolling_features_pandas": (lambda: predict.compute_rolling_features_pandas(player_df), repeat),
+        "_slope (np.polyfit)": (lambda: predict._slope(minutes), repeat),
+        "kernel.tail_slope": (lambda: kernel.tail_slope(minutes), repeat),
+        "StatStore.from_rows (player)": (lambda: StatStore.from_rows(rows), repeat),
+        "StatStore.to_frame (player)": (lambda: player_store.to_frame(), repeat),
+        "predict_injury_from_stats_df": (lambda: predict.predict_injury_from_stats_df(player_df), repeat),
+        "predict_investment_from_stats_df": (lambda: predict.predict_investment_from_stats_df(player_df), repeat),
+        "RollingState.from_rows (player)": (lambda: RollingState.from_rows(records).features(), repeat),
+        "load_stats (league)": (lambda: load_stats(db, models.Player.id.isnot(None)), league_repeat),
+        "score_players_batch (league)": (lambda: predict.score_players_batch(store), league_repeat),
+        "load_market_trends (league)": (lambda: market.load_market_trends(db, models.Player.id.isnot(None)), league_repeat),
+        "recent_injury_counts (league)": (
+            lambda: injuries.recent_injury_counts(injuries.load_injury_index(db, models.Player.id.isnot(None)), store),
+            league_repeat,
+        ),
+        "GET /players body: response_model": (lambda: fastjson.standard_render(schemas.Player, players), repeat),
+        "GET /players body: fastjson.render_rows": (lambda: fastjson.render_rows(player_fields, player_rows), repeat),
+        "backtest.prefix_features (player)": (lambda: backtest.prefix_features(store, median_player), league_repeat),
+        "backtest.history_features (league)": (lambda: backtest.history_features(store), league_repeat),
+        "PercentileIndex.build (league)": (lambda: index.build(db), league_repeat),
+        "PercentileIndex.apply (10 players)": (lambda: index.apply(db, changed), repeat),
+        "PercentileIndex.lookup (player)": (lambda: index.lookup(median_player), repeat),
+        "refresh_snapshots (league)": (lambda: snapshots.refresh_snapshots(db), league_repeat),
+    }
+    results = {name: measure(fn, n) for name, (fn, n) in cases.items()}
+    return {"player_rows": len(rows), "league_rows": len(store), "results": results}
@@ -0,0 +1,45 @@
+# bench/timing.py
+"""Latency / throughput / memory measurement shared by the micro and end-to-end suites."""
+
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def measure(fn, repeat, warmup=1, prepare=None):
+    """
+    Call fn(*prepare(i)) (or fn()) `repeat` times after `warmup` calls; prepare runs outside the timer.
+    Returns runs, throughput (calls/s), mean / p50 / p95 / p99 latency in ms and the peak Python
+    allocation of one extra call (tracemalloc, in KiB).
+    """
+    def args(i):
+        return prepare(i) if prepare else ()
+
+    for i in range(warmup):
+        fn(*args(-1 - i))
+    latencies = np.empty(repeat)
+    for i in range(repeat):
+        call_args = args(i)
+        start = time.perf_counter()
+        fn(*call_args)
+        latencies[i] = time.perf_counter() - start
+
+    call_args = args(repeat)
+    tracemalloc.start()
+    try:
+        fn(*call_args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000.0
+    return {
+        "runs": repeat,
+        "throughput_per_s": float(repeat / latencies.sum()) if latencies.sum() > 0 else float("inf"),
+        "mean_ms": float(latencies.mean() * 1000.0),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "peak_kib": peak / 1024.0,
+    }
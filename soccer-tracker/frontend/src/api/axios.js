@@ -32,6 +32,10 @@ export const deleteStat = (playerId, statId) =>
 export const getRadarData = (playerId) =>
   axios.get(`${API_URL}/players/${playerId}/radar`);
 
+// League-wide and per-position percentiles of the player's averages and ML features
+export const getPlayerPercentiles = (playerId) =>
+  axios.get(`${API_URL}/players/${playerId}/percentiles`);
+
 // =========================
 // Predictions
 // - Primary method: POST /predict (send stats array + optional horizon_days)
@@ -43,11 +47,12 @@ export const runPrediction = (playerId, stats, horizon_days = undefined) => {
   return axios.post(`${API_URL}/predict`, payload);
 };
 
+// GET so the browser revalidates with If-None-Match (304 when nothing changed)
 export const getInjuryPredictionByPlayer = (playerId) =>
-  axios.post(`${API_URL}/predict/injury/${playerId}`);
+  axios.get(`${API_URL}/predict/injury/${playerId}`);
 
 export const getInvestmentPredictionByPlayer = (playerId, horizon_days = 180) =>
-  axios.post(`${API_URL}/predict/investment/${playerId}`, null, {
+  axios.get(`${API_URL}/predict/investment/${playerId}`, {
     params: { horizon_days },
   });
 